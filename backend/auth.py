@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+import httpx
+from jose import jwk, jwt, JWTError
+from cache import TTLCache
+
+# Clerk token verification. JWKSManager keeps the signing keys indexed by kid
+# (constructed once, not per request), loads them from CLERK_JWKS_URL or a local
+# file, and refreshes on an unknown kid at most once per `min_refresh_interval`.
+# TokenVerifier caches verified claims by token hash until the token expires.
+
+
+class JWKSManager:
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        file_path: Optional[str] = None,
+        refresh_interval: float = 3600.0,
+        min_refresh_interval: float = 30.0,
+        timeout: float = 5.0,
+    ):
+        if not url and not file_path:
+            raise ValueError("JWKSManager needs a JWKS URL or a local JWKS file")
+        self.url = url
+        self.file_path = file_path
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: Dict[str, Any] = {}
+        self._last_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def kids(self):
+        return list(self._keys)
+
+    async def _fetch(self) -> Dict[str, Any]:
+        if self.file_path:
+            def _read():
+                with open(self.file_path, encoding="utf-8") as f:
+                    return json.load(f)
+            return await asyncio.to_thread(_read)
+        async with httpx.AsyncClient(timeout=self.timeout) as c:
+            r = await c.get(self.url)
+        r.raise_for_status()
+        return r.json()
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reloads the key set unless it was refreshed within `min_refresh_interval`; returns True if reloaded."""
+        async with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.min_refresh_interval:
+                return False
+            self._last_refresh = time.monotonic()
+            data = await self._fetch()
+            keys = {}
+            for key in data.get("keys", []):
+                if key.get("kid") and key.get("kty") == "RSA":
+                    keys[key["kid"]] = jwk.construct(key, key.get("alg", "RS256"))
+            self._keys = keys
+            return True
+
+    async def get_key(self, kid: Optional[str]):
+        key = self._keys.get(kid)
+        if key is None and kid:
+            # possibly a rotated key: reload (rate limited) and look again
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"JWKS refresh failed: {e}")
+            key = self._keys.get(kid)
+        return key
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(force=True)
+            except Exception as e:
+                print(f"Periodic JWKS refresh failed: {e}")
+
+    async def start(self) -> None:
+        try:
+            await self.refresh(force=True)
+        except Exception as e:
+            # not fatal: the first request with a kid triggers another attempt
+            print(f"Could not load JWKS at startup: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class TokenVerifier:
+    def __init__(self, jwks: JWKSManager, cache_size: int = 10000, cache_ttl: float = 300.0, algorithms=("RS256",)):
+        self.jwks = jwks
+        self.algorithms = list(algorithms)
+        self._cache = TTLCache(cache_size, cache_ttl)
+        self.cache_ttl = cache_ttl
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Returns the verified claims; raises JWTError for invalid, expired or unknown-key tokens."""
+        token_hash = hashlib.sha256(token.encode("utf-8")).digest()
+        claims = self._cache.get(token_hash)
+        now = time.time()
+        if claims is not None and claims.get("exp", now + 1) > now:
+            return claims
+
+        header = jwt.get_unverified_header(token)
+        key = await self.jwks.get_key(header.get("kid"))
+        if key is None:
+            raise JWTError("Unable to find matching key")
+        claims = jwt.decode(token, key, algorithms=self.algorithms)
+        ttl = self.cache_ttl
+        if "exp" in claims:
+            ttl = min(ttl, claims["exp"] - now)
+        if ttl > 0:
+            self._cache.set(token_hash, claims, ttl=ttl)
+        return claims
+
+    def clear(self) -> None:
+        self._cache.clear()
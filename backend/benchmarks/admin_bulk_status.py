@@ -0,0 +1,95 @@
+"""
+Admin status-update throughput: one request per report vs the bulk endpoint.
+
+"per item" replays what PUT /admin/report/{id}/status does for each report: a
+find_one for the 404 check and the tile update, then crud.update_report (one
+find_one_and_update with $set/$push, plus its notification insert). "bulk"
+sends the same operations through crud.bulk_update_reports in batches of
+--batch-size: one find, one ordered bulk_write and one notification
+insert_many per batch. Needs a local mongod.
+
+    python benchmarks/admin_bulk_status.py --seed 20000 --ops 2000 --batch-size 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("MONGO_DB_NAME", "civic_connect_bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crud  # noqa: E402
+
+CITY_CENTER = (78.4867, 17.3850)  # lon, lat
+STATUSES = ["Submitted", "In Progress", "Resolved"]
+
+
+def _seed(n: int):
+    crud.reports_collection.drop()
+    crud.notifications_collection.drop()
+    crud.ensure_indexes()
+    now = datetime.now(timezone.utc)
+    docs = [{
+        "user_id": f"bench-user-{i % 100}",
+        "title": "Benchmark report",
+        "category": "Pothole",
+        "urgency": "Medium",
+        "assigned_department": "Public Works",
+        "location": {"type": "Point", "coordinates": [CITY_CENTER[0] + random.uniform(-0.1, 0.1), CITY_CENTER[1] + random.uniform(-0.1, 0.1)]},
+        "status": "Submitted",
+        "upvotes": 0,
+        "admin_notes": [],
+        "progress_images": [],
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(n)]
+    return crud.reports_collection.insert_many(docs).inserted_ids
+
+
+def _operation(oid):
+    now = datetime.now(timezone.utc)
+    push = {"admin_notes": {"note": "Crew dispatched", "by": "bench-admin", "at": now}}
+    if random.random() < 0.3:
+        push["progress_images"] = "/static/uploads/progress.jpg"
+    return oid, {"status": random.choice(STATUSES), "updated_at": now}, push
+
+
+def _per_item(operations, batch_size):
+    for oid, set_fields, push_fields in operations:
+        crud.reports_collection.find_one({"_id": oid})
+        crud.update_report(oid, set_fields, push_fields)
+
+
+def _bulk(operations, batch_size):
+    for start in range(0, len(operations), batch_size):
+        crud.bulk_update_reports(operations[start:start + batch_size])
+
+
+def _measure(label, fn, operations, batch_size):
+    started = time.perf_counter()
+    fn(operations, batch_size)
+    elapsed = time.perf_counter() - started
+    rate = len(operations) / elapsed
+    print(f"{label:<12}{len(operations):>8}{elapsed:>12.2f}{rate:>14.0f}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=20000)
+    parser.add_argument("--ops", type=int, default=2000, help="status updates per variant")
+    parser.add_argument("--batch-size", type=int, default=200, help="operations per bulk request")
+    args = parser.parse_args()
+
+    print(f"Seeding {args.seed} reports into {crud.DB_NAME}")
+    report_ids = _seed(args.seed)
+    print(f"{'variant':<12}{'ops':>8}{'seconds':>12}{'reports/s':>14}")
+    before = _measure("per item", _per_item, [_operation(random.choice(report_ids)) for _ in range(args.ops)], args.batch_size)
+    after = _measure("bulk", _bulk, [_operation(random.choice(report_ids)) for _ in range(args.ops)], args.batch_size)
+    print(f"\nbulk_write path: {after / before:.1f}x the per-item throughput")
+
+
+if __name__ == "__main__":
+    main()
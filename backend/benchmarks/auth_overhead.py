@@ -0,0 +1,96 @@
+"""
+Per-request cost of bearer-token verification, before and after the JWKS
+manager and verified-token cache.
+
+"before" replays the old get_current_user_id logic: a linear scan of the key
+list and a full RS256 verification on every call. "after" goes through
+auth.TokenVerifier with a local JWKS file, first cold (every token unique)
+and then warm (the same few tokens repeated, as a busy client does).
+
+    python benchmarks/auth_overhead.py --calls 5000 --keys 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt  # noqa: E402
+
+from auth import JWKSManager, TokenVerifier  # noqa: E402
+from local_jwks import make_signing_key, sign_token  # noqa: E402
+
+
+def _old_verify(jwks, token):
+    header = jwt.get_unverified_header(token)
+    rsa_key = {}
+    for key in jwks.get("keys", []):
+        if key.get("kid") == header.get("kid"):
+            rsa_key = {"kty": key.get("kty"), "kid": key.get("kid"), "use": key.get("use"),
+                       "n": key.get("n"), "e": key.get("e")}
+    return jwt.decode(token, rsa_key, algorithms=["RS256"]).get("sub")
+
+
+def _summary(label, samples_us):
+    ordered = sorted(samples_us)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    print(f"{label:<28} mean {statistics.mean(samples_us):9.1f} us   p50 {statistics.median(samples_us):9.1f} us   p99 {p99:9.1f} us")
+
+
+async def _run(args):
+    # several keys in the set, signing with the last one so the old linear scan walks the whole list
+    pems, keys = [], []
+    for i in range(args.keys):
+        pem, jwks = make_signing_key(f"kid-{i}")
+        pems.append(pem)
+        keys.extend(jwks["keys"])
+    jwks = {"keys": keys}
+    pem, kid = pems[-1], f"kid-{args.keys - 1}"
+    unique_tokens = [sign_token(pem, kid, f"user_{i}") for i in range(args.calls)]
+    hot_tokens = unique_tokens[:args.hot_tokens]
+
+    samples = []
+    for token in unique_tokens:
+        started = time.perf_counter()
+        _old_verify(jwks, token)
+        samples.append((time.perf_counter() - started) * 1e6)
+    _summary("before (scan + verify)", samples)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(jwks, f)
+    manager = JWKSManager(file_path=f.name)
+    await manager.refresh(force=True)
+    verifier = TokenVerifier(manager)
+
+    samples = []
+    for token in unique_tokens:
+        started = time.perf_counter()
+        await verifier.verify(token)
+        samples.append((time.perf_counter() - started) * 1e6)
+    _summary("after, cold (unique tokens)", samples)
+
+    samples = []
+    for i in range(args.calls):
+        token = hot_tokens[i % len(hot_tokens)]
+        started = time.perf_counter()
+        await verifier.verify(token)
+        samples.append((time.perf_counter() - started) * 1e6)
+    _summary("after, warm (repeat tokens)", samples)
+    os.unlink(f.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=3, help="keys in the JWKS")
+    parser.add_argument("--hot-tokens", type=int, default=50, help="distinct tokens in the warm phase")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Accuracy and latency of the local classifier against the LLM path.
+
+Labels come from LLM-classified reports in Mongo (same selection as
+train_classifier.py). The local tiers run over every sample; the LLM path
+(_reconcile_to_json, real API or benchmarks/stub_inference.py via HF_BASE)
+runs over a smaller sample.
+
+    python benchmarks/classifier_accuracy.py --samples 5000 --llm-samples 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # noqa: E402
+from train_classifier import FIELDS, load_samples  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def _report(label, predictions, samples, latencies_us):
+    print(f"\n== {label} ({len(samples)} samples) ==")
+    for field in FIELDS:
+        hits = sum(1 for pred, (_, labels) in zip(predictions, samples) if pred and pred.get(field) == labels.get(field))
+        print(f"  accuracy {field:<20}{hits / max(1, len(samples)):.3f}")
+    print(f"  latency p50 {_percentile(latencies_us, 50):,.1f} us   p99 {_percentile(latencies_us, 99):,.1f} us")
+
+
+async def _llm_predictions(samples):
+    predictions, latencies = [], []
+    for text, _ in samples:
+        started = time.perf_counter()
+        try:
+            predictions.append(await reports._reconcile_to_json(text, None))
+        except Exception:
+            predictions.append(None)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    await reports.hf_client.aclose()
+    return predictions, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--llm-samples", type=int, default=100)
+    parser.add_argument("--threshold", type=float, default=reports.CLASSIFIER_CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+
+    samples = list(load_samples(args.samples))
+    if not samples:
+        raise SystemExit("No labelled reports found.")
+    classifier = reports.local_classifier
+    print(f"Model file: {classifier.model_path} ({'loaded' if classifier.model else 'missing, keyword tier only'})")
+
+    predictions, latencies = [], []
+    for text, _ in samples:
+        started = time.perf_counter()
+        predictions.append(classifier.predict(text))
+        latencies.append((time.perf_counter() - started) * 1e6)
+    _report("local classifier, all samples", predictions, samples, latencies)
+
+    confident = [(p, s) for p, s in zip(predictions, samples) if p and p["confidence"] >= args.threshold]
+    print(f"\n  handled locally at threshold {args.threshold}: {len(confident)}/{len(samples)} "
+          f"({len(confident) / len(samples):.1%})")
+    if confident:
+        _report("local classifier, confident subset", [p for p, _ in confident], [s for _, s in confident], latencies)
+
+    if args.llm_samples:
+        llm_samples = samples[:args.llm_samples]
+        llm_predictions, llm_latencies = asyncio.run(_llm_predictions(llm_samples))
+        _report("LLM path", llm_predictions, llm_samples, llm_latencies)
+
+
+if __name__ == "__main__":
+    main()
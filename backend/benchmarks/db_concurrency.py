@@ -0,0 +1,133 @@
+"""
+Mixed read/write concurrency benchmark for the Mongo access layer.
+
+Runs the same workload twice against a local mongod: once calling crud directly
+from coroutines (the old blocking behaviour) and once through crud.run_db. A
+heartbeat task measures how late the event loop wakes up, which is what every
+other request on the worker would feel.
+
+    python benchmarks/db_concurrency.py --concurrency 64 --ops 4000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "civic_connect_bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crud  # noqa: E402
+
+CITY_CENTER = (78.4867, 17.3850)  # lon, lat
+
+
+def _random_point():
+    lon, lat = CITY_CENTER
+    return lon + random.uniform(-0.1, 0.1), lat + random.uniform(-0.1, 0.1)
+
+
+def _new_report(user_id: str) -> crud.ReportInDB:
+    lon, lat = _random_point()
+    return crud.ReportInDB.model_validate({
+        "user_id": user_id,
+        "title": "Benchmark report",
+        "category": "Pothole",
+        "urgency": "Medium",
+        "assigned_department": "Public Works",
+        "location": {"type": "Point", "coordinates": [lon, lat]},
+    })
+
+
+def _pick_op(report_ids):
+    user_id = f"bench-user-{random.randint(0, 99)}"
+    roll = random.random()
+    if roll < 0.35:
+        lon, lat = _random_point()
+        return "nearby", crud.get_reports_nearby_by_distance, (lon, lat, 2000, 100)
+    if roll < 0.55:
+        return "my_reports", crud.get_reports_by_user_id, (user_id,)
+    if roll < 0.70:
+        return "recent", crud.get_recent_reports, (100,)
+    if roll < 0.80:
+        return "admin_page", crud.get_admin_reports_page, ({"status": "Submitted"}, random.randint(1, 5), 50)
+    if roll < 0.92:
+        return "create", crud.create_report, (_new_report(user_id),)
+    return "update_status", crud.update_report_status, (random.choice(report_ids), random.choice(["In Progress", "Resolved"]))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def _run(mode: str, concurrency: int, ops: int, report_ids):
+    latencies = {}
+    lags = []
+    remaining = iter(range(ops))
+    stop = asyncio.Event()
+
+    async def worker():
+        for _ in remaining:
+            name, fn, args = _pick_op(report_ids)
+            start = time.perf_counter()
+            if mode == "offload":
+                await crud.run_db(fn, *args)
+            else:
+                fn(*args)
+                await asyncio.sleep(0)
+            latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    hb = asyncio.create_task(_heartbeat(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await hb
+
+    print(f"\n== {mode} ({concurrency} concurrent, {ops} ops, {ops / elapsed:.0f} ops/s) ==")
+    print(f"{'op':<14}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    everything = []
+    for name, vals in sorted(latencies.items()):
+        everything.extend(vals)
+        print(f"{name:<14}{len(vals):>7}{statistics.median(vals):>10.2f}{_percentile(vals, 95):>10.2f}{_percentile(vals, 99):>10.2f}")
+    print(f"{'ALL':<14}{len(everything):>7}{statistics.median(everything):>10.2f}{_percentile(everything, 95):>10.2f}{_percentile(everything, 99):>10.2f}")
+    print(f"event-loop lag p99: {_percentile(lags, 99):.2f} ms, max: {max(lags or [0]):.2f} ms")
+
+
+def _seed(n: int):
+    crud.reports_collection.drop()
+    crud.ensure_indexes()
+    docs = [_new_report(f"bench-user-{i % 100}").model_dump(by_alias=True, exclude={"id"}) for i in range(n)]
+    result = crud.reports_collection.insert_many(docs)
+    return [str(oid) for oid in result.inserted_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=20000, help="reports to seed before running")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=4000)
+    args = parser.parse_args()
+
+    print(f"Seeding {args.seed} reports into {crud.DB_NAME} (pool={crud.MONGO_MAX_POOL_SIZE}, executor={crud.DB_EXECUTOR_WORKERS})")
+    report_ids = _seed(args.seed)
+    for mode in ("blocking", "offload"):
+        asyncio.run(_run(mode, args.concurrency, args.ops, report_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Throughput of Hugging Face calls with and without the shared pooled client.
+
+Boots the stub inference server, then fires the same number of text
+classification calls through (a) a fresh httpx.AsyncClient per call, as the
+backend used to, and (b) the app-lifetime InferenceClient.
+
+    python benchmarks/hf_pooling.py --requests 2000 --concurrency 100 --latency-ms 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from inference import InferenceClient  # noqa: E402
+from stub_inference import serve_in_thread  # noqa: E402
+
+MODEL = "stub/llm"
+BODY = {"inputs": "pothole on main road", "parameters": {"max_new_tokens": 64}}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+async def _per_call_client(base_url: str):
+    async with httpx.AsyncClient(timeout=60) as c:
+        r = await c.post(f"{base_url}/{MODEL}", headers={"Authorization": "Bearer bench"}, json=BODY)
+    r.raise_for_status()
+
+
+async def _drive(label: str, call, total: int, concurrency: int):
+    latencies, errors = [], 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22}{total / elapsed:>10.1f} req/s  p50 {_percentile(latencies, 50):7.1f} ms  "
+          f"p99 {_percentile(latencies, 99):7.1f} ms  errors {errors}")
+
+
+async def _run(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{args.requests} calls, concurrency {args.concurrency}, stub latency {args.latency_ms} ms")
+    await _drive("per-call client", lambda: _per_call_client(base_url), args.requests, args.concurrency)
+
+    pooled = InferenceClient(base_url, "bench", max_concurrency=args.concurrency,
+                             max_connections=args.concurrency, max_keepalive_connections=args.concurrency,
+                             http2=args.http2, breaker_failures=10 ** 9)
+    await pooled.start()
+    try:
+        await _drive("pooled client", lambda: pooled.post(MODEL, json=BODY), args.requests, args.concurrency)
+    finally:
+        await pooled.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--http2", action="store_true", help="negotiate HTTP/2 (needs TLS upstream to matter)")
+    args = parser.parse_args()
+    serve_in_thread(args.port, latency_ms=args.latency_ms)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
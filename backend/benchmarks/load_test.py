@@ -0,0 +1,386 @@
+"""
+End-to-end load test of the API against local stand-ins for its dependencies.
+
+- Mongo: a local mongod (--mongo-uri, database civic_connect_load), or with
+  --ephemeral-mongod a throwaway single-node replica set in a temp directory
+  (needs `mongod` on PATH; change streams work there).
+- Clerk: a local JWKS file and signing key (local_jwks.py); every virtual user
+  gets its own citizen token, admin routes use a token with the admin role claim.
+- Hugging Face: stub_inference.py with --hf-latency-ms and --hf-error-rate.
+
+Seeds --seed reports around a few hotspots in a city, boots the app with
+uvicorn (--workers), then runs --concurrency virtual users through a weighted
+mix of routes for --duration seconds. Throughput and p50/p95/p99 per route go
+to the console and, as JSON, to --out, so runs can be diffed.
+
+    python benchmarks/load_test.py --ephemeral-mongod --seed 50000 --duration 60 --out load.json
+    python benchmarks/load_test.py --skip-seed --mix write-heavy --workers 4 --concurrency 128
+    python benchmarks/load_test.py --weights feed=1,nearby=1 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+from local_jwks import load_signer, sign_token, write_files  # noqa: E402
+
+CITY_CENTER = (78.4867, 17.3850)  # lon, lat
+CITY_RADIUS_KM = 12
+HOTSPOTS = 15
+CATEGORIES = {
+    "Pothole": ("Public Works", ["Large pothole on {road}, two-wheelers swerving", "Road caved in near {place}", "Deep pothole outside {place} filling with water"]),
+    "Streetlight": ("Electrical", ["Streetlight not working on {road} for a week", "Lamp post sparking near {place}", "Whole stretch of {road} dark at night"]),
+    "Water Leakage": ("Water Board", ["Water pipe burst near {place}, street flooded", "Drinking water leaking on {road} since morning", "Sewage overflowing outside {place}"]),
+    "Sanitation": ("Sanitation", ["Garbage not collected near {place} for days", "Overflowing bins on {road}", "Waste dumped in the open next to {place}"]),
+    "Other": ("General", ["Fallen tree blocking {road}", "Broken footpath tiles near {place}", "Stray cattle on {road} causing jams"]),
+}
+ROADS = ["MG Road", "Station Road", "Ring Road", "Market Street", "Lake View Road", "Temple Street", "Old Highway"]
+PLACES = ["the bus stop", "the school gate", "the metro station", "the market", "the hospital", "the park entrance", "the temple"]
+STATUSES = ["Submitted"] * 2 + ["In Progress", "Resolved"]
+
+MIXES = {
+    "default": {"feed": 25, "nearby": 25, "report": 10, "my_reports": 15, "admin_page": 10, "smart_create": 10, "status_update": 5},
+    "read-heavy": {"feed": 35, "nearby": 35, "report": 10, "my_reports": 12, "admin_page": 6, "smart_create": 1, "status_update": 1},
+    "write-heavy": {"feed": 15, "nearby": 15, "report": 5, "my_reports": 10, "admin_page": 5, "smart_create": 35, "status_update": 15},
+}
+ADMIN_ID = "bench-admin"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def _start_mongod(workdir: str):
+    """Throwaway single-node replica set; returns (process, uri)."""
+    if not shutil.which("mongod"):
+        sys.exit("--ephemeral-mongod needs mongod on PATH")
+    port = _free_port()
+    dbpath = os.path.join(workdir, "mongod")
+    os.makedirs(dbpath)
+    proc = subprocess.Popen(
+        ["mongod", "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--replSet", "bench", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    client = MongoClient("127.0.0.1", port, directConnection=True, serverSelectionTimeoutMS=30000)
+    client.admin.command("ping")
+    client.admin.command("replSetInitiate", {"_id": "bench", "members": [{"_id": 0, "host": f"127.0.0.1:{port}"}]})
+    deadline = time.time() + 30
+    while not client.admin.command("hello").get("isWritablePrimary"):
+        if time.time() > deadline:
+            sys.exit("mongod did not become primary")
+        time.sleep(0.2)
+    client.close()
+    return proc, f"mongodb://127.0.0.1:{port}/?directConnection=true"
+
+
+def _random_point(hotspots):
+    # most reports cluster around hotspots (markets, junctions); the rest are spread out
+    if random.random() < 0.8:
+        lon, lat = random.choice(hotspots)
+        spread = 0.008
+        return lon + random.gauss(0, spread), lat + random.gauss(0, spread)
+    angle, dist = random.uniform(0, 2 * math.pi), CITY_RADIUS_KM / 111.0 * math.sqrt(random.random())
+    return CITY_CENTER[0] + dist * math.cos(angle), CITY_CENTER[1] + dist * math.sin(angle)
+
+
+def _report_text(category: str) -> str:
+    template = random.choice(CATEGORIES[category][1])
+    return template.format(road=random.choice(ROADS), place=random.choice(PLACES))
+
+
+def _seed(n: int, users: int, hotspots, batch: int = 10000):
+    import crud
+    import stats
+
+    crud.reports_collection.drop()
+    crud.votes_collection.drop()
+    crud.notifications_collection.drop()
+    crud.ensure_indexes()
+    crud.users_collection.update_one(
+        {"clerk_user_id": ADMIN_ID},
+        {"$set": {"clerk_user_id": ADMIN_ID, "email": "admin@bench.local", "role": "admin"}},
+        upsert=True,
+    )
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(n):
+        category = random.choice(list(CATEGORIES))
+        created_at = now - timedelta(minutes=random.uniform(0, 90 * 24 * 60))
+        status = random.choice(STATUSES)
+        lon, lat = _random_point(hotspots)
+        text = _report_text(category)
+        doc = {
+            "user_id": f"bench-user-{random.randrange(users)}",
+            "title": text[:100],
+            "category": category,
+            "urgency": random.choice(["Low", "Medium", "Medium", "High"]),
+            "assigned_department": CATEGORIES[category][0],
+            "original_text": text,
+            "image_url": None,
+            "location": {"type": "Point", "coordinates": [lon, lat]},
+            "status": status,
+            "upvotes": int(random.paretovariate(1.5)) - 1,
+            "admin_notes": [],
+            "progress_images": [],
+            "enrichment_status": "done",
+            "classified_by": "local",
+            "duplicate_count": 0,
+            "duplicates": [],
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        if status == "Resolved":
+            doc["resolved_at"] = doc["updated_at"] = min(now, created_at + timedelta(hours=random.expovariate(1 / 48)))
+        docs.append(doc)
+        if len(docs) >= batch:
+            crud.reports_collection.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        crud.reports_collection.insert_many(docs, ordered=False)
+    stats.rebuild()
+
+
+def _sample_ids(limit: int = 5000):
+    import crud
+    return [str(d["_id"]) for d in crud.reports_collection.aggregate([{"$sample": {"size": limit}}, {"$project": {"_id": 1}}])]
+
+
+def _start_app(port: int, workers: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit("the API exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code < 500:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    sys.exit("the API did not come up within 60s")
+
+
+class Workload:
+    def __init__(self, weights: dict, report_ids, hotspots, tokens, admin_token):
+        self.routes = list(weights)
+        self.weights = [weights[r] for r in self.routes]
+        self.report_ids = report_ids
+        self.hotspots = hotspots
+        self.tokens = tokens
+        self.admin = {"Authorization": f"Bearer {admin_token}"}
+
+    async def run_one(self, client: httpx.AsyncClient, user: int):
+        route = random.choices(self.routes, self.weights)[0]
+        citizen = {"Authorization": f"Bearer {self.tokens[user % len(self.tokens)]}"}
+        if route == "feed":
+            request = client.get("/api/reports", headers=citizen)
+        elif route == "nearby":
+            lon, lat = _random_point(self.hotspots)
+            params = {"lat": lat, "lng": lon, "max_distance_meters": 2000, "limit": 50,
+                      "order": random.choice(["distance", "recency", "upvotes"])}
+            request = client.get("/api/nearby", params=params, headers=citizen)
+        elif route == "report":
+            request = client.get(f"/api/report/{random.choice(self.report_ids)}", headers=self.admin)
+        elif route == "my_reports":
+            request = client.get("/api/my-reports", headers=citizen)
+        elif route == "admin_page":
+            params = {"page": random.randint(1, 5), "page_size": 50, "status_filter": random.choice([None, "Submitted"])}
+            request = client.get("/api/admin/reports", params={k: v for k, v in params.items() if v}, headers=self.admin)
+        elif route == "smart_create":
+            lon, lat = _random_point(self.hotspots)
+            data = {"text": _report_text(random.choice(list(CATEGORIES))), "latitude": str(lat), "longitude": str(lon)}
+            request = client.post("/api/smart-create", data=data, headers=citizen)
+        else:
+            payload = {"status": random.choice(["In Progress", "Resolved"]), "notes": "Crew dispatched"}
+            request = client.put(f"/api/admin/report/{random.choice(self.report_ids)}/status", json=payload, headers=self.admin)
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        return route, (time.perf_counter() - started) * 1000, ok
+
+
+async def _drive(base_url: str, workload: Workload, concurrency: int, duration: float, warmup: float):
+    samples = {route: [] for route in workload.routes}
+    errors = {route: 0 for route in workload.routes}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        measure_from, stop_at = start + warmup, start + warmup + duration
+
+        async def user(i):
+            while time.perf_counter() < stop_at:
+                route, ms, ok = await workload.run_one(client, i)
+                if time.perf_counter() >= measure_from:
+                    samples[route].append(ms)
+                    errors[route] += 0 if ok else 1
+
+        await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return samples, errors
+
+
+def _summarise(samples, errors, duration):
+    routes = {}
+    for route, values in sorted(samples.items()):
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors[route],
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(_percentile(values, 50), 2),
+            "p95_ms": round(_percentile(values, 95), 2),
+            "p99_ms": round(_percentile(values, 99), 2),
+            "max_ms": round(max(values), 2) if values else 0.0,
+        }
+    everything = [v for values in samples.values() for v in values]
+    total = {
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "rps": round(len(everything) / duration, 2),
+        "p50_ms": round(_percentile(everything, 50), 2),
+        "p95_ms": round(_percentile(everything, 95), 2),
+        "p99_ms": round(_percentile(everything, 99), 2),
+    }
+    return routes, total
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_weights(spec: str) -> dict:
+    weights = {}
+    for part in spec.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip() not in MIXES["default"]:
+            sys.exit(f"unknown route {route!r}; routes: {', '.join(MIXES['default'])}")
+        weights[route.strip()] = float(weight or 1)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db-name", default="civic_connect_load")
+    parser.add_argument("--ephemeral-mongod", action="store_true", help="start a throwaway mongod instead of using --mongo-uri")
+    parser.add_argument("--seed", type=int, default=20000, help="reports to seed")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data from a previous run")
+    parser.add_argument("--users", type=int, default=2000, help="distinct citizens in the seeded data")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the measurement")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--weights", help="custom mix, e.g. feed=3,nearby=2,smart_create=1 (overrides --mix)")
+    parser.add_argument("--hf-latency-ms", type=float, default=150)
+    parser.add_argument("--hf-error-rate", type=float, default=0.02)
+    parser.add_argument("--enrichment-mode", choices=["inline", "background"], default="inline")
+    parser.add_argument("--random-seed", type=int, default=42, help="makes the dataset and request sequence repeatable")
+    parser.add_argument("--out", default="load_test_results.json")
+    args = parser.parse_args()
+    random.seed(args.random_seed)
+    weights = _parse_weights(args.weights) if args.weights else MIXES[args.mix]
+
+    workdir = tempfile.mkdtemp(prefix="civic-load-")
+    processes = []
+    try:
+        mongo_uri = args.mongo_uri
+        if args.ephemeral_mongod:
+            mongod, mongo_uri = _start_mongod(workdir)
+            processes.append(mongod)
+        jwks_path, _ = write_files(os.path.join(workdir, "keys"))
+        pem, kid = load_signer(os.path.join(workdir, "keys"))
+        hf_port, api_port = _free_port(), _free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stub_inference.py"), "--port", str(hf_port),
+             "--latency-ms", str(args.hf_latency_ms), "--jitter-ms", str(args.hf_latency_ms / 3),
+             "--error-rate", str(args.hf_error_rate)],
+        ))
+        env = {
+            **os.environ,
+            "MONGO_URI": mongo_uri,
+            "MONGO_DB_NAME": args.db_name,
+            "CLERK_JWKS_FILE": jwks_path,
+            "HF_BASE": f"http://127.0.0.1:{hf_port}",
+            "HF_API_TOKEN": "stub",
+            "STATIC_UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "ENRICHMENT_MODE": args.enrichment_mode,
+        }
+        os.environ.update({"MONGO_URI": mongo_uri, "MONGO_DB_NAME": args.db_name})
+
+        hotspots = [(CITY_CENTER[0] + random.uniform(-0.08, 0.08), CITY_CENTER[1] + random.uniform(-0.08, 0.08)) for _ in range(HOTSPOTS)]
+        if not args.skip_seed:
+            started = time.perf_counter()
+            _seed(args.seed, args.users, hotspots)
+            print(f"Seeded {args.seed} reports in {time.perf_counter() - started:.1f}s")
+        report_ids = _sample_ids()
+        if not report_ids:
+            sys.exit("no reports to work with; drop --skip-seed")
+
+        processes.append(_start_app(api_port, args.workers, env))
+        tokens = [sign_token(pem, kid, f"bench-user-{i}", ttl=86400) for i in range(min(args.concurrency, args.users))]
+        admin_token = sign_token(pem, kid, ADMIN_ID, ttl=86400, metadata={"role": "admin"})
+        workload = Workload(weights, report_ids, hotspots, tokens, admin_token)
+
+        print(f"Running {args.concurrency} virtual users for {args.duration:.0f}s (+{args.warmup:.0f}s warm-up), mix: {weights}")
+        samples, errors = asyncio.run(_drive(f"http://127.0.0.1:{api_port}", workload, args.concurrency, args.duration, args.warmup))
+        routes, total = _summarise(samples, errors, args.duration)
+
+        print(f"\n{'route':<15}{'reqs':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for route, r in list(routes.items()) + [("ALL", total)]:
+            print(f"{route:<15}{r['requests']:>8}{r['errors']:>8}{r['rps']:>9.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+        result = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "mongo_uri")},
+            "weights": weights,
+            "routes": routes,
+            "total": total,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    finally:
+        for proc in reversed(processes):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
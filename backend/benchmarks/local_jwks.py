@@ -0,0 +1,77 @@
+"""
+Local stand-in for Clerk's signing keys.
+
+Generates an RSA key pair, writes the public half as a JWKS file (point
+CLERK_JWKS_FILE at it) and the private half as PEM, and signs test tokens.
+
+    python benchmarks/local_jwks.py --out-dir /tmp/civic-jwks
+    python benchmarks/local_jwks.py --out-dir /tmp/civic-jwks --sign user_123
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+
+def make_signing_key(kid: str = "local-test-key") -> Tuple[str, Dict[str, Any]]:
+    """Returns (private key PEM, JWKS dict containing the public key)."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("ascii")
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    public.update({"kid": kid, "use": "sig", "alg": "RS256"})
+    return pem, {"keys": [public]}
+
+
+def sign_token(private_pem: str, kid: str, sub: str, ttl: int = 3600, **claims: Any) -> str:
+    now = int(time.time())
+    payload = {"sub": sub, "iat": now, "nbf": now, "exp": now + ttl, **claims}
+    return jwt.encode(payload, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+def write_files(out_dir: str, kid: str = "local-test-key") -> Tuple[str, str]:
+    """Writes jwks.json and signing-key.pem into `out_dir`, reusing an existing pair; returns both paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    jwks_path = os.path.join(out_dir, "jwks.json")
+    key_path = os.path.join(out_dir, "signing-key.pem")
+    if not (os.path.exists(jwks_path) and os.path.exists(key_path)):
+        pem, jwks = make_signing_key(kid)
+        with open(key_path, "w", encoding="ascii") as f:
+            f.write(pem)
+        with open(jwks_path, "w", encoding="utf-8") as f:
+            json.dump(jwks, f)
+    return jwks_path, key_path
+
+
+def load_signer(out_dir: str) -> Tuple[str, str]:
+    """Returns (private key PEM, kid) from files written by write_files."""
+    jwks_path, key_path = write_files(out_dir)
+    with open(key_path, encoding="ascii") as f:
+        pem = f.read()
+    with open(jwks_path, encoding="utf-8") as f:
+        kid = json.load(f)["keys"][0]["kid"]
+    return pem, kid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default="benchmarks/.keys")
+    parser.add_argument("--sign", metavar="USER_ID", help="print a token for this subject")
+    parser.add_argument("--ttl", type=int, default=3600)
+    args = parser.parse_args()
+    jwks_path, key_path = write_files(args.out_dir)
+    if args.sign:
+        pem, kid = load_signer(args.out_dir)
+        print(sign_token(pem, kid, args.sign, ttl=args.ttl))
+    else:
+        print(f"CLERK_JWKS_FILE={jwks_path}\nsigning key: {key_path}")
+
+
+if __name__ == "__main__":
+    main()
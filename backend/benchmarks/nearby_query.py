@@ -0,0 +1,109 @@
+"""
+/nearby query cost on a large seeded collection, before and after the bounded
+$geoNear rewrite.
+
+"before" replays the old crud.get_reports_nearby: an unbounded $near, re-sorted
+by created_at, with every document validated through ReportInDB. "after" runs
+the new distance- and recency-ordered queries with a limit and the map
+projection. Needs a local mongod; seeding 1M reports takes a few minutes, so
+pass --skip-seed on later runs.
+
+    python benchmarks/nearby_query.py --seed 1000000 --radius 5000 --limit 100
+    python benchmarks/nearby_query.py --skip-seed --runs 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_DB_NAME", "civic_connect_bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crud  # noqa: E402
+
+CITY_CENTER = (78.4867, 17.3850)  # lon, lat
+CATEGORIES = ["Pothole", "Garbage", "Streetlight", "Water Leakage", "Other"]
+STATUSES = ["Submitted", "In Progress", "Resolved"]
+
+
+def _old_nearby(lon, lat, max_distance_meters):
+    query = {"location": {"$near": {"$geometry": {"type": "Point", "coordinates": [lon, lat]}, "$maxDistance": max_distance_meters}}}
+    cursor = crud.reports_collection.find(query).sort("created_at", -1)
+    return [crud.ReportInDB.model_validate(doc).model_dump() for doc in cursor]
+
+
+def _seed(n: int, spread: float, batch: int = 10000):
+    crud.reports_collection.drop()
+    crud.ensure_indexes()
+    now = datetime.now(timezone.utc)
+    lon0, lat0 = CITY_CENTER
+    for start in range(0, n, batch):
+        docs = []
+        for i in range(start, min(n, start + batch)):
+            # gaussian around the centre so the middle wards are dense
+            lon = lon0 + random.gauss(0, spread)
+            lat = lat0 + random.gauss(0, spread)
+            docs.append({
+                "user_id": f"bench-user-{i % 5000}",
+                "title": "Benchmark report",
+                "original_text": "Seeded report for the nearby benchmark, long enough to look like a real description.",
+                "category": random.choice(CATEGORIES),
+                "urgency": "Medium",
+                "status": random.choice(STATUSES),
+                "assigned_department": "Public Works",
+                "location": {"type": "Point", "coordinates": [lon, lat]},
+                "image_url": f"/static/uploads/{i:08x}.jpg",
+                "upvotes": 0,
+                "admin_notes": [],
+                "created_at": now - timedelta(seconds=random.randint(0, 365 * 86400)),
+            })
+        crud.reports_collection.insert_many(docs, ordered=False)
+        print(f"  seeded {min(n, start + batch)}/{n}", end="\r", flush=True)
+    print()
+
+
+def _measure(label, fn, points, runs):
+    samples, sizes = [], []
+    for i in range(runs):
+        lon, lat = points[i % len(points)]
+        started = time.perf_counter()
+        docs = fn(lon, lat)
+        samples.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(docs))
+    ordered = sorted(samples)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    print(f"{label:<26}{statistics.median(samples):>10.1f}{p99:>10.1f}{statistics.mean(sizes):>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1000000, help="reports to seed")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the existing bench collection")
+    parser.add_argument("--spread", type=float, default=0.08, help="std-dev of seeded points, in degrees")
+    parser.add_argument("--radius", type=int, default=5000, help="max_distance_meters")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=50, help="queries per variant")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f"Seeding {args.seed} reports into {crud.DB_NAME}")
+        _seed(args.seed, args.spread)
+    crud.ensure_indexes()
+
+    lon0, lat0 = CITY_CENTER
+    points = [(lon0 + random.gauss(0, 0.02), lat0 + random.gauss(0, 0.02)) for _ in range(args.runs)]
+    radius, limit = args.radius, args.limit
+    print(f"\nradius {radius} m, limit {limit}, {args.runs} queries each")
+    print(f"{'variant':<26}{'p50 ms':>10}{'p99 ms':>10}{'docs/query':>12}")
+    _measure("before ($near, unbounded)", lambda lon, lat: _old_nearby(lon, lat, radius), points, args.runs)
+    _measure("after, by distance", lambda lon, lat: crud.get_reports_nearby_by_distance(lon, lat, radius, limit), points, args.runs)
+    _measure("after, by recency", lambda lon, lat: crud.get_reports_nearby_sorted(lon, lat, radius, limit), points, args.runs)
+    _measure("after, distance+status", lambda lon, lat: crud.get_reports_nearby_by_distance(
+        lon, lat, radius, limit, query={"status": "Submitted"}), points, args.runs)
+
+
+if __name__ == "__main__":
+    main()
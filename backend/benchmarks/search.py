@@ -0,0 +1,123 @@
+"""
+Admin search latency on a seeded corpus (1M reports by default).
+
+"regex scan" is what finding a street name costs without the text index: a
+case-insensitive $regex over title and original_text. The other variants call
+crud.search_reports the way GET /api/admin/reports/search does: one page by
+relevance with or without the $facet counts, restricted to a radius, paged
+with a cursor, and a radius-only browse that runs on the GEOSPHERE index.
+Needs a local mongod; seeding and building the text index take several
+minutes, so pass --skip-seed on later runs.
+
+    python benchmarks/search.py --seed 1000000 --runs 50
+    python benchmarks/search.py --skip-seed --limit 50 --radius 3000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_DB_NAME", "civic_connect_bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson.objectid import ObjectId  # noqa: E402
+
+import crud  # noqa: E402
+from load_test import CATEGORIES, CITY_CENTER, PLACES, ROADS  # noqa: E402
+
+QUERIES = ["school", "MG Road", "\"bus stop\"", "burst pipe", "garbage market", "streetlight sparking", "sewage", "fallen tree"]
+STATUSES = ["Submitted", "In Progress", "Resolved"]
+PROJECTION = crud.report_projection(("title", "category", "urgency", "status", "assigned_department", "location", "upvotes", "created_at"))
+
+
+def _seed(n: int, spread: float, batch: int = 10000):
+    crud.reports_collection.drop()
+    now = datetime.now(timezone.utc)
+    lon0, lat0 = CITY_CENTER
+    for start in range(0, n, batch):
+        docs = []
+        for i in range(start, min(n, start + batch)):
+            category = random.choice(list(CATEGORIES))
+            department, templates = CATEGORIES[category]
+            text = random.choice(templates).format(road=random.choice(ROADS), place=random.choice(PLACES))
+            docs.append({
+                "user_id": f"bench-user-{i % 5000}",
+                "title": text[:100],
+                "original_text": f"{text}. Reported by a resident, please send someone to look at it.",
+                "category": category,
+                "urgency": random.choice(["Low", "Medium", "High"]),
+                "status": random.choice(STATUSES),
+                "assigned_department": department,
+                "location": {"type": "Point", "coordinates": [lon0 + random.gauss(0, spread), lat0 + random.gauss(0, spread)]},
+                "upvotes": 0,
+                "admin_notes": [],
+                "created_at": now - timedelta(seconds=random.randint(0, 365 * 86400)),
+            })
+        crud.reports_collection.insert_many(docs, ordered=False)
+        print(f"  seeded {min(n, start + batch)}/{n}", end="\r", flush=True)
+    print()
+
+
+def _regex_scan(term: str, limit: int):
+    pattern = {"$regex": term.strip('"'), "$options": "i"}
+    query = {"$or": [{"title": pattern}, {"original_text": pattern}]}
+    return list(crud.reports_collection.find(query, PROJECTION).sort(crud.NEWEST_FIRST).limit(limit))
+
+
+def _second_page(term: str, limit: int):
+    first = crud.search_reports(term, limit, projection=PROJECTION, facets=False)["results"]
+    if not first:
+        return []
+    last = first[-1]
+    return crud.search_reports(term, limit, after=(last["score"], ObjectId(last["id"])), projection=PROJECTION, facets=False)["results"]
+
+
+def _measure(label, fn, runs):
+    samples, sizes = [], []
+    for i in range(runs):
+        started = time.perf_counter()
+        sizes.append(len(fn(QUERIES[i % len(QUERIES)])))
+        samples.append((time.perf_counter() - started) * 1000)
+    ordered = sorted(samples)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    print(f"{label:<28}{statistics.median(samples):>10.1f}{p95:>10.1f}{p99:>10.1f}{statistics.mean(sizes):>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=1000000, help="reports to seed")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the existing bench collection")
+    parser.add_argument("--spread", type=float, default=0.08, help="std-dev of seeded points, in degrees")
+    parser.add_argument("--radius", type=int, default=2000, help="radius_meters for the geo variants")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=40, help="queries per variant")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        print(f"Seeding {args.seed} reports into {crud.DB_NAME}")
+        _seed(args.seed, args.spread)
+    started = time.perf_counter()
+    crud.ensure_indexes()
+    print(f"Indexes ready in {time.perf_counter() - started:.1f}s")
+
+    limit = args.limit
+    near = (CITY_CENTER[0], CITY_CENTER[1], args.radius)
+    print(f"\nlimit {limit}, radius {args.radius} m, {args.runs} queries each")
+    print(f"{'variant':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'docs/query':>12}")
+    _measure("regex scan", lambda q: _regex_scan(q, limit), args.runs)
+    _measure("text, page only", lambda q: crud.search_reports(q, limit, projection=PROJECTION, facets=False)["results"], args.runs)
+    _measure("text + facets", lambda q: crud.search_reports(q, limit, projection=PROJECTION)["results"], args.runs)
+    _measure("text + status filter", lambda q: crud.search_reports(
+        q, limit, query={"status": "Submitted"}, projection=PROJECTION)["results"], args.runs)
+    _measure("text + radius + facets", lambda q: crud.search_reports(q, limit, near=near, projection=PROJECTION)["results"], args.runs)
+    _measure("text, second page", lambda q: _second_page(q, limit), args.runs)
+    _measure("radius only + facets", lambda q: crud.search_reports(None, limit, near=near, projection=PROJECTION)["results"], args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+CPU per list response, old serialization path vs the serialization module.
+
+"before" does what the list routes used to do for each page: ReportInDB
+validate + model_dump (my-reports / nearby) or the _id rename loop (feed /
+admin), then FastAPI's jsonable_encoder and json.dumps. "after" encodes the
+documents as the report_projection query returns them (id already a string,
+image already picked) with serialization.dumps, plus the in-memory
+shape_report path the hot feed uses. No database needed; documents are
+synthetic but shaped like real ones.
+
+    python benchmarks/serialization_cpu.py --page-size 200 --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+import crud  # noqa: E402
+import serialization  # noqa: E402
+from serialization import ADMIN_LIST_FIELDS, LIST_FIELDS, RawJSONResponse, shape_report  # noqa: E402
+
+
+def _raw_doc(i: int) -> dict:
+    now = datetime.utcnow()
+    digest = f"{random.getrandbits(256):064x}"
+    return {
+        "_id": ObjectId(),
+        "user_id": f"user_{i % 500}",
+        "title": "Overflowing garbage bin near the bus stop",
+        "category": "Sanitation",
+        "urgency": "Medium",
+        "assigned_department": "Sanitation",
+        "original_text": "The garbage bin next to the bus stop has been overflowing for three days and smells. " * 3,
+        "image_url": f"/static/uploads/{digest}.jpg",
+        "image_variants": {"thumb": f"/static/uploads/{digest}-thumb.webp", "medium": f"/static/uploads/{digest}-medium.webp"},
+        "video_url": None,
+        "voice_note_url": None,
+        "location": {"type": "Point", "coordinates": [78.48 + random.random() / 10, 17.38 + random.random() / 10]},
+        "status": random.choice(["Submitted", "In Progress", "Resolved"]),
+        "upvotes": random.randint(0, 50),
+        "admin_notes": [{"note": "Crew assigned", "by": "admin_1", "at": now}],
+        "progress_images": [],
+        "resolved_image_url": None,
+        "enrichment_status": "done",
+        "classified_by": "local",
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now,
+    }
+
+
+def _projected(doc: dict, fields) -> dict:
+    # what Mongo hands back for report_projection(fields, "thumb")
+    return shape_report(doc, fields, "thumb")
+
+
+def _old_select_image(doc, image_size):
+    variant = (doc.get("image_variants") or {}).get(image_size)
+    if variant:
+        doc["original_image_url"] = doc.get("image_url")
+        doc["image_url"] = variant
+    return doc
+
+
+def _before_pydantic(docs):
+    data = []
+    for doc in docs:
+        d = crud.ReportInDB.model_validate(doc).model_dump()
+        d["id"] = str(d["id"])  # the old route never did this and failed to encode ObjectId
+        data.append(_old_select_image(d, "thumb"))
+    return json.dumps(jsonable_encoder({"status": "success", "data": data})).encode("utf-8")
+
+
+def _before_dicts(docs):
+    data = []
+    for doc in docs:
+        r = dict(doc)
+        r["id"] = str(r["_id"])
+        r.pop("_id", None)
+        data.append(_old_select_image(r, "thumb"))
+    return json.dumps(jsonable_encoder({"status": "success", "data": data})).encode("utf-8")
+
+
+def _after_projected(docs):
+    return RawJSONResponse({"status": "success", "data": docs}).body
+
+
+def _after_in_memory(docs):
+    return serialization.dumps({"status": "success", "data": [shape_report(d, LIST_FIELDS, "thumb") for d in docs]})
+
+
+def _measure(label, fn, pages):
+    sizes = []
+    started = time.process_time()
+    for docs in pages:
+        sizes.append(len(fn(docs)))
+    cpu_ms = (time.process_time() - started) * 1000 / len(pages)
+    print(f"{label:<42}{cpu_ms:>10.3f}{sum(sizes) / len(sizes) / 1024:>12.1f}")
+    return cpu_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=300, help="pages encoded per variant")
+    args = parser.parse_args()
+
+    raw_pages = [[_raw_doc(i) for i in range(args.page_size)] for _ in range(min(args.requests, 20))]
+    raw_pages = [raw_pages[i % len(raw_pages)] for i in range(args.requests)]
+    list_pages = [[_projected(d, LIST_FIELDS) for d in page] for page in raw_pages]
+    admin_pages = [[_projected(d, ADMIN_LIST_FIELDS) for d in page] for page in raw_pages]
+
+    print(f"page size {args.page_size}, {args.requests} pages, orjson={'yes' if serialization._ORJSON_AVAILABLE else 'no'}")
+    print(f"{'variant':<42}{'cpu ms/req':>10}{'KiB/resp':>12}")
+    base = _measure("before: validate + model_dump + encoder", _before_pydantic, raw_pages)
+    _measure("before: _id rename loop + encoder", _before_dicts, raw_pages)
+    after = _measure("after: projected docs, list fields", _after_projected, list_pages)
+    _measure("after: projected docs, admin fields", _after_projected, admin_pages)
+    _measure("after: shape_report in memory (feed)", _after_in_memory, raw_pages)
+    print(f"\nmodel_dump path -> projected path: {base / after:.1f}x less CPU per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Local stand-in for the Hugging Face inference API.
+
+Answers POST /{model} with a caption for multipart image uploads and a JSON
+classification for text prompts, after a configurable latency and with a
+configurable error rate. Point the backend at it with HF_BASE.
+
+    python benchmarks/stub_inference.py --port 8081 --latency-ms 150 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+KEYWORDS = (
+    ("pothole", "Pothole", "Public Works", "Medium"),
+    ("light", "Streetlight", "Electrical", "Medium"),
+    ("water", "Water Leakage", "Water Board", "High"),
+    ("leak", "Water Leakage", "Water Board", "High"),
+    ("garbage", "Sanitation", "Sanitation", "Low"),
+)
+
+
+def build_app(latency_ms: float = 100, error_rate: float = 0.0, jitter_ms: float = 0) -> FastAPI:
+    app = FastAPI(title="Stub inference")
+    app.state.calls = 0
+
+    @app.post("/{model:path}")
+    async def infer(model: str, request: Request):
+        app.state.calls += 1
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            return JSONResponse(status_code=503, content={"error": "Model is currently loading"})
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            return [{"generated_text": "a large pothole in the middle of a road"}]
+        body = await request.json()
+        prompt = str(body.get("inputs", "")).lower()
+        category, department, urgency = "Other", "General", "Low"
+        for keyword, cat, dep, urg in KEYWORDS:
+            if keyword in prompt:
+                category, department, urgency = cat, dep, urg
+                break
+        out = {"title": f"{category} reported", "category": category, "urgency": urgency,
+               "assigned_department": department, "description": prompt[:200]}
+        return [{"generated_text": json.dumps(out)}]
+
+    return app
+
+
+def serve_in_thread(port: int, **kwargs) -> uvicorn.Server:
+    """Starts the stub on 127.0.0.1:port in a daemon thread and waits until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(build_app(**kwargs), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = build_app(latency_ms=args.latency_ms, error_rate=args.error_rate, jitter_ms=args.jitter_ms)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import crud
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def image_digest(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+
+def text_digest(*parts: Optional[str]) -> str:
+    return hashlib.sha256("\x1f".join(normalize_text(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    """
+    Two-tier cache for inference results: an in-process TTL LRU in front of the
+    Mongo `inference_cache` collection. The model name is part of every key, so
+    switching models never serves stale answers; purge_stale drops the old rows.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600.0, persist_seconds: float = 30 * 86400):
+        self._memory = TTLCache(maxsize, ttl)
+        self.persist_seconds = persist_seconds
+        self._counters = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _key(kind: str, model: str, digest: str) -> str:
+        return f"{kind}:{model}:{digest}"
+
+    async def get(self, kind: str, model: str, digest: str) -> Any:
+        key = self._key(kind, model, digest)
+        value = self._memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._counters["memory_hits"] += 1
+            return value
+        try:
+            value = await crud.run_db(crud.get_cached_inference, key)
+        except Exception:
+            self._counters["errors"] += 1
+            value = None
+        if value is None:
+            self._counters["misses"] += 1
+            return None
+        self._counters["persistent_hits"] += 1
+        self._memory.set(key, value)
+        return value
+
+    async def set(self, kind: str, model: str, digest: str, value: Any) -> None:
+        key = self._key(kind, model, digest)
+        self._memory.set(key, value)
+        try:
+            await crud.run_db(crud.put_cached_inference, key, kind, model, value, self.persist_seconds)
+        except Exception:
+            self._counters["errors"] += 1
+
+    async def purge_stale(self, current_models: Dict[str, str]) -> int:
+        """Deletes persisted entries of each kind produced by a model other than the current one."""
+        removed = 0
+        for kind, model in current_models.items():
+            removed += await crud.run_db(crud.purge_inference_cache, kind, model)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(self._counters[k] for k in ("memory_hits", "persistent_hits", "misses"))
+        hits = self._counters["memory_hits"] + self._counters["persistent_hits"]
+        return {**self._counters, "memory_entries": len(self._memory), "hit_ratio": hits / lookups if lookups else 0.0}
@@ -0,0 +1,103 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+load_dotenv()
+from pymongo.errors import OperationFailure
+
+# Background tailing of a Mongo change stream, shared by the hot feed, the
+# notification hub and the role cache. The stream runs on its own thread; when
+# it fails (failover, network blip) it is reopened after CHANGE_STREAM_RETRY_SECONDS,
+# doubling up to CHANGE_STREAM_MAX_RETRY_SECONDS, and resumes after the last
+# event seen. When it cannot resume (no token yet, or the oplog has moved on)
+# the owner's on_gap() runs once the new stream is open, so it can resync
+# whatever it holds. A standalone mongod has no change streams at all; the
+# watcher then stops and the owner falls back to its local writes.
+
+CHANGE_STREAM_RETRY_SECONDS = float(os.getenv("CHANGE_STREAM_RETRY_SECONDS", "1"))
+CHANGE_STREAM_MAX_RETRY_SECONDS = float(os.getenv("CHANGE_STREAM_MAX_RETRY_SECONDS", "60"))
+
+# "only supported on replica sets", "not supported on this storage engine" and the like
+_UNSUPPORTED_CODES = {40573, 40324}
+# ChangeStreamHistoryLost, ChangeStreamFatalError, InvalidResumeToken
+_RESUME_FAILED_CODES = {286, 280, 260}
+
+
+class ChangeStreamWatcher:
+    def __init__(
+        self,
+        name: str,
+        open_stream: Callable[[Optional[Dict[str, Any]]], Any],
+        handle: Callable[[Dict[str, Any]], None],
+        on_gap: Optional[Callable[[], None]] = None,
+        retry_seconds: float = CHANGE_STREAM_RETRY_SECONDS,
+        max_retry_seconds: float = CHANGE_STREAM_MAX_RETRY_SECONDS,
+    ):
+        """`open_stream(resume_after)` opens the stream (a collection.watch(...) context manager)."""
+        self.name = name
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._open_stream = open_stream
+        self._handle = handle
+        self._on_gap = on_gap
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.active = False
+        self.restarts = 0
+
+    def _deliver(self, change: Dict[str, Any]) -> None:
+        try:
+            self._handle(change)
+        except Exception as e:
+            # a bad event must not make the stream replay it forever
+            print(f"{self.name} change handler failed: {e}")
+
+    def _gap(self) -> None:
+        if self._on_gap is not None:
+            try:
+                self._on_gap()
+            except Exception as e:
+                print(f"{self.name} resync failed: {e}")
+
+    def run(self) -> None:
+        token: Optional[Dict[str, Any]] = None
+        delay, failed = self.retry_seconds, False
+        while not self._stop.is_set():
+            try:
+                with self._open_stream(token) as stream:
+                    self.active = True
+                    if failed and token is None:
+                        # events between the failure and now are gone
+                        self._gap()
+                    failed, delay = False, self.retry_seconds
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        token = stream.resume_token or token
+                        if change is not None:
+                            self._deliver(change)
+            except OperationFailure as e:
+                if e.code in _UNSUPPORTED_CODES:
+                    print(f"{self.name} change stream unavailable: {e}")
+                    return
+                if e.code in _RESUME_FAILED_CODES:
+                    token = None
+                print(f"{self.name} change stream failed, reopening in {delay:g}s: {e}")
+            except Exception as e:
+                print(f"{self.name} change stream failed, reopening in {delay:g}s: {e}")
+            finally:
+                self.active = False
+            failed = True
+            self.restarts += 1
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_retry_seconds)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name=f"{self.name.lower().replace(' ', '-')}-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
@@ -0,0 +1,210 @@
+import json
+import math
+import os
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Local first-tier report classifier. A compiled keyword matcher handles the
+# obvious cases; an optional TF-IDF + softmax-regression model (plain JSON file,
+# trained by train_classifier.py) covers the rest. Callers only go to the LLM
+# when the combined confidence is below their threshold.
+
+CATEGORY_DEPARTMENTS = {
+    "Pothole": "Public Works",
+    "Streetlight": "Electrical",
+    "Water Leakage": "Water Board",
+    "Sanitation": "Sanitation",
+    "Other": "General",
+}
+CATEGORY_DEFAULT_URGENCY = {
+    "Pothole": "Medium",
+    "Streetlight": "Medium",
+    "Water Leakage": "High",
+    "Sanitation": "Low",
+    "Other": "Low",
+}
+
+# (category, weight, pattern); weight 2 for unambiguous terms, 1 for weak hints
+_KEYWORDS = [
+    ("Pothole", 2, r"pot ?holes?|craters?|cave[- ]?ins?|road (?:damage|broken|caved)"),
+    ("Pothole", 1, r"holes?|sink\w*|cracks?|uneven road"),
+    ("Streetlight", 2, r"street ?lights?|street ?lamps?|lamp ?posts?|light ?poles?"),
+    ("Streetlight", 1, r"lamps?|lights?|bulbs?|dark(?:ness)?|wires?|sparking"),
+    ("Water Leakage", 2, r"water ?leak\w*|pipe ?(?:burst|leak\w*)|burst pipes?|sewer\w*|sewage|drainage"),
+    ("Water Leakage", 1, r"water|leak\w*|flood\w*|drains?|pipes?|overflow\w*"),
+    ("Sanitation", 2, r"garbage|trash|rubbish|litter\w*|sanitation|waste ?dump\w*"),
+    ("Sanitation", 1, r"bins?|dump\w*|waste|stink\w*|smell\w*|dirty"),
+]
+_URGENCY_KEYWORDS = [
+    ("High", r"burst\w*|flood\w*|danger\w*|accidents?|injur\w*|live wires?|sparking|electrocut\w*|collaps\w*|urgent\w*|emergenc\w*"),
+    ("Low", r"minor|small|slight\w*|cosmetic"),
+]
+
+
+def _compile(entries) -> Tuple[re.Pattern, Dict[str, Any]]:
+    groups, meta = [], {}
+    for i, entry in enumerate(entries):
+        name = f"k{i}"
+        groups.append(f"(?P<{name}>{entry[-1]})")
+        meta[name] = entry[:-1]
+    return re.compile(r"\b(?:" + "|".join(groups) + r")\b", re.IGNORECASE), meta
+
+
+class KeywordMatcher:
+    """All keyword groups compiled into one alternation, so matching is a single regex pass."""
+
+    def __init__(self):
+        self._categories, self._category_meta = _compile(_KEYWORDS)
+        self._urgency, self._urgency_meta = _compile(_URGENCY_KEYWORDS)
+
+    def predict(self, text: str) -> Optional[Dict[str, Any]]:
+        scores: Counter = Counter()
+        for m in self._categories.finditer(text):
+            category, weight = self._category_meta[m.lastgroup]
+            scores[category] += weight
+        if not scores:
+            return None
+        (category, top), *rest = scores.most_common()
+        confidence = (1 - 0.5 ** top) * top / sum(scores.values())
+        urgency = CATEGORY_DEFAULT_URGENCY[category]
+        m = self._urgency.search(text)
+        if m:
+            (urgency,) = self._urgency_meta[m.lastgroup]
+        return {
+            "category": category,
+            "urgency": urgency,
+            "assigned_department": CATEGORY_DEPARTMENTS[category],
+            "confidence": round(confidence, 4),
+            "tier": "keywords",
+        }
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN_RE.findall((text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class LinearTextModel:
+    """TF-IDF features with one softmax-regression head per output field."""
+
+    def __init__(self, idf: Dict[str, float], heads: Dict[str, Dict[str, Any]]):
+        self.idf = idf
+        self.heads = heads
+
+    def vectorize(self, text: str) -> Dict[str, float]:
+        counts = Counter(t for t in tokenize(text) if t in self.idf)
+        vec = {t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {t: v / norm for t, v in vec.items()}
+
+    @staticmethod
+    def _softmax(head: Dict[str, Any], vec: Dict[str, float]) -> Dict[str, float]:
+        scores = {
+            label: head["bias"].get(label, 0.0) + sum(head["weights"][label].get(t, 0.0) * v for t, v in vec.items())
+            for label in head["labels"]
+        }
+        peak = max(scores.values())
+        exp = {label: math.exp(s - peak) for label, s in scores.items()}
+        total = sum(exp.values())
+        return {label: e / total for label, e in exp.items()}
+
+    def predict(self, text: str) -> Optional[Dict[str, Any]]:
+        vec = self.vectorize(text)
+        if not vec:
+            return None
+        out: Dict[str, Any] = {"tier": "model"}
+        confidences = []
+        for field, head in self.heads.items():
+            probs = self._softmax(head, vec)
+            label = max(probs, key=probs.get)
+            out[field] = label
+            if field != "urgency":
+                confidences.append(probs[label])
+        if "assigned_department" not in out and "category" in out:
+            out["assigned_department"] = CATEGORY_DEPARTMENTS.get(out["category"], "General")
+        out["confidence"] = round(min(confidences), 4) if confidences else 0.0
+        return out
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "idf": self.idf, "heads": self.heads}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearTextModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["idf"], data["heads"])
+
+    @classmethod
+    def train(
+        cls,
+        samples: Iterable[Tuple[str, Dict[str, str]]],
+        epochs: int = 15,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        min_df: int = 2,
+        seed: int = 13,
+    ) -> "LinearTextModel":
+        """Fits the model on (text, {field: label}) pairs with plain SGD."""
+        samples = [(text, labels) for text, labels in samples if text]
+        df: Counter = Counter()
+        for text, _ in samples:
+            df.update(set(tokenize(text)))
+        n = len(samples)
+        idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items() if c >= min_df}
+        model = cls(idf, {})
+        vectors = [model.vectorize(text) for text, _ in samples]
+        fields = sorted({f for _, labels in samples for f in labels})
+        rng = random.Random(seed)
+        for field in fields:
+            rows = [(vec, labels[field]) for vec, (_, labels) in zip(vectors, samples) if labels.get(field) and vec]
+            head = {"labels": sorted({label for _, label in rows}), "weights": {}, "bias": {}}
+            head["weights"] = {label: {} for label in head["labels"]}
+            head["bias"] = {label: 0.0 for label in head["labels"]}
+            for epoch in range(epochs):
+                rng.shuffle(rows)
+                lr = learning_rate / (1 + epoch)
+                for vec, target in rows:
+                    probs = cls._softmax(head, vec)
+                    for label in head["labels"]:
+                        grad = probs[label] - (1.0 if label == target else 0.0)
+                        weights = head["weights"][label]
+                        head["bias"][label] -= lr * grad
+                        for t, v in vec.items():
+                            weights[t] = weights.get(t, 0.0) * (1 - lr * l2) - lr * grad * v
+            for label in head["labels"]:
+                head["weights"][label] = {t: round(w, 5) for t, w in head["weights"][label].items() if abs(w) > 1e-4}
+            model.heads[field] = head
+        return model
+
+
+class TieredClassifier:
+    def __init__(self, model_path: Optional[str] = None):
+        self.keywords = KeywordMatcher()
+        self.model: Optional[LinearTextModel] = None
+        self.model_path = model_path
+        if model_path and os.path.exists(model_path):
+            try:
+                self.model = LinearTextModel.load(model_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load classifier model from {model_path}: {e}")
+
+    def predict(self, text: str) -> Optional[Dict[str, Any]]:
+        """Best local guess with a 0..1 confidence, or None when neither tier recognises the text."""
+        by_keywords = self.keywords.predict(text or "")
+        by_model = self.model.predict(text or "") if self.model else None
+        if not by_keywords or not by_model:
+            return by_keywords or by_model
+        if by_keywords["category"] == by_model["category"]:
+            combined = {**by_model, "tier": "keywords+model"}
+            combined["confidence"] = round(1 - (1 - by_keywords["confidence"]) * (1 - by_model["confidence"]), 4)
+            return combined
+        # disagreement: keep the stronger opinion, discounted by the other one
+        best, other = sorted((by_keywords, by_model), key=lambda p: p["confidence"], reverse=True)
+        return {**best, "confidence": round(best["confidence"] - other["confidence"], 4)}
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from cache import TTLCache
+from identity import role_cache
+
+# Clerk user sync. Every user.created / user.updated / user.deleted event (and
+# every row of a backfill) becomes one upsert keyed on clerk_user_id, guarded by
+# the user's Clerk updated_at, stored as clerk_updated_at: an event older than
+# what is stored misses the guard, its upsert hits the unique index and it is
+# dropped as stale. Retried or reordered deliveries are therefore harmless.
+# Deleted users keep a tombstone (deleted_at, no email or role) so a late
+# user.updated cannot bring them back.
+#
+# The webhook only verifies and enqueues; ClerkEventQueue writes the queue every
+# CLERK_SYNC_FLUSH_SECONDS (or once CLERK_SYNC_BATCH_SIZE events are waiting)
+# with one bulk_write. Message ids are remembered in memory and, after each
+# flush, in `webhook_events`, so redeliveries are skipped before any write.
+
+CLERK_SYNC_FLUSH_SECONDS = float(os.getenv("CLERK_SYNC_FLUSH_SECONDS", "0.5"))
+CLERK_SYNC_BATCH_SIZE = int(os.getenv("CLERK_SYNC_BATCH_SIZE", "500"))
+# beyond this many unwritten events the webhook answers 503 and Clerk retries later
+CLERK_SYNC_MAX_PENDING = int(os.getenv("CLERK_SYNC_MAX_PENDING", "10000"))
+USER_EVENTS = ("user.created", "user.updated", "user.deleted")
+
+
+def _primary_email(user: Dict[str, Any]) -> Optional[str]:
+    addresses = user.get("email_addresses") or []
+    for address in addresses:
+        if address.get("id") == user.get("primary_email_address_id"):
+            return address.get("email_address")
+    if addresses:
+        return addresses[0].get("email_address")
+    return user.get("primary_email_address") or user.get("email")
+
+
+def _role(user: Dict[str, Any]) -> Optional[str]:
+    # the same public_metadata.role a session token can carry (identity.JWT_ROLE_CLAIM)
+    metadata = user.get("public_metadata")
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata or "{}")
+    if not isinstance(metadata, dict) or "role" not in metadata:
+        return None
+    return "admin" if metadata["role"] == "admin" else "citizen"
+
+
+def _from_millis(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def user_operation(event_type: str, user: Dict[str, Any], version: int) -> UpdateOne:
+    """
+    The upsert for one Clerk user event. `version` is the user's updated_at in
+    milliseconds (or the event time for deletions); 0 for backfills without one.
+    Raises ValueError when the payload has no user id or, for a live user, no email.
+    """
+    clerk_user_id = user.get("id")
+    if not clerk_user_id:
+        raise ValueError("user id missing")
+    guard = {"clerk_user_id": clerk_user_id, "clerk_updated_at": {"$not": {"$gte": version}}}
+    if event_type == "user.deleted":
+        return UpdateOne(guard, {
+            "$set": {"clerk_updated_at": version, "deleted_at": datetime.now(timezone.utc)},
+            "$unset": {"email": "", "role": ""},
+        }, upsert=True)
+    email = _primary_email(user)
+    if not email:
+        raise ValueError(f"user {clerk_user_id} has no email address")
+    update: Dict[str, Any] = {
+        "$set": {"email": email, "clerk_updated_at": version},
+        "$setOnInsert": {"created_at": _from_millis(user.get("created_at")) or datetime.now(timezone.utc)},
+        "$unset": {"deleted_at": ""},
+    }
+    role = _role(user)
+    if role:
+        update["$set"]["role"] = role
+    else:
+        # an admin promoted in the database keeps the role until Clerk says otherwise
+        update["$setOnInsert"]["role"] = "citizen"
+    return UpdateOne(guard, update, upsert=True)
+
+
+def event_version(event: Dict[str, Any]) -> int:
+    data = event.get("data") or {}
+    return int(data.get("updated_at") or event.get("timestamp") or time.time() * 1000)
+
+
+class ClerkEventQueue:
+    def __init__(self, flush_interval: float = 0.5, batch_size: int = 500, max_pending: int = 10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: List[Tuple[str, Dict[str, Any]]] = []
+        # ids accepted by this process, so a quick redelivery is answered without a write
+        self._recent = TTLCache(maxsize=max(10 * max_pending, 10000), ttl=crud.WEBHOOK_EVENT_RETENTION_DAYS * 86400)
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"received": 0, "duplicates": 0, "flushes": 0, "upserted": 0, "modified": 0, "stale": 0, "errors": 0}
+
+    def submit(self, event_id: str, event: Dict[str, Any]) -> bool:
+        """Queues a verified event; False when the queue is full. Known ids are accepted and dropped."""
+        with self._lock:
+            if self._recent.get(event_id):
+                self._counters["duplicates"] += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                return False
+            self._recent.set(event_id, True)
+            self._pending.append((event_id, event))
+            self._counters["received"] += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        seen = crud.seen_webhook_events([event_id for event_id, _ in batch])
+        # the newest event per user is enough: the version guard would drop the others
+        latest: Dict[str, Tuple[int, UpdateOne]] = {}
+        for event_id, event in batch:
+            if event_id in seen:
+                continue
+            data = event.get("data") or {}
+            version = event_version(event)
+            try:
+                operation = user_operation(event["type"], data, version)
+            except ValueError as e:
+                print(f"Skipping Clerk event {event_id}: {e}")
+                continue
+            if data["id"] not in latest or latest[data["id"]][0] <= version:
+                latest[data["id"]] = (version, operation)
+        user_ids = list(latest)
+        result = crud.bulk_write_users([latest[clerk_user_id][1] for clerk_user_id in user_ids])
+        failed = set()
+        for err in result["errors"]:
+            failed.add(user_ids[err["index"]])
+            print(f"Clerk user sync write failed for {user_ids[err['index']]}: {err['errmsg']}")
+        for clerk_user_id in user_ids:
+            role_cache.invalidate(clerk_user_id)
+        for event_id, event in batch:
+            if (event.get("data") or {}).get("id") in failed:
+                self._recent.pop(event_id)
+        # recorded last: a crash before this line only means a harmless re-apply;
+        # events of failed writes stay unrecorded so a redelivery can apply them
+        crud.record_webhook_events([
+            {"_id": event_id, "type": event["type"]} for event_id, event in batch
+            if event_id not in seen and (event.get("data") or {}).get("id") not in failed
+        ])
+        return {**result, "duplicates": len(seen)}
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            if not batch:
+                return 0
+            try:
+                result = await crud.run_db(self._write, batch)
+            except Exception as e:
+                # put the events back in front for the next round
+                self._counters["errors"] += 1
+                print(f"Clerk user sync flush failed: {e}")
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+            self._counters["flushes"] += 1
+            self._counters["duplicates"] += result["duplicates"]
+            self._counters["errors"] += len(result["errors"])
+            for key in ("upserted", "modified", "stale"):
+                self._counters[key] += result[key]
+            return len(batch)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while await self.flush() >= self.batch_size:
+                pass
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while await self.flush():
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "pending": len(self._pending)}
+
+
+clerk_events = ClerkEventQueue(
+    flush_interval=CLERK_SYNC_FLUSH_SECONDS, batch_size=CLERK_SYNC_BATCH_SIZE, max_pending=CLERK_SYNC_MAX_PENDING,
+)
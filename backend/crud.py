@@ -1,18 +1,41 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Literal
-from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Literal
+from datetime import datetime, timezone, timedelta
 from bson.objectid import ObjectId
-from pymongo import MongoClient, GEOSPHERE
+from pymongo import MongoClient, GEOSPHERE, TEXT, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import math
 import os
 from dotenv import load_dotenv
 load_dotenv()
+from serialization import report_projection
+import metrics
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-DB_NAME = "civic_connect"
-client = MongoClient(MONGO_URI)
+DB_NAME = os.getenv("MONGO_DB_NAME", "civic_connect")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "10000"))
+# one thread per pooled connection so offloaded calls never queue on a socket checkout
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(MONGO_MAX_POOL_SIZE)))
+client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, timeoutMS=MONGO_TIMEOUT_MS, event_listeners=[metrics.mongo_listener])
 db = client[DB_NAME]
 users_collection = db.users
 reports_collection = db.reports
+inference_cache_collection = db.inference_cache
+notifications_collection = db.notifications
+votes_collection = db.votes
+report_stats_collection = db.report_stats
+report_stats_daily_collection = db.report_stats_daily
+webhook_events_collection = db.webhook_events
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+# processed webhook message ids are remembered this long for deduplication
+WEBHOOK_EVENT_RETENTION_DAYS = int(os.getenv("WEBHOOK_EVENT_RETENTION_DAYS", "7"))
+# duplicate submissions kept on a report (newest); duplicate_count keeps counting past it
+DUPLICATE_SUBMISSIONS_KEPT = int(os.getenv("DUPLICATE_SUBMISSIONS_KEPT", "20"))
 
 class UserInDB(BaseModel):
     clerk_user_id: str
@@ -28,6 +51,12 @@ class GeoJSON(BaseModel):
     type: str = "Point"
     coordinates: List[float]
 
+# the values a report may carry
+ALLOWED_CATEGORIES = {"Sanitation", "Pothole", "Streetlight", "Water Leakage", "Other"}
+ALLOWED_URGENCIES = {"Low", "Medium", "High"}
+ALLOWED_DEPARTMENTS = {"Sanitation", "Public Works", "Electrical", "Water Board", "General"}
+ALLOWED_STATUSES = {"Submitted", "In Progress", "Resolved"}
+
 class ReportInDB(BaseModel):
     id: Optional[ObjectId] = Field(None, alias="_id")
     user_id: str
@@ -37,6 +66,7 @@ class ReportInDB(BaseModel):
     assigned_department: str
     original_text: Optional[str] = None
     image_url: Optional[str] = None
+    image_variants: Optional[dict] = None
     video_url: Optional[str] = None
     voice_note_url: Optional[str] = None
     location: GeoJSON
@@ -45,6 +75,12 @@ class ReportInDB(BaseModel):
     admin_notes: list = Field(default_factory=list)
     progress_images: list = Field(default_factory=list)
     resolved_image_url: Optional[str] = None
+    enrichment_status: Optional[str] = None
+    classified_by: Optional[str] = None
+    # duplicates.fingerprint(): SimHash of the text, dHash of the photo
+    fingerprint: Optional[dict] = None
+    duplicate_count: int = 0
+    duplicates: list = Field(default_factory=list)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     class Config:
@@ -53,48 +89,302 @@ class ReportInDB(BaseModel):
         json_encoders = {ObjectId: str}
         arbitrary_types_allowed = True
 
+# Async access layer: pymongo is blocking, so routes hand every call to a bounded
+# thread pool instead of running it on the event loop.
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="mongo")
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking DB callable on the Mongo thread pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    # the caller's context goes along so command timings land in its request breakdown
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, ctx.run, functools.partial(fn, *args, **kwargs))
+
+# Called with the full document after every report write made through this module,
+# on the thread that made it; in-process caches such as the hot feed register here.
+_report_listeners: List[Callable[[dict], None]] = []
+
+def on_report_write(listener: Callable[[dict], None]) -> None:
+    _report_listeners.append(listener)
+
+def _report_written(doc: dict) -> None:
+    for listener in _report_listeners:
+        try:
+            listener(doc)
+        except Exception as e:
+            print(f"Report write listener failed: {e}")
+
+# Called with [(before, after), ...] for writes that can move a report between
+# department / category / status / urgency (before is None for a create), once
+# per batch; the materialized stats register here.
+_change_listeners: List[Callable[[List[tuple]], None]] = []
+
+def on_report_change(listener: Callable[[List[tuple]], None]) -> None:
+    _change_listeners.append(listener)
+
+def _report_changed(changes: List[tuple]) -> None:
+    if not changes:
+        return
+    for listener in _change_listeners:
+        try:
+            listener(changes)
+        except Exception as e:
+            print(f"Report change listener failed: {e}")
+
+def _applied(before: dict, set_fields: dict, push_fields: Optional[dict]) -> dict:
+    # the document as a $set/$push of single values leaves it
+    after = {**before, **set_fields}
+    for field, value in (push_fields or {}).items():
+        after[field] = list(before.get(field) or []) + [value]
+    return after
+
+def status_fields(new_status: str, now: Optional[datetime] = None) -> dict:
+    """$set part of a status change; resolutions are timestamped for the time-to-resolve stats."""
+    now = now or datetime.now(timezone.utc)
+    fields = {"status": new_status, "updated_at": now}
+    if new_status == "Resolved":
+        fields["resolved_at"] = now
+    return fields
+
+# Same pattern for notifications: the push hub registers here and fans each
+# persisted notification out to connected clients.
+_notification_listeners: List[Callable[[dict], None]] = []
+
+def on_notification(listener: Callable[[dict], None]) -> None:
+    _notification_listeners.append(listener)
+
+def create_notification(report: dict, kind: str, data: dict) -> dict:
+    """Persists one notification about `report` for its owner and its department, then notifies listeners."""
+    return create_notifications([(report, kind, data)])[0]
+
+def create_notifications(items: List[tuple]) -> List[dict]:
+    """create_notification for many (report, kind, data) at once, with a single insert_many."""
+    now = datetime.now(timezone.utc)
+    docs = [{
+        "user_id": report.get("user_id"),
+        "department": report.get("assigned_department"),
+        "report_id": report["_id"],
+        "report_title": report.get("title"),
+        "type": kind,
+        "data": data,
+        "created_at": now,
+    } for report, kind, data in items]
+    if not docs:
+        return docs
+    notifications_collection.insert_many(docs)
+    for doc in docs:
+        for listener in _notification_listeners:
+            try:
+                listener(doc)
+            except Exception as e:
+                print(f"Notification listener failed: {e}")
+    return docs
+
+def get_notifications(query: dict, after: Optional[ObjectId], limit: int) -> List[dict]:
+    """Notifications after the cursor id, oldest first; without a cursor, the newest `limit`, newest first."""
+    if after is None:
+        return list(notifications_collection.find(query).sort("_id", -1).limit(limit))
+    return list(notifications_collection.find({**query, "_id": {"$gt": after}}).sort("_id", 1).limit(limit))
+
 # CRUD functions (add/expand as needed)
-def create_user(clerk_user_id: str, email: str, role: str = 'citizen') -> Optional[UserInDB]:
-    if users_collection.find_one({"clerk_user_id": clerk_user_id}):
-        return None
-    user_data = {
-        "clerk_user_id": clerk_user_id,
-        "email": email,
-        "role": role,
-        "created_at": datetime.now(timezone.utc)
+def bulk_write_users(requests: List[Any]) -> dict:
+    """
+    Runs user upserts with one unordered bulk_write. Duplicate-key errors are
+    upserts whose version guard did not match an existing (newer) user and are
+    counted as stale; anything else is reported in `errors`.
+    """
+    if not requests:
+        return {"upserted": 0, "modified": 0, "stale": 0, "errors": []}
+    try:
+        result = users_collection.bulk_write(requests, ordered=False)
+        details, write_errors = result.bulk_api_result, []
+    except BulkWriteError as e:
+        details, write_errors = e.details, e.details["writeErrors"]
+    stale = sum(1 for err in write_errors if err.get("code") == 11000)
+    return {
+        "upserted": details.get("nUpserted", 0),
+        "modified": details.get("nModified", 0),
+        "stale": stale,
+        "errors": [{"index": err["index"], "errmsg": err.get("errmsg", "Write failed")} for err in write_errors if err.get("code") != 11000],
     }
-    result = users_collection.insert_one(user_data)
-    created_user = users_collection.find_one({"_id": result.inserted_id})
-    return UserInDB.model_validate(created_user) if created_user else None
+
+def seen_webhook_events(event_ids: List[str]) -> set:
+    return {doc["_id"] for doc in webhook_events_collection.find({"_id": {"$in": event_ids}}, {"_id": 1})}
+
+def record_webhook_events(events: List[dict]) -> None:
+    """Remembers processed message ids ({"_id", "type"}); ids already recorded are skipped."""
+    if not events:
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        webhook_events_collection.insert_many([{**e, "received_at": now} for e in events], ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details["writeErrors"]):
+            raise
 
 def get_user_by_clerk_id(clerk_user_id: str) -> Optional[UserInDB]:
     user_data = users_collection.find_one({"clerk_user_id": clerk_user_id})
     return UserInDB.model_validate(user_data) if user_data else None
 
+def get_user_role(clerk_user_id: str) -> Optional[str]:
+    user_doc = users_collection.find_one({"clerk_user_id": clerk_user_id}, {"role": 1})
+    return user_doc.get("role") if user_doc else None
+
 def create_report(report_data: ReportInDB) -> ReportInDB:
     report_dict = report_data.model_dump(by_alias=True, exclude={"id"})
     result = reports_collection.insert_one(report_dict)
     new_report = reports_collection.find_one({"_id": result.inserted_id})
+    _report_written(new_report)
+    _report_changed([(None, new_report)])
     return ReportInDB.model_validate(new_report)
 
-def get_reports_by_user_id(user_id: str) -> List[ReportInDB]:
-    cursor = reports_collection.find({"user_id": user_id}).sort("created_at", -1)
-    return [ReportInDB.model_validate(doc) for doc in cursor]
+def get_reports_by_user_id(user_id: str, projection: Optional[dict] = None) -> List[dict]:
+    return list(reports_collection.find({"user_id": user_id}, projection).sort("created_at", -1))
 
-def get_reports_nearby(longitude: float, latitude: float, max_distance_meters: int = 5000) -> List[ReportInDB]:
+# newest / most upvoted first, with _id as tie-breaker so keyset pagination is stable
+NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+TOP_VOTED = [("upvotes", -1), ("_id", -1)]
+
+def _keyset_after(query: dict, sort: list, after: Optional[tuple]) -> dict:
+    """Narrows `query` to rows after `after`, the (first sort key, _id) values of the previous page's last row."""
+    if not after:
+        return query
+    field, value, oid = sort[0][0], after[0], after[1]
+    return {"$and": [query, {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": oid}}]}]}
+
+EARTH_RADIUS_METERS = 6378100
+
+def get_reports_nearby_by_distance(
+    longitude: float,
+    latitude: float,
+    max_distance_meters: int,
+    limit: int,
+    query: Optional[dict] = None,
+    min_distance: Optional[float] = None,
+    exclude_ids: Optional[List[ObjectId]] = None,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    """Closest reports first, with the distance in `distance_meters`; resumes from `min_distance`."""
+    query = dict(query or {})
+    if exclude_ids:
+        query["_id"] = {"$nin": exclude_ids}
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [longitude, latitude]},
+        "distanceField": "distance_meters",
+        "maxDistance": max_distance_meters,
+        "spherical": True,
+        "key": "location",
+        "query": query,
+    }
+    if min_distance is not None:
+        geo_near["minDistance"] = min_distance
+    projection = {**(projection or report_projection()), "distance_meters": 1}
+    pipeline = [{"$geoNear": geo_near}, {"$limit": limit}, {"$project": projection}]
+    return list(reports_collection.aggregate(pipeline))
+
+def get_reports_nearby_sorted(
+    longitude: float,
+    latitude: float,
+    max_distance_meters: int,
+    limit: int,
+    sort: list = NEWEST_FIRST,
+    query: Optional[dict] = None,
+    after: Optional[tuple] = None,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    """Reports within the radius in `sort` order (NEWEST_FIRST or TOP_VOTED), keyset-paginated like the admin list."""
     query = {
-        "location": {
-            "$near": {
-                "$geometry": {
-                    "type": "Point",
-                    "coordinates": [longitude, latitude]
-                },
-                "$maxDistance": max_distance_meters
-            }
-        }
+        **(query or {}),
+        "location": {"$geoWithin": {"$centerSphere": [[longitude, latitude], max_distance_meters / EARTH_RADIUS_METERS]}},
     }
-    cursor = reports_collection.find(query).sort("created_at", -1)
-    return [ReportInDB.model_validate(doc) for doc in cursor]
+    query = _keyset_after(query, sort, after)
+    return list(reports_collection.find(query, projection or report_projection()).sort(sort).limit(limit))
+
+# text search: best match first; `score` is the textScore added by search_reports
+BEST_MATCH = [("score", -1), ("_id", -1)]
+SEARCH_FACETS = ("category", "status", "assigned_department", "urgency")
+
+def search_reports(
+    text: Optional[str],
+    limit: int,
+    query: Optional[dict] = None,
+    near: Optional[tuple] = None,
+    after: Optional[tuple] = None,
+    projection: Optional[dict] = None,
+    facets: bool = True,
+) -> dict:
+    """
+    A page of reports matching `text` (the text index), best match first, or,
+    without text, newest first. `near` is (longitude, latitude, meters). With
+    `facets`, the same aggregation also counts every match per SEARCH_FACETS
+    value and in total, through one $facet. Returns {"results", "facets", "total"}.
+    """
+    match = dict(query or {})
+    if near:
+        longitude, latitude, meters = near
+        match["location"] = {"$geoWithin": {"$centerSphere": [[longitude, latitude], meters / EARTH_RADIUS_METERS]}}
+    projection = dict(projection or report_projection())
+    if text:
+        match["$text"] = {"$search": text}
+        sort = BEST_MATCH
+        pipeline = [{"$match": match}, {"$addFields": {"score": {"$meta": "textScore"}}}]
+        projection["score"] = 1
+    else:
+        sort = NEWEST_FIRST
+        pipeline = [{"$match": match}]
+    page = []
+    if after:
+        page.append({"$match": _keyset_after({}, sort, after)})
+    # $sort directly followed by $limit keeps only the top `limit` rows in memory
+    page += [{"$sort": dict(sort)}, {"$limit": limit}, {"$project": projection}]
+    if not facets:
+        return {"results": list(reports_collection.aggregate(pipeline + page, allowDiskUse=True)), "facets": None, "total": None}
+    facet = {"results": page, "total": [{"$count": "n"}]}
+    facet.update({field: [{"$sortByCount": f"${field}"}] for field in SEARCH_FACETS})
+    row = next(reports_collection.aggregate(pipeline + [{"$facet": facet}], allowDiskUse=True), {})
+    total = row.get("total") or [{"n": 0}]
+    return {
+        "results": row.get("results", []),
+        "facets": {field: [{"value": c["_id"], "count": c["count"]} for c in row.get(field, [])] for field in SEARCH_FACETS},
+        "total": total[0]["n"],
+    }
+
+# web-mercator latitude limit; beyond it tile y is undefined
+MERCATOR_MAX_LAT = 85.05112878
+TILE_POINT_PROJECTION = report_projection(("title", "category", "urgency", "status", "location", "upvotes", "created_at"))
+
+def _area_query(area: Optional[dict]) -> dict:
+    if area is None:
+        return {"location.type": "Point"}
+    return {"location": {"$geoWithin": {"$geometry": area}}}
+
+def aggregate_report_cells(area: Optional[dict], zoom: int) -> List[dict]:
+    """
+    Report counts per web-mercator cell at `zoom` inside `area` (a GeoJSON polygon, or
+    None for everything), split by category and status. Each row has cx, cy, category,
+    status, count and the coordinate sums used for cluster centroids.
+    """
+    n = 2 ** zoom
+    lon = {"$arrayElemAt": ["$location.coordinates", 0]}
+    lat = {"$arrayElemAt": ["$location.coordinates", 1]}
+    rad = {"$degreesToRadians": {"$min": [{"$max": [lat, -MERCATOR_MAX_LAT]}, MERCATOR_MAX_LAT]}}
+    merc_y = {"$divide": [{"$ln": {"$add": [{"$tan": rad}, {"$divide": [1, {"$cos": rad}]}]}}, math.pi]}
+    pipeline = [
+        {"$match": _area_query(area)},
+        {"$project": {
+            "category": 1, "status": 1, "lon": lon, "lat": lat,
+            "cx": {"$min": [n - 1, {"$floor": {"$multiply": [{"$divide": [{"$add": [lon, 180]}, 360]}, n]}}]},
+            "cy": {"$min": [n - 1, {"$floor": {"$multiply": [{"$divide": [{"$subtract": [1, merc_y]}, 2]}, n]}}]},
+        }},
+        {"$group": {
+            "_id": {"cx": "$cx", "cy": "$cy", "category": "$category", "status": "$status"},
+            "count": {"$sum": 1}, "sum_lng": {"$sum": "$lon"}, "sum_lat": {"$sum": "$lat"},
+        }},
+    ]
+    return [{**row.pop("_id"), **row} for row in reports_collection.aggregate(pipeline)]
+
+def get_report_points(area: dict, limit: int) -> List[dict]:
+    return list(reports_collection.find(_area_query(area), TILE_POINT_PROJECTION).limit(limit))
 
 def get_reports_for_admin(department: Optional[str] = None) -> List[ReportInDB]:
     query = {}
@@ -103,21 +393,282 @@ def get_reports_for_admin(department: Optional[str] = None) -> List[ReportInDB]:
     cursor = reports_collection.find(query).sort("created_at", -1)
     return [ReportInDB.model_validate(doc) for doc in cursor]
 
+def get_recent_reports(limit: int = 100) -> List[dict]:
+    return list(reports_collection.find({}).sort("created_at", -1).limit(limit))
+
+def get_top_reports(limit: int, projection: Optional[dict] = None) -> List[dict]:
+    return list(reports_collection.find({}, projection).sort(TOP_VOTED).limit(limit))
+
+def get_report_by_id(report_id: ObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+    return reports_collection.find_one({"_id": report_id}, projection)
+
+def get_reports_by_ids(report_ids: List[ObjectId], projection: Optional[dict] = None) -> List[dict]:
+    return list(reports_collection.find({"_id": {"$in": report_ids}}, projection))
+
+def get_admin_reports_page(query: dict, page: int, page_size: int, projection: Optional[dict] = None) -> List[dict]:
+    return list(reports_collection.find(query, projection).sort(NEWEST_FIRST).skip((page - 1) * page_size).limit(page_size))
+
+def get_admin_reports_after(query: dict, after: Optional[tuple], page_size: int, projection: Optional[dict] = None) -> List[dict]:
+    """Keyset page: the `page_size` reports sorted after the (created_at, _id) pair `after`."""
+    query = _keyset_after(query, NEWEST_FIRST, after)
+    return list(reports_collection.find(query, projection).sort(NEWEST_FIRST).limit(page_size))
+
+def count_reports(query: dict) -> int:
+    return reports_collection.count_documents(query)
+
+def estimate_report_count() -> int:
+    # collection metadata only; ignores filters
+    return reports_collection.estimated_document_count()
+
 def update_report_status(report_id: str, new_status: str) -> Optional[ReportInDB]:
     try:
         obj_id = ObjectId(report_id)
     except Exception:
         return None
-    update_result = reports_collection.find_one_and_update(
-        {"_id": obj_id},
-        {"$set": {"status": new_status, "updated_at": datetime.now(timezone.utc)}},
-        return_document=True
+    changes = status_fields(new_status)
+    before = reports_collection.find_one_and_update({"_id": obj_id}, {"$set": changes})
+    if not before:
+        return None
+    update_result = {**before, **changes}
+    _report_written(update_result)
+    _report_changed([(before, update_result)])
+    create_notification(update_result, "status_changed", {"status": new_status})
+    return ReportInDB.model_validate(update_result)
+
+def update_report(report_id: ObjectId, set_fields: dict, push_fields: Optional[dict] = None) -> Optional[tuple]:
+    """Applies $set (and optionally $push) in one round trip; returns (before, after), or None if there is no such report."""
+    update = {"$set": set_fields}
+    if push_fields:
+        update["$push"] = push_fields
+    before = reports_collection.find_one_and_update({"_id": report_id}, update)
+    if not before:
+        return None
+    after = _applied(before, set_fields, push_fields)
+    _report_written(after)
+    _report_changed([(before, after)])
+    if "status" in set_fields:
+        create_notification(after, "status_changed", {"status": after["status"]})
+    return before, after
+
+def link_duplicate(report_id: ObjectId, submission: dict) -> Optional[dict]:
+    """Records a duplicate submission on the report it duplicates; returns the updated report."""
+    doc = reports_collection.find_one_and_update(
+        {"_id": report_id},
+        {
+            "$push": {"duplicates": {"$each": [submission], "$slice": -DUPLICATE_SUBMISSIONS_KEPT}},
+            "$inc": {"duplicate_count": 1},
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc:
+        _report_written(doc)
+    return doc
+
+# what bulk_update_reports' replay is computed from; an update only applies while these are unchanged
+_REPLAYED_FIELDS = ("status", "updated_at", "assigned_department", "category", "urgency")
+# per-update marker: later updates of the same report match on it, and it tells which ones applied
+BULK_OP_FIELD = "bulk_op"
+
+def _bulk_ops_applied(requests: List[tuple], upto: int) -> tuple:
+    """
+    After a bulk write in which fewer updates matched than were sent: the indexes
+    (below `upto`) that applied, and the ids of reports that no longer exist. The
+    updates of one report form a chain, so the ones that applied are the chain
+    up to the marker the report now carries.
+    """
+    ids = list({oid for oid, _ in requests[:upto]})
+    markers = {doc["_id"]: doc.get(BULK_OP_FIELD) for doc in reports_collection.find({"_id": {"$in": ids}}, {BULK_OP_FIELD: 1})}
+    applied = set()
+    for oid in ids:
+        chain = [n for n, (other, _) in enumerate(requests[:upto]) if other == oid]
+        last = next((n for n in chain if requests[n][1] == markers.get(oid)), None)
+        if last is not None:
+            applied.update(n for n in chain if n <= last)
+    return applied, set(ids) - set(markers)
+
+def bulk_update_reports(updates: List[tuple]) -> List[dict]:
+    """
+    Applies (report_id, set_fields, push_fields) updates with one ordered bulk_write,
+    one update per entry. Each update only matches the report as it was read (or
+    as the previous update of it left it), so a write from elsewhere in between
+    is never overwritten or replayed wrongly. Returns a {"before", "after", "error"}
+    entry per update: a missing report, an update that lost such a race, the
+    update that failed and everything after it get an error and no `after`.
+    Status changes are announced in one notification batch.
+    """
+    current = {doc["_id"]: doc for doc in reports_collection.find({"_id": {"$in": list({u[0] for u in updates})}})}
+    results, requests, positions = [], [], []
+    expected = {}  # report id -> filter the next update of it has to match
+    for oid, set_fields, push_fields in updates:
+        if oid not in current:
+            results.append({"before": None, "after": None, "error": "Report not found"})
+            continue
+        marker = ObjectId()
+        update = {"$set": {**set_fields, BULK_OP_FIELD: marker}}
+        if push_fields:
+            update["$push"] = push_fields
+        query = expected.get(oid) or {f: current[oid].get(f) for f in _REPLAYED_FIELDS}
+        expected[oid] = {BULK_OP_FIELD: marker}
+        positions.append(len(results))
+        requests.append((oid, marker, UpdateOne({"_id": oid, **query}, update)))
+        results.append({"before": None, "after": None, "error": None})
+    failed_at, failure, matched = len(requests), None, len(requests)
+    if requests:
+        try:
+            matched = reports_collection.bulk_write([r[2] for r in requests], ordered=True).matched_count
+        except BulkWriteError as e:
+            first = e.details["writeErrors"][0]
+            failed_at, failure = first["index"], first.get("errmsg", "Write failed")
+            matched = e.details.get("nMatched", 0)
+    applied, gone = set(range(failed_at)), set()
+    if matched < failed_at:
+        # some report was written to or deleted between the read and the bulk write
+        applied, gone = _bulk_ops_applied([(oid, marker) for oid, marker, _ in requests], failed_at)
+    # replay the applied updates in memory; an id may appear more than once
+    notify, changes = [], []
+    for n, pos in enumerate(positions):
+        oid, set_fields, push_fields = updates[pos]
+        if n >= failed_at:
+            results[pos]["error"] = failure if n == failed_at else "Not applied: an earlier update failed"
+            continue
+        if n not in applied:
+            results[pos]["error"] = "Report not found" if oid in gone else "Report changed during the update; retry"
+            continue
+        before = current[oid]
+        after = _applied(before, {**set_fields, BULK_OP_FIELD: requests[n][1]}, push_fields)
+        current[oid] = after
+        results[pos]["before"], results[pos]["after"] = before, after
+        changes.append((before, after))
+        if "status" in set_fields:
+            notify.append((after, "status_changed", {"status": after["status"]}))
+    for oid in {requests[n][0] for n in applied}:
+        _report_written(current[oid])
+    _report_changed(changes)
+    create_notifications(notify)
+    return results
+
+def insert_reports(docs: List[dict]) -> List[dict]:
+    """
+    Inserts already-validated report documents with one unordered insert_many.
+    Returns the write errors ({"index", "code", "errmsg"}); every other document
+    was inserted and has its _id set.
+    """
+    if not docs:
+        return []
+    errors = []
+    try:
+        reports_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = [{"index": err["index"], "code": err.get("code"), "errmsg": err.get("errmsg", "Write failed")} for err in e.details["writeErrors"]]
+    failed = {err["index"] for err in errors}
+    inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+    for doc in inserted:
+        _report_written(doc)
+    _report_changed([(None, doc) for doc in inserted])
+    return errors
+
+def iter_reports(query: dict, projection: Optional[dict] = None, batch_size: int = 1000):
+    """Cursor over matching reports in _id order, fetched `batch_size` at a time."""
+    return reports_collection.find(query, projection, batch_size=batch_size).sort("_id", 1)
+
+def get_reports_pending_enrichment(limit: int = 1000) -> List[dict]:
+    cursor = reports_collection.find(
+        {"enrichment_status": "pending"},
+        {"original_text": 1, "image_url": 1, "created_at": 1},
+    ).sort("created_at", 1).limit(limit)
+    return list(cursor)
+
+def apply_enrichment(report_id: ObjectId, fields: dict, enrichment_status: str) -> Optional[dict]:
+    """Fills in a pending report; returns the document as it was before the update, or None if it was no longer pending."""
+    changes = {**fields, "enrichment_status": enrichment_status, "updated_at": datetime.now(timezone.utc)}
+    before = reports_collection.find_one_and_update({"_id": report_id, "enrichment_status": "pending"}, {"$set": changes})
+    if before:
+        after = {**before, **changes}
+        _report_written(after)
+        _report_changed([(before, after)])
+        create_notification(after, "enrichment_done", {
+            "category": after.get("category"), "urgency": after.get("urgency"), "enrichment_status": enrichment_status,
+        })
+    return before
+
+def get_report_upvotes(report_id: ObjectId) -> Optional[int]:
+    """Stored (flushed) upvote count, or None when the report does not exist."""
+    doc = reports_collection.find_one({"_id": report_id}, {"upvotes": 1})
+    return doc.get("upvotes", 0) if doc else None
+
+def add_vote(report_id: ObjectId, user_id: str) -> bool:
+    """Records a vote; False if this user already voted on the report."""
+    try:
+        votes_collection.insert_one({"report_id": report_id, "user_id": user_id, "created_at": datetime.now(timezone.utc)})
+    except DuplicateKeyError:
+        return False
+    return True
+
+def remove_vote(report_id: ObjectId, user_id: str) -> bool:
+    return votes_collection.delete_one({"report_id": report_id, "user_id": user_id}).deleted_count == 1
+
+def apply_upvote_deltas(deltas: dict) -> int:
+    """One unordered bulk $inc of `upvotes` for {report_id: delta}; returns how many reports matched."""
+    if not deltas:
+        return 0
+    result = reports_collection.bulk_write(
+        [UpdateOne({"_id": oid}, {"$inc": {"upvotes": delta}}) for oid, delta in deltas.items()], ordered=False,
+    )
+    return result.matched_count
+
+def get_cached_inference(key: str) -> Optional[Any]:
+    doc = inference_cache_collection.find_one(
+        {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"value": 1}
     )
-    return ReportInDB.model_validate(update_result) if update_result else None
+    return doc.get("value") if doc else None
+
+def put_cached_inference(key: str, kind: str, model: str, value: Any, ttl_seconds: float) -> None:
+    now = datetime.now(timezone.utc)
+    inference_cache_collection.replace_one(
+        {"_id": key},
+        {"kind": kind, "model": model, "value": value, "created_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)},
+        upsert=True,
+    )
+
+def purge_inference_cache(kind: str, current_model: str) -> int:
+    return inference_cache_collection.delete_many({"kind": kind, "model": {"$ne": current_model}}).deleted_count
 
 def ensure_indexes():
     users_collection.create_index("clerk_user_id", unique=True)
+    webhook_events_collection.create_index("received_at", expireAfterSeconds=WEBHOOK_EVENT_RETENTION_DAYS * 86400)
     reports_collection.create_index([("location", GEOSPHERE)])
+    # /nearby: distance order with a status filter, and newest-first within a radius
+    reports_collection.create_index([("location", GEOSPHERE), ("status", 1)])
+    reports_collection.create_index(NEWEST_FIRST + [("location", GEOSPHERE)])
+    # "top" ordering on /reports and /nearby
+    reports_collection.create_index(TOP_VOTED)
+    reports_collection.create_index(TOP_VOTED + [("location", GEOSPHERE)])
+    # admin list: equality filters first, then the sort keys, so every
+    # department/category/status combination is an index range scan
+    reports_collection.create_index(NEWEST_FIRST)
+    reports_collection.create_index([("status", 1)] + NEWEST_FIRST)
+    reports_collection.create_index([("category", 1), ("status", 1)] + NEWEST_FIRST)
+    reports_collection.create_index([("assigned_department", 1), ("status", 1)] + NEWEST_FIRST)
+    reports_collection.create_index([("assigned_department", 1), ("category", 1), ("status", 1)] + NEWEST_FIRST)
+    reports_collection.create_index("enrichment_status", partialFilterExpression={"enrichment_status": "pending"})
+    # imported reports keep their legacy id; re-running an import skips what is already there
+    reports_collection.create_index("external_id", unique=True, partialFilterExpression={"external_id": {"$exists": True}})
+    inference_cache_collection.create_index("expires_at", expireAfterSeconds=0)
+    inference_cache_collection.create_index([("kind", 1), ("model", 1)])
+    # per-user and per-department catch-up, both ordered by _id
+    notifications_collection.create_index([("user_id", 1), ("_id", 1)])
+    notifications_collection.create_index([("department", 1), ("_id", 1)])
+    notifications_collection.create_index("created_at", expireAfterSeconds=NOTIFICATION_RETENTION_DAYS * 86400)
+    # admin search; a collection can have only one text index
+    reports_collection.create_index(
+        [("title", TEXT), ("original_text", TEXT)],
+        name="report_text", weights={"title": 5, "original_text": 1}, default_language="english",
+    )
+    # dashboard series are read by day range
+    report_stats_daily_collection.create_index("_id.day")
+    # one vote per user per report
+    votes_collection.create_index([("report_id", 1), ("user_id", 1)], unique=True)
     print("Database indexes ensured.")
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+# Resized copies of uploaded photos, generated in a process pool so the resize
+# work never runs on the event loop or competes for the GIL. Derivatives are
+# named after the original's content hash, so duplicates are generated once.
+# Pillow is optional: without it no derivatives are made and callers fall back
+# to the original image.
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+def _flatten(img):
+    # honour the EXIF orientation before the metadata is dropped
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img.convert("RGBA"), mask=img.convert("RGBA").split()[-1])
+        img = background
+    return img
+
+
+def build_derivatives(
+    src_path: str,
+    out_dir: str,
+    digest: str,
+    sizes: Dict[str, int],
+    fmt: str = "webp",
+    quality: int = 80,
+    caption_side: int = 0,
+) -> Tuple[Dict[str, str], Optional[bytes]]:
+    """
+    Runs in a worker process. Writes one EXIF-free file per entry in `sizes`
+    (name -> longest side in px) and returns their file names, plus a JPEG
+    of at most `caption_side` px for the captioner when requested.
+    """
+    pil_format, ext = FORMATS[fmt]
+    written = {}
+    with Image.open(src_path) as original:
+        img = _flatten(original)
+        for name, side in sorted(sizes.items(), key=lambda kv: -kv[1]):
+            fname = f"{digest}-{name}{ext}"
+            dst = os.path.join(out_dir, fname)
+            if not os.path.exists(dst):
+                copy = img.copy()
+                copy.thumbnail((side, side))
+                tmp = f"{dst}.{os.getpid()}.part"
+                # no exif= argument, so no metadata is carried over
+                copy.save(tmp, pil_format, quality=quality, optimize=True)
+                os.replace(tmp, dst)
+            written[name] = fname
+        caption_bytes = None
+        if caption_side:
+            copy = img.convert("RGB")
+            copy.thumbnail((caption_side, caption_side))
+            buf = io.BytesIO()
+            copy.save(buf, "JPEG", quality=85)
+            caption_bytes = buf.getvalue()
+    return written, caption_bytes
+
+
+def image_dhash(src_path: str, side: int = 8) -> int:
+    """
+    Runs in a worker process. 64-bit difference hash of the photo: survives
+    re-encoding, resizing and small crops, so re-uploads of the same scene
+    land within a few bits of each other.
+    """
+    with Image.open(src_path) as original:
+        original.draft("L", (side * 4, side * 4))  # JPEG: decode at reduced size
+        img = ImageOps.exif_transpose(original).convert("L").resize((side + 1, side), Image.LANCZOS)
+        pixels = list(img.getdata())
+    value = 0
+    for row in range(side):
+        for col in range(side):
+            left, right = pixels[row * (side + 1) + col], pixels[row * (side + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class DerivativePool:
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return PIL_AVAILABLE and self.workers > 0
+
+    def start(self) -> None:
+        if self.enabled and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, *args: Any, **kwargs: Any) -> Tuple[Dict[str, str], Optional[bytes]]:
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(build_derivatives, *args, **kwargs))
+
+    async def dhash(self, src_path: str) -> int:
+        self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, image_dhash, src_path)
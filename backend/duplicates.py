@@ -0,0 +1,112 @@
+import hashlib
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from cache import normalize_text
+
+# Duplicate detection for new submissions. Every report stores a fingerprint:
+# a 64-bit SimHash of its text and, when Pillow is available, a 64-bit dHash
+# of its photo. A new submission is checked against the open reports within
+# DUPLICATE_RADIUS_METERS (a $geoNear on the location index, closest first) in
+# the same category; a candidate whose fingerprint is within a few bits, or
+# that carries the very same photo, is taken as the same issue. When the
+# category is unknown any nearby category is a candidate, so the fingerprints
+# then have to be near-identical. The submitter's own reports are never
+# candidates (joining counts as an upvote).
+
+DUPLICATE_DETECTION = os.getenv("DUPLICATE_DETECTION", "true").lower() in ("1", "true", "yes")
+DUPLICATE_RADIUS_METERS = int(os.getenv("DUPLICATE_RADIUS_METERS", "50"))
+DUPLICATE_WINDOW_DAYS = float(os.getenv("DUPLICATE_WINDOW_DAYS", "30"))
+DUPLICATE_MAX_CANDIDATES = int(os.getenv("DUPLICATE_MAX_CANDIDATES", "50"))
+# max differing bits out of 64 for two fingerprints to count as the same issue
+DUPLICATE_TEXT_MAX_BITS = int(os.getenv("DUPLICATE_TEXT_MAX_BITS", "10"))
+DUPLICATE_IMAGE_MAX_BITS = int(os.getenv("DUPLICATE_IMAGE_MAX_BITS", "8"))
+# the same, for text and photo alike, when the submission's category is unknown
+DUPLICATE_UNCATEGORIZED_MAX_BITS = int(os.getenv("DUPLICATE_UNCATEGORIZED_MAX_BITS", "3"))
+# texts with fewer content words ("pothole here") say too little to be matched on
+DUPLICATE_MIN_TOKENS = int(os.getenv("DUPLICATE_MIN_TOKENS", "3"))
+
+_MASK = (1 << 64) - 1
+# word order and filler vary a lot between people describing the same thing
+_STOPWORDS = frozenset(
+    "a an the is are was were be been has have had of on in at to for from by with and or not no near "
+    "this that there it its my our".split()
+)
+_CANDIDATE_PROJECTION = {"_id": 1, "title": 1, "category": 1, "upvotes": 1, "image_url": 1, "fingerprint": 1}
+
+
+def _to_int64(value: int) -> int:
+    # BSON has no unsigned 64-bit integer
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK).count("1")
+
+
+def text_simhash(text: Optional[str]) -> Optional[int]:
+    """SimHash over the content words, or None when the text is too short."""
+    tokens = [t for t in normalize_text(text).split() if t not in _STOPWORDS]
+    if len(tokens) < DUPLICATE_MIN_TOKENS:
+        return None
+    features = Counter(tokens)
+    weights = [0] * 64
+    for feature, count in features.items():
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+    return _to_int64(sum(1 << bit for bit in range(64) if weights[bit] > 0))
+
+
+def fingerprint(text: Optional[str], image_hash: Optional[int]) -> Dict[str, int]:
+    """What gets stored on the report; keys are omitted when there is nothing to hash."""
+    fp = {}
+    text_hash = text_simhash(text)
+    if text_hash is not None:
+        fp["text"] = text_hash
+    if image_hash is not None:
+        fp["image"] = _to_int64(image_hash)
+    return fp
+
+
+def _matches(candidate: Dict[str, Any], fp: Dict[str, int], image_url: Optional[str], strict: bool = False) -> bool:
+    if image_url and candidate.get("image_url") == image_url:
+        return True  # uploads are content-addressed: the very same photo
+    other = candidate.get("fingerprint") or {}
+    image_bits = DUPLICATE_UNCATEGORIZED_MAX_BITS if strict else DUPLICATE_IMAGE_MAX_BITS
+    text_bits = DUPLICATE_UNCATEGORIZED_MAX_BITS if strict else DUPLICATE_TEXT_MAX_BITS
+    if "image" in fp and "image" in other and hamming(fp["image"], other["image"]) <= image_bits:
+        return True
+    return "text" in fp and "text" in other and hamming(fp["text"], other["text"]) <= text_bits
+
+
+def find_duplicate(
+    longitude: float,
+    latitude: float,
+    category: Optional[str],
+    fp: Dict[str, int],
+    image_url: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Closest open report by someone else that looks like the same issue, or None. Blocking; run it through crud.run_db."""
+    if not fp and not image_url:
+        return None
+    since = datetime.now(timezone.utc) - timedelta(days=DUPLICATE_WINDOW_DAYS)
+    query: Dict[str, Any] = {"status": {"$ne": "Resolved"}, "created_at": {"$gte": since}}
+    if user_id:
+        query["user_id"] = {"$ne": user_id}
+    if category:
+        # reports still waiting for enrichment have no real category yet
+        query["$or"] = [{"category": category}, {"enrichment_status": "pending"}]
+    candidates: List[Dict[str, Any]] = crud.get_reports_nearby_by_distance(
+        longitude, latitude, DUPLICATE_RADIUS_METERS, DUPLICATE_MAX_CANDIDATES,
+        query=query, projection=_CANDIDATE_PROJECTION,
+    )
+    for candidate in candidates:
+        if _matches(candidate, fp, image_url, strict=not category):
+            return candidate
+    return None
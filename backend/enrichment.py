@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Bounded in-process job queue with a fixed pool of asyncio workers.
+# Failed jobs are retried with exponential backoff (backoff_base, 2x, 4x... seconds);
+# once attempts are exhausted the on_give_up callback gets the job so the caller
+# can apply a fallback.
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class JobQueue:
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        workers: int = 4,
+        maxsize: int = 1000,
+        max_attempts: int = 3,
+        backoff_base: float = 2.0,
+        on_give_up: Optional[Callable[[Dict[str, Any], Exception], Awaitable[None]]] = None,
+    ):
+        self.name = name
+        self._handler = handler
+        self._workers = workers
+        self._maxsize = maxsize
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._on_give_up = on_give_up
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._retry_tasks = set()
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "succeeded": 0, "retried": 0, "gave_up": 0}
+        self._wait_ms = deque(maxlen=1000)
+        self._latency_ms = deque(maxlen=1000)
+
+    def full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def submit(self, job: Dict[str, Any]) -> bool:
+        """Enqueues a job without blocking; returns False when the queue is saturated or stopped."""
+        if self._queue is None:
+            return False
+        job.setdefault("attempt", 0)
+        job.setdefault("enqueued_at", time.monotonic())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        self._counters["submitted"] += 1
+        return True
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self._maxsize)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}") for i in range(self._workers)]
+
+    async def stop(self) -> None:
+        for t in list(self._retry_tasks) + self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks = []
+        self._retry_tasks.clear()
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue": self.name,
+            "workers": len(self._tasks),
+            "depth": self._queue.qsize() if self._queue else 0,
+            "pending_retries": len(self._retry_tasks),
+            "in_flight": self._in_flight,
+            **self._counters,
+            "wait_ms": {"p50": _percentile(self._wait_ms, 50), "p95": _percentile(self._wait_ms, 95)},
+            "latency_ms": {"p50": _percentile(self._latency_ms, 50), "p95": _percentile(self._latency_ms, 95)},
+        }
+
+    async def _requeue_later(self, job: Dict[str, Any], delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._queue.put(job)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            started = time.monotonic()
+            if job["attempt"] == 0:
+                self._wait_ms.append((started - job["enqueued_at"]) * 1000)
+            job["attempt"] += 1
+            self._in_flight += 1
+            try:
+                await self._handler(job)
+                self._counters["succeeded"] += 1
+                self._latency_ms.append((time.monotonic() - job["enqueued_at"]) * 1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job["attempt"] < self._max_attempts:
+                    self._counters["retried"] += 1
+                    delay = self._backoff_base * (2 ** (job["attempt"] - 1))
+                    task = asyncio.create_task(self._requeue_later(job, delay))
+                    self._retry_tasks.add(task)
+                    task.add_done_callback(self._retry_tasks.discard)
+                else:
+                    self._counters["gave_up"] += 1
+                    if self._on_give_up:
+                        try:
+                            await self._on_give_up(job, e)
+                        except Exception as fallback_error:
+                            print(f"[{self.name}] fallback failed for job: {fallback_error}")
+                    self._latency_ms.append((time.monotonic() - job["enqueued_at"]) * 1000)
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
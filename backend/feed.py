@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from change_stream import ChangeStreamWatcher
+
+# The citizen feed (GET /api/reports): the newest FEED_SIZE reports held in
+# process and kept current by crud's report-write hook, so a feed load does not
+# touch Mongo. Rendered response bodies are memoised per variant until the next
+# change, and carry a content-hash ETag. With several workers, each one also
+# tails a change stream on the reports collection so writes made elsewhere show
+# up too (replica sets only; a standalone mongod falls back to local writes).
+# When the stream cannot resume after an error the buffer is reloaded, and it
+# is reloaded every FEED_RELOAD_SECONDS regardless, in case an event was missed.
+
+FEED_SIZE = int(os.getenv("FEED_SIZE", "100"))
+FEED_CHANGE_STREAM = os.getenv("FEED_CHANGE_STREAM", "true").lower() in ("1", "true", "yes")
+FEED_RELOAD_SECONDS = float(os.getenv("FEED_RELOAD_SECONDS", "300"))
+
+
+def _sort_key(doc: Dict[str, Any]) -> Tuple[Any, Any]:
+    return doc.get("created_at"), doc["_id"]
+
+
+class HotFeed:
+    def __init__(self, size: int = 100, reload_seconds: float = 300.0):
+        self.size = size
+        self.reload_seconds = reload_seconds
+        self._docs: List[Dict[str, Any]] = []  # newest first
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._backlog: Optional[List[Dict[str, Any]]] = None  # writes seen while loading
+        self._version = 0
+        self._rendered: Dict[str, Tuple[int, bytes, str]] = {}
+        self._load_lock = asyncio.Lock()
+        self._watcher = ChangeStreamWatcher("Feed", self._open_stream, self._apply_change, on_gap=self.invalidate)
+        # optional filter for change events this process applies itself (see reports._own_vote_flush)
+        self.skip_change: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+    def load(self) -> None:
+        """Fills the buffer from Mongo; blocking, so run it through crud.run_db."""
+        with self._lock:
+            self._backlog = []
+        docs = crud.get_recent_reports(self.size)
+        with self._lock:
+            self._docs = sorted(docs, key=_sort_key, reverse=True)[: self.size]
+            backlog, self._backlog = self._backlog, None
+            for doc in backlog:
+                self._upsert(doc)
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self._version += 1
+
+    def _fresh(self) -> bool:
+        return self._loaded and time.monotonic() - self._loaded_at < self.reload_seconds
+
+    async def ensure_loaded(self) -> None:
+        if self._fresh():
+            return
+        async with self._load_lock:
+            if not self._fresh():
+                await crud.run_db(self.load)
+
+    def invalidate(self) -> None:
+        """Makes the next request reload the buffer, e.g. after change events were lost."""
+        with self._lock:
+            self._loaded = False
+
+    def report_written(self, doc: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._backlog is not None:
+                self._backlog.append(doc)
+            elif self._loaded and self._upsert(doc):
+                self._version += 1
+
+    def report_deleted(self, report_id: Any) -> None:
+        with self._lock:
+            before = len(self._docs)
+            self._docs = [d for d in self._docs if d["_id"] != report_id]
+            if len(self._docs) != before:
+                # the next-newest report is not held here; reload to backfill the slot
+                self._loaded = False
+
+    def holds(self, report_id: Any) -> bool:
+        with self._lock:
+            return any(d["_id"] == report_id for d in self._docs)
+
+    def set_upvotes(self, counts: Dict[Any, int]) -> None:
+        """Replaces the stored `upvotes` of held reports, e.g. after an upvote flush; other fields are kept."""
+        with self._lock:
+            changed = False
+            for i, doc in enumerate(self._docs):
+                if doc["_id"] in counts:
+                    self._docs[i] = {**doc, "upvotes": counts[doc["_id"]]}
+                    changed = True
+            if changed:
+                self._version += 1
+
+    def touch(self, report_id: Any) -> None:
+        """Invalidates the rendered bodies when `report_id` is held, e.g. after an upvote."""
+        with self._lock:
+            if any(d["_id"] == report_id for d in self._docs):
+                self._version += 1
+
+    def _upsert(self, doc: Dict[str, Any]) -> bool:
+        """Places `doc` in the buffer; returns False when it is older than everything held."""
+        docs = [d for d in self._docs if d["_id"] != doc["_id"]]
+        replaced = len(docs) != len(self._docs)
+        if not replaced and len(docs) >= self.size and _sort_key(doc) < _sort_key(docs[-1]):
+            return False
+        key = _sort_key(doc)
+        idx = 0
+        while idx < len(docs) and _sort_key(docs[idx]) > key:
+            idx += 1
+        docs.insert(idx, doc)
+        self._docs = docs[: self.size]
+        return True
+
+    def render(self, variant: str, build: Callable[[List[Dict[str, Any]]], bytes]) -> Tuple[bytes, str]:
+        """Response body and ETag for `variant`, built once per change by `build(docs)`."""
+        for _ in range(3):
+            with self._lock:
+                version, docs = self._version, list(self._docs)
+                cached = self._rendered.get(variant)
+            if cached and cached[0] == version:
+                return cached[1], cached[2]
+            body = build(docs)
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            with self._lock:
+                if self._version == version:
+                    self._rendered[variant] = (version, body, etag)
+                    break
+            # the buffer moved while building (e.g. an upvote flush settled): build again
+        return body, etag
+
+    @property
+    def change_stream_active(self) -> bool:
+        return self._watcher.active
+
+    def _open_stream(self, resume_after: Optional[Dict[str, Any]]):
+        return crud.reports_collection.watch(full_document="updateLookup", max_await_time_ms=1000, resume_after=resume_after)
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        if self.skip_change and self.skip_change(change):
+            return
+        if change.get("operationType") == "delete":
+            self.report_deleted(change["documentKey"]["_id"])
+        elif change.get("fullDocument"):
+            self.report_written(change["fullDocument"])
+
+    def start_watch(self) -> None:
+        if FEED_CHANGE_STREAM:
+            self._watcher.start()
+
+    def stop_watch(self) -> None:
+        self._watcher.stop()
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+hot_feed = HotFeed(FEED_SIZE, FEED_RELOAD_SECONDS)
+crud.on_report_write(hot_feed.report_written)
@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from cache import TTLCache
+from change_stream import ChangeStreamWatcher
+
+# In-process cache of user roles so admin checks are memory lookups. Entries
+# expire after ROLE_CACHE_TTL_SECONDS and are dropped early by the Clerk webhook
+# handler and, on replica sets, by a change stream on the users collection.
+# When JWT_ROLE_CLAIM is set, a role carried in the session token skips the
+# lookup entirely; a demotion then only takes effect once the user's current
+# token expires, so it is off by default.
+
+ROLE_CACHE_TTL_SECONDS = float(os.getenv("ROLE_CACHE_TTL_SECONDS", "300"))
+ROLE_CACHE_SIZE = int(os.getenv("ROLE_CACHE_SIZE", "50000"))
+# dotted path into the JWT claims, e.g. "metadata.role" for a Clerk session
+# token customised with {"metadata": "{{user.public_metadata}}"}; empty = always look up
+JWT_ROLE_CLAIM = os.getenv("JWT_ROLE_CLAIM", "")
+ROLE_CHANGE_STREAM = os.getenv("ROLE_CHANGE_STREAM", "true").lower() in ("1", "true", "yes")
+
+_NO_USER = "__none__"
+
+
+def role_from_claims(claims: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not JWT_ROLE_CLAIM:
+        return None
+    value: Any = claims or {}
+    for part in JWT_ROLE_CLAIM.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value if isinstance(value, str) else None
+
+
+class RoleCache:
+    def __init__(self, ttl: float = 300.0, maxsize: int = 50000):
+        self._cache = TTLCache(maxsize, ttl)
+        self._counters = {"hits": 0, "misses": 0, "claims": 0, "invalidations": 0}
+        # bumped by every invalidation; a lookup that overlapped one does not cache what it read
+        self._generation = 0
+        self._lock = threading.Lock()
+        # a stream that restarts without resuming may have missed changes: drop everything
+        self._watcher = ChangeStreamWatcher("Role cache", self._open_stream, self._apply_change, on_gap=self.invalidate)
+
+    async def get_role(self, clerk_user_id: str, claims: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Role from the token claims, else the cache, else the users collection (then cached)."""
+        role = role_from_claims(claims)
+        if role:
+            self._counters["claims"] += 1
+            return role
+        cached = self._cache.get(clerk_user_id)
+        if cached is not None:
+            self._counters["hits"] += 1
+            return None if cached == _NO_USER else cached
+        self._counters["misses"] += 1
+        generation = self._generation
+        role = await crud.run_db(crud.get_user_role, clerk_user_id)
+        with self._lock:
+            if self._generation == generation:
+                self._cache.set(clerk_user_id, role or _NO_USER)
+        return role
+
+    async def is_admin(self, clerk_user_id: str, claims: Optional[Dict[str, Any]] = None) -> bool:
+        return await self.get_role(clerk_user_id, claims) == "admin"
+
+    def invalidate(self, clerk_user_id: Optional[str] = None) -> None:
+        """Drops one user's entry, or everything when no id is given."""
+        with self._lock:
+            self._generation += 1
+            self._counters["invalidations"] += 1
+            if clerk_user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(clerk_user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "entries": len(self._cache), "change_stream": self.change_stream_active}
+
+    @property
+    def change_stream_active(self) -> bool:
+        return self._watcher.active
+
+    def _open_stream(self, resume_after: Optional[Dict[str, Any]]):
+        return crud.users_collection.watch(full_document="updateLookup", max_await_time_ms=1000, resume_after=resume_after)
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        doc = change.get("fullDocument") or {}
+        if doc.get("clerk_user_id"):
+            self.invalidate(doc["clerk_user_id"])
+        else:
+            # deletes carry no document; the id mapping is unknown, so start over
+            self.invalidate()
+
+    def start_watch(self) -> None:
+        if ROLE_CHANGE_STREAM:
+            self._watcher.start()
+
+    def stop_watch(self) -> None:
+        self._watcher.stop()
+
+
+role_cache = RoleCache(ttl=ROLE_CACHE_TTL_SECONDS, maxsize=ROLE_CACHE_SIZE)
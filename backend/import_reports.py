@@ -0,0 +1,80 @@
+"""
+Imports reports from an NDJSON or CSV file (optionally gzipped), e.g. a
+legacy system's backfill or an export from GET /api/admin/reports/export.
+
+Progress is saved after every batch to --progress (default <file>.progress.json);
+running the same command again resumes after the last saved row. Rejected rows
+are appended to --rejects (default <file>.rejects.ndjson) with their row
+number and the reason. Dashboard counters are updated as rows are inserted.
+
+    python import_reports.py legacy_reports.csv.gz --batch-size 2000
+    python import_reports.py reports-20250101.ndjson --restart
+"""
+import argparse
+import json
+import os
+import time
+import crud
+import stats  # noqa: F401  (keeps the dashboard counters current while importing)
+import transfer
+from serialization import dumps
+
+
+def _load_progress(path: str, source: str) -> int:
+    try:
+        with open(path) as f:
+            progress = json.load(f)
+    except FileNotFoundError:
+        return 0
+    if progress.get("source") != os.path.abspath(source):
+        raise SystemExit(f"{path} belongs to {progress.get('source')}; pass --restart or another --progress file")
+    return int(progress.get("last_row", 0))
+
+
+def _save_progress(path: str, source: str, summary: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"source": os.path.abspath(source), **{k: v for k, v in summary.items() if k != "rejects"}}, f)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=transfer.FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=transfer.TRANSFER_BATCH_SIZE)
+    parser.add_argument("--progress", help="progress file (default <file>.progress.json)")
+    parser.add_argument("--rejects", help="rejected rows, NDJSON (default <file>.rejects.ndjson)")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress and start from the first row")
+    args = parser.parse_args()
+
+    progress_path = args.progress or f"{args.file}.progress.json"
+    rejects_path = args.rejects or f"{args.file}.rejects.ndjson"
+    start_row = 0 if args.restart else _load_progress(progress_path, args.file)
+    if start_row:
+        print(f"Resuming after row {start_row}")
+    crud.ensure_indexes()
+
+    started = time.perf_counter()
+    with open(args.file, "rb") as source, open(rejects_path, "w" if not start_row else "a", encoding="utf-8") as rejects:
+
+        def on_reject(row, error, data):
+            rejects.write(dumps({"row": row, "error": error, "data": data}).decode("utf-8") + "\n")
+
+        def on_batch(summary):
+            rejects.flush()
+            _save_progress(progress_path, args.file, summary)
+            rate = (summary["inserted"] + summary["existing"] + summary["rejected"]) / max(time.perf_counter() - started, 1e-9)
+            print(f"row {summary['last_row']}: {summary['inserted']} inserted, {summary['existing']} existing, {summary['rejected']} rejected ({rate:.0f} rows/s)")
+
+        summary = transfer.import_stream(
+            source, args.format or transfer.detect_format(args.file),
+            batch_size=args.batch_size, start_row=start_row, on_reject=on_reject, on_batch=on_batch, rejects_kept=0,
+        )
+    print(f"Done in {time.perf_counter() - started:.1f}s: {summary['inserted']} inserted, {summary['existing']} already present, {summary['rejected']} rejected")
+    if summary["rejected"]:
+        print(f"Rejected rows: {rejects_path}")
+
+
+if __name__ == "__main__":
+    main()
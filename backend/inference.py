@@ -0,0 +1,167 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+import httpx
+import metrics
+
+# App-lifetime HTTP client for the Hugging Face inference API: one pooled
+# keep-alive client, a concurrency cap per model and a circuit breaker per model
+# so a slow or failing upstream is skipped instead of waited out.
+
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one probe through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+def _upstream_failure(error: Exception) -> bool:
+    # a 4xx other than 429 is about the request (an image HF rejects, a bad token), not the upstream's health
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        return code == 429 or code >= 500
+    return True
+
+
+class InferenceClient:
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str],
+        timeout: float = 60,
+        max_concurrency: int = 8,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        http2: bool = True,
+        breaker_failures: int = 5,
+        breaker_reset_seconds: float = 30.0,
+        slow_call_seconds: Optional[float] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=self.http2)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(self.breaker_failures, self.breaker_reset_seconds)
+        return self._breakers[model]
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[model]
+
+    def _count(self, model: str, outcome: str) -> None:
+        counters = self._counters.setdefault(model, {})
+        counters[outcome] = counters.get(outcome, 0) + 1
+        metrics.hf_calls.inc(model, outcome)
+
+    async def post(self, model: str, **kwargs: Any) -> httpx.Response:
+        """POSTs to `{base_url}/{model}`; raises CircuitOpenError without touching the network while the breaker is open."""
+        if not self.token:
+            raise RuntimeError("HF_API_TOKEN not set")
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            self._count(model, "short_circuited")
+            raise CircuitOpenError(f"Circuit open for {model}")
+        await self.start()
+        headers = {"Authorization": f"Bearer {self.token}", **kwargs.pop("headers", {})}
+        async with self._semaphore(model):
+            started = time.monotonic()
+            try:
+                r = await self._client.post(f"{self.base_url}/{model}", headers=headers, **kwargs)
+                r.raise_for_status()
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                if _upstream_failure(e):
+                    breaker.record_failure()
+                    self._count(model, "error")
+                else:
+                    breaker.record_success()
+                    self._count(model, "rejected")
+                raise
+        if self.slow_call_seconds and time.monotonic() - started > self.slow_call_seconds:
+            # the response is still used, but repeated slow calls open the breaker
+            breaker.record_failure()
+            self._count(model, "slow")
+        else:
+            breaker.record_success()
+            self._count(model, "ok")
+        return r
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_concurrency": self.max_concurrency,
+            "models": {
+                model: {"breaker": self.breaker(model).state, **self._counters.get(model, {})}
+                for model in set(self._breakers) | set(self._counters)
+            },
+        }
@@ -1,20 +1,84 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException, Security, APIRouter
+import hmac
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Security, APIRouter, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.security import APIKeyHeader
 from dotenv import load_dotenv
-from jose import jwt, JWTError
-import requests
+from jose import JWTError
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from webhooks import router as webhooks_router
-from reports import router as reports_router
-import crud # Import crud to access user collection
+from reports import (
+    router as reports_router,
+    enrichment_queue,
+    resume_pending_enrichment,
+    hf_client,
+    purge_stale_inference_cache,
+    derivative_pool,
+    MAX_UPLOAD_BYTES,
+)
+from uploads import UploadSizeLimitMiddleware
+from auth import JWKSManager, TokenVerifier
+from identity import role_cache
+from feed import hot_feed
+from notifications import notification_hub
+from tiles import tile_cache
+from upvotes import upvote_counter
+from clerk_sync import clerk_events
+from metrics import METRICS_ENABLED, METRICS_TOKEN, MetricsMiddleware, loop_lag_monitor, registry
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="Civic Connect API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if METRICS_ENABLED and not METRICS_TOKEN:
+        print("Warning: METRICS_TOKEN is not set, so /metrics answers 404; set it to scrape this worker.")
+    loop_lag_monitor.start()
+    await jwks.start()
+    role_cache.start_watch()
+    hot_feed.start_watch()
+    notification_hub.start()
+    tile_cache.start()
+    await hf_client.start()
+    derivative_pool.start()
+    await enrichment_queue.start()
+    await upvote_counter.start()
+    await clerk_events.start()
+    try:
+        purged = await purge_stale_inference_cache()
+        if purged:
+            print(f"Dropped {purged} cached inference results from previous models.")
+    except Exception as e:
+        print(f"Could not purge stale inference cache: {e}")
+    try:
+        resumed = await resume_pending_enrichment()
+        if resumed:
+            print(f"Re-queued {resumed} reports pending enrichment.")
+    except Exception as e:
+        print(f"Could not resume pending enrichment: {e}")
+    try:
+        await hot_feed.ensure_loaded()
+    except Exception as e:
+        # loaded lazily by the first feed request instead
+        print(f"Could not warm the report feed: {e}")
+    yield
+    # pending upvote deltas and queued webhook events are flushed before the Mongo client goes away
+    await upvote_counter.stop()
+    await clerk_events.stop()
+    await enrichment_queue.stop()
+    await hf_client.aclose()
+    derivative_pool.shutdown()
+    await jwks.stop()
+    role_cache.stop_watch()
+    hot_feed.stop_watch()
+    notification_hub.stop()
+    tile_cache.stop()
+    await loop_lag_monitor.stop()
+
+app = FastAPI(title="Civic Connect API", lifespan=lifespan)
 
 # --- CORS Middleware ---
 app.add_middleware(
@@ -25,58 +89,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized report submissions before their multipart body is parsed
+app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=MAX_UPLOAD_BYTES + 64 * 1024, paths=("/api/smart-create",))
+
+# Outermost, so rejected uploads and CORS preflights are timed too
+app.add_middleware(MetricsMiddleware)
+
 # --- Clerk Configuration ---
 CLERK_JWKS_URL = os.getenv("CLERK_JWKS_URL")
-if not CLERK_JWKS_URL:
+# a local JWKS file (e.g. for offline testing) takes precedence over the URL
+CLERK_JWKS_FILE = os.getenv("CLERK_JWKS_FILE")
+if not CLERK_JWKS_URL and not CLERK_JWKS_FILE:
     raise RuntimeError("FATAL: CLERK_JWKS_URL environment variable is not set.")
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
 
 # --- Authentication and Authorization Dependencies ---
 
-def get_jwks():
-    """Fetches the JSON Web Key Set from Clerk for token validation."""
-    try:
-        response = requests.get(CLERK_JWKS_URL)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Could not fetch JWKS from Clerk: {e}")
-
-jwks = get_jwks()
+jwks = JWKSManager(
+    url=CLERK_JWKS_URL,
+    file_path=CLERK_JWKS_FILE,
+    refresh_interval=JWKS_REFRESH_SECONDS,
+    min_refresh_interval=JWKS_MIN_REFRESH_SECONDS,
+)
+token_verifier = TokenVerifier(jwks, cache_size=TOKEN_CACHE_SIZE, cache_ttl=TOKEN_CACHE_TTL_SECONDS)
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
 
-async def get_current_user_id(token: str = Security(api_key_header)):
+async def get_current_user_id(request: Request, token: str = Security(api_key_header)):
     """Validates the JWT from the Authorization header and returns the user ID (sub)."""
     if token is None:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     token = token.replace("Bearer ", "")
     try:
-        header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks.get("keys", []):
-            if key.get("kid") == header.get("kid"):
-                rsa_key = {
-                    "kty": key.get("kty"), "kid": key.get("kid"), "use": key.get("use"),
-                    "n": key.get("n"), "e": key.get("e")
-                }
-        
-        if rsa_key:
-            payload = jwt.decode(token, rsa_key, algorithms=["RS256"])
-            return payload.get("sub")
-        
-        raise HTTPException(status_code=401, detail="Invalid token: Unable to find matching key")
-
+        payload = await token_verifier.verify(token)
     except JWTError as e:
         raise HTTPException(status_code=401, detail=f"Token validation error: {e}")
+    user_id = payload.get("sub")
+    # route helpers in reports.py read the caller from request.state
+    request.state.user_id = user_id
+    request.state.claims = payload
+    return user_id
 
 # --- User Role Router ---
 user_router = APIRouter()
 
 @user_router.get("/role", summary="Get current user's role")
-async def get_user_role(user_id: str = Depends(get_current_user_id)):
-    """Checks the database to see if the current user has the 'admin' role."""
-    user_doc = crud.users_collection.find_one({"clerk_user_id": user_id})
-    if user_doc and user_doc.get("role") == "admin":
+async def get_user_role(request: Request, user_id: str = Depends(get_current_user_id)):
+    """Checks the token claims, role cache or database to see if the current user has the 'admin' role."""
+    if await role_cache.is_admin(user_id, getattr(request.state, "claims", None)):
         return {"role": "admin"}
     return {"role": "user"}
 
@@ -97,6 +160,32 @@ app.include_router(webhooks_router, prefix="/webhooks", tags=["Webhooks"])
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# --- Metrics ---
+registry.gauge(
+    "enrichment_queue_jobs", "Enrichment jobs waiting, in flight and scheduled for retry.",
+    lambda: {(state,): enrichment_queue.stats()[key] for state, key in (("queued", "depth"), ("in_flight", "in_flight"), ("retrying", "pending_retries"))},
+    ("state",),
+)
+registry.gauge(
+    "clerk_sync_pending_events", "Verified Clerk webhook events not yet written to Mongo.",
+    lambda: {(): clerk_events.stats()["pending"]},
+)
+registry.gauge(
+    "upvote_pending_reports", "Reports with upvote deltas not yet flushed to Mongo.",
+    lambda: {(): upvote_counter.stats()["pending_reports"]},
+)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus text exposition of this worker's metrics."""
+    # fails closed: route traffic, Mongo timings and queue depths are not for the public
+    if not METRICS_ENABLED or not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("Authorization", "").replace("Bearer ", "")
+    if not hmac.compare_digest(supplied, METRICS_TOKEN):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # --- Root Endpoint ---
 @app.get("/")
 async def root():
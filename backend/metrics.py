@@ -0,0 +1,316 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from pymongo import monitoring
+
+# In-process metrics in the Prometheus text format, served by GET /metrics.
+# Counters and histograms are plain dicts behind a lock (Mongo command events
+# arrive on the driver's threads), so there is no client library to install.
+# Requests carry a per-request stage breakdown in a context variable: stage()
+# timers and the Mongo command listener add to it, and requests slower than
+# SLOW_REQUEST_SECONDS are sampled into a one-line JSON log with that breakdown.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# /metrics wants "Authorization: Bearer <token>"; without a token it is not served at all
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+# share of slow requests that are logged; 0 turns the log off
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "1.0"))
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from `fn`, which returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Dict[Tuple[str, ...], float]], labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} could not be read: {e}")
+            return lines
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Dict[Tuple[str, ...], float]], labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, fn, labels))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"),
+)
+stage_latency = registry.histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each named pipeline stage.", ("stage",),
+)
+mongo_latency = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips, by command and outcome.", ("command", "outcome"),
+)
+hf_calls = registry.counter(
+    "hf_inference_calls_total", "Hugging Face inference calls by model and outcome.", ("model", "outcome"),
+)
+classification_fallbacks = registry.counter(
+    "classification_fallbacks_total", "Reports classified by the conservative stub because inference failed.", ("path",),
+)
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a periodic timer.", buckets=LAG_BUCKETS,
+)
+slow_requests = registry.counter(
+    "slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS.", ("route",),
+)
+
+# per-request stage timings ({stage: seconds}); None outside a request
+_breakdown: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("metrics_breakdown", default=None)
+
+
+def _add(stage_name: str, seconds: float) -> None:
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        breakdown[stage_name] = breakdown.get(stage_name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the block into pipeline_stage_duration_seconds and the current request's breakdown."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_latency.observe(elapsed, name)
+        _add(name, elapsed)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener; events fire on the thread that ran the command."""
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        self._record(event, "ok")
+
+    def failed(self, event) -> None:
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str) -> None:
+        seconds = event.duration_micros / 1e6
+        mongo_latency.observe(seconds, event.command_name, outcome)
+        _add(f"mongo.{event.command_name}", seconds)
+
+
+mongo_listener = MongoCommandTimer()
+
+
+def _route(scope) -> str:
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        # unmatched paths share one label so scanners cannot blow up the series count
+        return "unmatched"
+    # routes of included routers report their path without the router prefix
+    # (/report/{report_id} for /api/report/...); take the prefix from the request
+    path = scope["path"].rstrip("/").split("/")
+    depth = len(template.rstrip("/").split("/"))
+    if len(path) > depth:
+        return "/".join(path[:len(path) - depth + 1]) + template
+    return template
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by route template and samples slow ones into the log."""
+
+    def __init__(self, app, skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        breakdown: Dict[str, float] = {}
+        token = _breakdown.set(breakdown)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _breakdown.reset(token)
+            route = _route(scope)
+            request_latency.observe(elapsed, scope["method"], route, str(status_code))
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                slow_requests.inc(route)
+                if SLOW_REQUEST_SAMPLE_RATE > 0 and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+                    _log_slow(scope, route, status_code, elapsed, breakdown)
+
+
+def _log_slow(scope, route: str, status_code: int, elapsed: float, breakdown: Dict[str, float]) -> None:
+    print(json.dumps({
+        "event": "slow_request",
+        "method": scope["method"],
+        "route": route,
+        "path": scope["path"],
+        "status": status_code,
+        "duration_ms": round(elapsed * 1000, 1),
+        "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in sorted(breakdown.items(), key=lambda kv: -kv[1])},
+    }))
+
+
+class LoopLagMonitor:
+    """Sleeps `interval` at a time and records how much later than asked the loop woke it up."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            loop_lag.observe(lag)
+
+    def start(self) -> None:
+        if self._task is None and METRICS_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+loop_lag_monitor = LoopLagMonitor(LOOP_LAG_INTERVAL_SECONDS)
+registry.gauge(
+    "event_loop_lag_last_seconds", "Lag measured by the most recent timer tick.",
+    lambda: {(): loop_lag_monitor.last},
+)
+registry.gauge(
+    "event_loop_lag_max_seconds", "Largest lag seen since the process started.",
+    lambda: {(): loop_lag_monitor.max},
+)
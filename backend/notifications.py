@@ -0,0 +1,137 @@
+import asyncio
+import os
+from typing import Any, Dict, Iterable, Optional, Set
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from cache import TTLCache
+from change_stream import ChangeStreamWatcher
+
+# Push side of notifications. Every persisted notification is handed to the hub,
+# which puts it on the queue of each connection subscribed to the owner's
+# channel ("user:<id>") or the department's ("dept:<name>", admins; "dept:*"
+# for all). Idle connections just await their queue, so thousands of them cost
+# a coroutine each and no polling. Notifications written by other workers
+# arrive through a change stream on the collection (replica sets only);
+# duplicates from both paths are dropped by id. If the stream has to restart
+# without resuming, every connection is told to resync from its cursor.
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "100"))
+NOTIFY_MAX_CONNECTIONS = int(os.getenv("NOTIFY_MAX_CONNECTIONS", "10000"))
+NOTIFY_HEARTBEAT_SECONDS = float(os.getenv("NOTIFY_HEARTBEAT_SECONDS", "25"))
+NOTIFY_CHANGE_STREAM = os.getenv("NOTIFY_CHANGE_STREAM", "true").lower() in ("1", "true", "yes")
+
+ALL_DEPARTMENTS = "dept:*"
+
+
+def channels_for(doc: Dict[str, Any]) -> Set[str]:
+    channels = {ALL_DEPARTMENTS}
+    if doc.get("user_id"):
+        channels.add(f"user:{doc['user_id']}")
+    if doc.get("department"):
+        channels.add(f"dept:{doc['department']}")
+    return channels
+
+
+class Subscription:
+    def __init__(self, channels: Iterable[str], maxsize: int):
+        self.channels = set(channels)
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize)
+        # set when the client fell too far behind; it must catch up from its cursor
+        self.overflowed = False
+        self.closed = False
+
+
+class NotificationHub:
+    def __init__(self, queue_size: int = 100, max_connections: int = 10000):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._recent = TTLCache(maxsize=10000, ttl=300)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = {"published": 0, "delivered": 0, "overflows": 0}
+        self._watcher = ChangeStreamWatcher("Notification", self._open_stream, self._apply_change, on_gap=self._gap)
+
+    def subscribe(self, channels: Iterable[str]) -> Optional[Subscription]:
+        """Registers a connection; returns None when the worker is at max_connections."""
+        if self._count >= self.max_connections:
+            return None
+        sub = Subscription(channels, self.queue_size)
+        for channel in sub.channels:
+            self._channels.setdefault(channel, set()).add(sub)
+        self._count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        if sub.closed:
+            return
+        sub.closed = True
+        for channel in sub.channels:
+            subs = self._channels.get(channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._channels[channel]
+        self._count -= 1
+
+    def publish(self, doc: Dict[str, Any]) -> None:
+        """Fans `doc` out to matching subscribers; must run on the event loop."""
+        if self._recent.get(doc["_id"]) is not None:
+            return
+        self._recent.set(doc["_id"], True)
+        self._counters["published"] += 1
+        targets: Set[Subscription] = set()
+        for channel in channels_for(doc):
+            targets.update(self._channels.get(channel, ()))
+        for sub in targets:
+            try:
+                sub.queue.put_nowait(doc)
+                self._counters["delivered"] += 1
+            except asyncio.QueueFull:
+                if not sub.overflowed:
+                    self._counters["overflows"] += 1
+                sub.overflowed = True
+
+    def publish_threadsafe(self, doc: Dict[str, Any]) -> None:
+        # crud writes run on the Mongo thread pool; hop onto the loop
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.publish, doc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "connections": self._count, "channels": len(self._channels),
+                "change_stream": self.change_stream_active}
+
+    def resync_all(self) -> None:
+        """Sends every connection back to its cursor, e.g. after notifications were missed; runs on the loop."""
+        for subs in self._channels.values():
+            for sub in subs:
+                sub.overflowed = True
+
+    @property
+    def change_stream_active(self) -> bool:
+        return self._watcher.active
+
+    def _open_stream(self, resume_after: Optional[Dict[str, Any]]):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        return crud.notifications_collection.watch(pipeline, max_await_time_ms=1000, resume_after=resume_after)
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        self.publish_threadsafe(change["fullDocument"])
+
+    def _gap(self) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.resync_all)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if NOTIFY_CHANGE_STREAM:
+            self._watcher.start()
+
+    def stop(self) -> None:
+        self._watcher.stop()
+        self._loop = None
+
+
+notification_hub = NotificationHub(queue_size=NOTIFY_QUEUE_SIZE, max_connections=NOTIFY_MAX_CONNECTIONS)
+crud.on_notification(notification_hub.publish_threadsafe)
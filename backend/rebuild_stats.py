@@ -0,0 +1,18 @@
+"""
+Recomputes the materialized dashboard stats (report_stats, report_stats_daily)
+from the reports collection, e.g. after a bulk import or to correct drift.
+
+    python rebuild_stats.py
+"""
+import time
+import stats
+
+
+def main():
+    started = time.perf_counter()
+    result = stats.rebuild()
+    print(f"Rebuilt {result['counters']} counters and {result['days']} daily rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
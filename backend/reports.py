@@ -11,30 +11,95 @@ from fastapi import (
     Depends,
 )
 import os,json,re
+import csv
+import asyncio
+import base64
+import hashlib
+import itertools
+import threading
+from email.utils import format_datetime
 from dotenv import load_dotenv
 load_dotenv()
-import uuid
-import shutil
-from datetime import datetime
-from typing import Optional, Any, Dict
+from datetime import datetime, timezone
+from typing import Optional, Any, Dict, Tuple
 from pydantic import Field
 from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi_clerk_auth import ClerkConfig, ClerkHTTPBearer, HTTPAuthorizationCredentials
 import crud
-import httpx
+from crud import ALLOWED_CATEGORIES, ALLOWED_URGENCIES, ALLOWED_DEPARTMENTS, ALLOWED_STATUSES
+from enrichment import JobQueue
+from inference import InferenceClient, CircuitOpenError
+from cache import InferenceCache, TTLCache, image_digest, text_digest
+from classifier import TieredClassifier
+from uploads import save_upload_stream
+from derivatives import DerivativePool
+from identity import role_cache
+from tiles import TILE_MAX_ZOOM, tile_cache, tiles_for_bbox, serialize_tile
+from feed import FEED_SIZE, hot_feed, if_none_match
+from notifications import ALL_DEPARTMENTS, NOTIFY_HEARTBEAT_SECONDS, notification_hub
+from upvotes import upvote_counter
+from duplicates import DUPLICATE_DETECTION, find_duplicate, fingerprint
+import stats
+import metrics
+import transfer
+from serialization import LIST_FIELDS, ADMIN_LIST_FIELDS, DETAIL_FIELDS, RawJSONResponse, dumps, report_projection, shape_report
 
 ## Constants
-ALLOWED_CATEGORIES = {"Sanitation", "Pothole", "Streetlight", "Water Leakage", "Other"}
-ALLOWED_URGENCIES = {"Low", "Medium", "High"}
-ALLOWED_DEPARTMENTS = {"Sanitation", "Public Works", "Electrical", "Water Board", "General"}
-ALLOWED_STATUSES = {"Submitted", "In Progress", "Resolved"}
 STATIC_UPLOAD_DIR = os.getenv("STATIC_UPLOAD_DIR", "static/uploads")
 os.makedirs(STATIC_UPLOAD_DIR, exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# uploads up to this size are kept in memory and handed straight to the captioner
+CAPTION_MAX_BYTES = int(os.getenv("CAPTION_MAX_BYTES", str(4 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "webp")  # webp | jpeg
+DERIVATIVE_SIZES = {
+    "thumb": int(os.getenv("THUMBNAIL_SIZE", "320")),
+    "medium": int(os.getenv("MEDIUM_IMAGE_SIZE", "1280")),
+}
+# longest side of the downscaled copy sent to the captioner
+CAPTION_IMAGE_SIZE = int(os.getenv("CAPTION_IMAGE_SIZE", "768"))
+IMAGE_SIZES = ("thumb", "medium", "original")
+NEARBY_ORDERS = ("distance", "recency", "upvotes")
+FEED_ORDERS = ("recency", "upvotes")
+COUNT_MODES = ("exact", "cached", "estimated", "none")
+ADMIN_COUNT_CACHE_TTL_SECONDS = float(os.getenv("ADMIN_COUNT_CACHE_TTL_SECONDS", "30"))
+# notifications replayed on a stream reconnect before the client is told to page instead
+NOTIFY_CATCHUP_LIMIT = int(os.getenv("NOTIFY_CATCHUP_LIMIT", "200"))
+# single-report lookups; entries are dropped on local writes, the TTL bounds staleness from other workers
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "5000"))
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "30"))
+REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "100"))
+SEARCH_MAX_RADIUS_METERS = int(os.getenv("SEARCH_MAX_RADIUS_METERS", "50000"))
+ADMIN_BULK_MAX = int(os.getenv("ADMIN_BULK_MAX", "500"))
+# tiles a single /map/clusters viewport may span
+MAP_MAX_TILES = int(os.getenv("MAP_MAX_TILES", "64"))
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
 LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
 IMAGE_CAPTION_MODEL = os.getenv("IMAGE_CAPTION_MODEL", "Salesforce/blip-image-captioning-large")
-HF_BASE = "https://api-inference.huggingface.co/models"
+HF_BASE = os.getenv("HF_BASE", "https://api-inference.huggingface.co/models")
 HTTP_TIMEOUT = 60
+HF_MAX_CONCURRENCY = int(os.getenv("HF_MAX_CONCURRENCY", "8"))  # per model
+HF_MAX_CONNECTIONS = int(os.getenv("HF_MAX_CONNECTIONS", "32"))
+HF_HTTP2 = os.getenv("HF_HTTP2", "true").lower() in ("1", "true", "yes")
+HF_BREAKER_FAILURES = int(os.getenv("HF_BREAKER_FAILURES", "5"))
+HF_BREAKER_RESET_SECONDS = float(os.getenv("HF_BREAKER_RESET_SECONDS", "30"))
+HF_SLOW_CALL_SECONDS = float(os.getenv("HF_SLOW_CALL_SECONDS", "20"))
+INFERENCE_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_SIZE", "2048"))
+INFERENCE_CACHE_TTL_SECONDS = float(os.getenv("INFERENCE_CACHE_TTL_SECONDS", "3600"))
+INFERENCE_CACHE_PERSIST_DAYS = float(os.getenv("INFERENCE_CACHE_PERSIST_DAYS", "30"))
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", "data/report_classifier.json")
+# local predictions at or above this confidence skip the LLM entirely
+CLASSIFIER_CONFIDENCE_THRESHOLD = float(os.getenv("CLASSIFIER_CONFIDENCE_THRESHOLD", "0.7"))
+# "inline" runs caption + LLM inside the request; "background" persists the report
+# as pending and hands enrichment to the worker pool
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "inline")
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "4"))
+ENRICHMENT_QUEUE_SIZE = int(os.getenv("ENRICHMENT_QUEUE_SIZE", "500"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3"))
+ENRICHMENT_BACKOFF_SECONDS = float(os.getenv("ENRICHMENT_BACKOFF_SECONDS", "2"))
 
 
 users_collection = crud.users_collection
@@ -48,28 +113,26 @@ def _get_authenticated_user_id(request: Request) -> str:
     return user_id
 
 
-def _is_admin_by_user_id(user_id: str) -> bool:
-    user_doc = users_collection.find_one({"clerk_user_id": user_id})
-    if not user_doc:
-        return False
-    return user_doc.get("role") == "admin"
+async def _is_admin_by_user_id(user_id: str, claims: Optional[Dict[str, Any]] = None) -> bool:
+    return await role_cache.is_admin(user_id, claims)
 
 
-def _ensure_admin(request: Request) -> None:
+async def _ensure_admin(request: Request) -> None:
     uid = _get_authenticated_user_id(request)
-    if not _is_admin_by_user_id(uid):
+    if not await _is_admin_by_user_id(uid, getattr(request.state, "claims", None)):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
 
 
-def _save_upload(file: UploadFile) -> str:
-    filename = file.filename or ""
-    ext = os.path.splitext(filename)[1] or ""
-    fname = f"{int(datetime.utcnow().timestamp())}-{uuid.uuid4().hex}{ext}"
-    dst_path = os.path.join(STATIC_UPLOAD_DIR, fname)
-    with open(dst_path, "wb") as out_f:
-        shutil.copyfileobj(file.file, out_f)
-    # returned path is the mounted static route path (main.py mounts /static -> static)
-    return f"/static/uploads/{fname}"
+async def _save_upload(file: UploadFile) -> Dict[str, Any]:
+    # returned url is the mounted static route path (main.py mounts /static -> static)
+    return await save_upload_stream(
+        file,
+        STATIC_UPLOAD_DIR,
+        "/static/uploads",
+        max_bytes=MAX_UPLOAD_BYTES,
+        keep_bytes=CAPTION_MAX_BYTES,
+        chunk_size=UPLOAD_CHUNK_BYTES,
+    )
 
 
 def _validate_geo_coords(lon: float, lat: float) -> None:
@@ -77,20 +140,153 @@ def _validate_geo_coords(lon: float, lat: float) -> None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid latitude or longitude")
 
 
+def _validate_image_size(image_size: str) -> None:
+    if image_size not in IMAGE_SIZES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid image_size; allowed: {list(IMAGE_SIZES)}")
+
+
+def _pack_cursor(data: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(data, dict):
+            raise ValueError("cursor is not an object")
+        return data
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _encode_cursor(doc: Dict[str, Any]) -> str:
+    return _pack_cursor({"t": doc["created_at"].isoformat(), "id": doc["id"]})
+
+
+def _encode_vote_cursor(doc: Dict[str, Any]) -> str:
+    # the stored count, before upvote_counter.overlay(), is what the next query compares against
+    return _pack_cursor({"u": doc.get("upvotes", 0), "id": doc["id"]})
+
+
+def _decode_vote_cursor(cursor: str) -> tuple:
+    data = _unpack_cursor(cursor)
+    try:
+        return int(data["u"]), ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _encode_score_cursor(doc: Dict[str, Any]) -> str:
+    return _pack_cursor({"s": doc["score"], "id": doc["id"]})
+
+
+def _decode_score_cursor(cursor: str) -> tuple:
+    data = _unpack_cursor(cursor)
+    try:
+        return float(data["s"]), ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    data = _unpack_cursor(cursor)
+    try:
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def _count_reports(query: Dict[str, Any], mode: str) -> Optional[int]:
+    if mode == "none":
+        return None
+    if mode == "estimated" and not query:
+        return await crud.run_db(crud.estimate_report_count)
+    key = tuple(sorted(query.items()))
+    if mode != "exact":
+        cached = _admin_count_cache.get(key)
+        if cached is not None:
+            return cached
+    total = await crud.run_db(crud.count_reports, query)
+    _admin_count_cache.set(key, total)
+    return total
+
+
+async def _notification_scope(request: Request, departments: Optional[str]) -> Tuple[Dict[str, Any], set]:
+    # (catch-up query, push channels): citizens get their own reports; admins also
+    # get the listed departments, or every department when none are listed
+    uid = _get_authenticated_user_id(request)
+    wanted = [d.strip() for d in (departments or "").split(",") if d.strip()]
+    is_admin = await _is_admin_by_user_id(uid, getattr(request.state, "claims", None))
+    if wanted and not is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    if not is_admin:
+        return {"user_id": uid}, {f"user:{uid}"}
+    if not wanted:
+        return {}, {ALL_DEPARTMENTS, f"user:{uid}"}
+    query = {"$or": [{"user_id": uid}, {"department": {"$in": wanted}}]}
+    return query, {f"user:{uid}"} | {f"dept:{d}" for d in wanted}
+
+
+def _notification_out(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id"}}
+
+
+def _sse_event(doc: Dict[str, Any]) -> str:
+    return f"id: {doc['_id']}\nevent: {doc['type']}\ndata: {dumps(_notification_out(doc)).decode()}\n\n"
+
+
 def _to_object_id(oid_str: str) -> Optional[ObjectId]:
     try:
         return ObjectId(oid_str)
     except Exception:
         return None
 
+hf_client = InferenceClient(
+    HF_BASE,
+    HF_API_TOKEN,
+    timeout=HTTP_TIMEOUT,
+    max_concurrency=HF_MAX_CONCURRENCY,
+    max_connections=HF_MAX_CONNECTIONS,
+    max_keepalive_connections=HF_MAX_CONNECTIONS,
+    http2=HF_HTTP2,
+    breaker_failures=HF_BREAKER_FAILURES,
+    breaker_reset_seconds=HF_BREAKER_RESET_SECONDS,
+    slow_call_seconds=HF_SLOW_CALL_SECONDS,
+)
+
+local_classifier = TieredClassifier(CLASSIFIER_MODEL_PATH)
+
+derivative_pool = DerivativePool(DERIVATIVE_WORKERS)
+
+# admin list totals per filter combination, so paging does not re-count
+_admin_count_cache = TTLCache(maxsize=1024, ttl=ADMIN_COUNT_CACHE_TTL_SECONDS)
+
+# GET /report/{id}: raw documents (DETAIL_FIELDS only) by ObjectId
+_report_cache = TTLCache(maxsize=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL_SECONDS)
+_DETAIL_PROJECTION = {f: 1 for f in DETAIL_FIELDS}
+# per report, the sequence number of its latest write (kept well past any read),
+# so a read that overlapped a write does not cache the document it got
+_write_seq = itertools.count(1)
+_report_writes = TTLCache(maxsize=REPORT_CACHE_SIZE, ttl=60)
+_report_cache_lock = threading.Lock()
+
+def _forget_report(doc) -> None:
+    with _report_cache_lock:
+        _report_writes.set(doc["_id"], next(_write_seq))
+        _report_cache.pop(doc["_id"])
+
+crud.on_report_write(_forget_report)
+
+inference_cache = InferenceCache(
+    maxsize=INFERENCE_CACHE_SIZE,
+    ttl=INFERENCE_CACHE_TTL_SECONDS,
+    persist_seconds=INFERENCE_CACHE_PERSIST_DAYS * 86400,
+)
+
 async def _hf_text(model: str, prompt: str, max_tokens: int = 512) -> str:
-    if not HF_API_TOKEN:
-        raise RuntimeError("HF_API_TOKEN not set")
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as c:
-        r = await c.post(f"{HF_BASE}/{model}", headers={"Authorization": f"Bearer {HF_API_TOKEN}"}, json={
-            "inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.0}, "options": {"use_cache": False}
-        })
-    r.raise_for_status()
+    r = await hf_client.post(model, json={
+        "inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.0}, "options": {"use_cache": False}
+    })
     res = r.json()
     if isinstance(res, list) and res:
         return res[0].get("generated_text") or res[0].get("text") or str(res)
@@ -99,12 +295,8 @@ async def _hf_text(model: str, prompt: str, max_tokens: int = 512) -> str:
     return str(res)
 
 async def _hf_image_caption(model: str, image_bytes: bytes) -> Optional[str]:
-    if not HF_API_TOKEN:
-        raise RuntimeError("HF_API_TOKEN not set")
     files = {"inputs": ("image.jpg", image_bytes, "image/jpeg")}
-    async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as c:
-        r = await c.post(f"{HF_BASE}/{model}", headers={"Authorization": f"Bearer {HF_API_TOKEN}"}, files=files)
-    r.raise_for_status()
+    r = await hf_client.post(model, files=files)
     res = r.json()
     if isinstance(res, list) and res:
         return res[0].get("generated_text") or res[0].get("caption") or str(res)
@@ -132,15 +324,20 @@ def _parse_json(text: str) -> Optional[Dict[str, Any]]:
             return json.loads(cand.replace("'", '"'))
         except Exception:
             return None
-async def _reconcile_to_json(user_text: str, image_caption: Optional[str]) -> Dict[str, str]:
+async def _reconcile_to_json(user_text: str, image_caption: Optional[str]) -> Tuple[Dict[str, str], bool]:
+    # (fields, parsed): parsed is False when the reply was not JSON and the fields are defaults
     combined = f"User text:\n{user_text or '<none>'}\n\n"
     if image_caption: combined += f"Image caption:\n{image_caption}\n\n"
     combined += (
         "Produce JSON only with keys: title (<=100 chars), category, urgency (Low|Medium|High), "
         "assigned_department, description (<=500 chars). Prefer image for visual facts, text for claims. "
     )
-    resp = await _hf_text(LLM_MODEL, combined, max_tokens=512)
-    parsed = _parse_json(resp) or {}
+    with metrics.stage("llm"):
+        resp = await _hf_text(LLM_MODEL, combined, max_tokens=512)
+    with metrics.stage("parse_json"):
+        parsed = _parse_json(resp)
+    ok = isinstance(parsed, dict)
+    parsed = parsed if ok else {}
     # minimal normalization & defaults
     return {
         "title": (parsed.get("title") or parsed.get("summary") or (user_text or image_caption or "Citizen report"))[:100],
@@ -148,20 +345,265 @@ async def _reconcile_to_json(user_text: str, image_caption: Optional[str]) -> Di
         "urgency": parsed.get("urgency") or "Low",
         "assigned_department": parsed.get("assigned_department") or parsed.get("department") or "General",
         "description": (parsed.get("description") or parsed.get("text") or user_text or image_caption or "")[:500],
+    }, ok
+def _local_ai_out(text: str, prediction: Optional[Dict[str, Any]], source: str) -> Dict[str, str]:
+    prediction = prediction or {"category": "Other", "urgency": "Low", "assigned_department": "General"}
+    return {
+        "title": (text or "")[:100] or "Citizen report",
+        "category": prediction["category"],
+        "urgency": prediction["urgency"],
+        "assigned_department": prediction["assigned_department"],
+        "description": (text or "")[:500],
+        "source": source,
     }
+
 def _conservative_stub(text: str) -> Dict[str, str]:
-    t = (text or "").lower()
-    cat, dep, urg = "Other", "General", "Low"
-    if any(k in t for k in ("pothole","hole","sink")):
-        cat, dep, urg = "Pothole", "Public Works", "Medium"
-    elif any(k in t for k in ("streetlight","lamp","light")):
-        cat, dep, urg = "Streetlight", "Electrical", "Medium"
-    elif any(k in t for k in ("water","leak","sewer","flood")):
-        cat, dep, urg = "Water Leakage", "Water Board", "High"
-    elif any(k in t for k in ("garbage","trash","bin","sanitation")):
-        cat, dep, urg = "Sanitation", "Sanitation", "Low"
-    title = (text or "")[:100] or "Citizen report"
-    return {"title": title, "category": cat, "urgency": urg, "assigned_department": dep, "description": (text or "")[:500]}
+    return _local_ai_out(text, local_classifier.predict(text or ""), "stub")
+
+
+def _normalize_ai_output(ai_out: Dict[str, str], user_text: str, image_caption: Optional[str]) -> Dict[str, Any]:
+    # enforce allowed values
+    return {
+        "title": (ai_out.get("title") or "Citizen report")[:100],
+        "category": ai_out.get("category") if ai_out.get("category") in ALLOWED_CATEGORIES else "Other",
+        "urgency": ai_out.get("urgency") if ai_out.get("urgency") in ALLOWED_URGENCIES else "Low",
+        "assigned_department": ai_out.get("assigned_department") if ai_out.get("assigned_department") in ALLOWED_DEPARTMENTS else "General",
+        "original_text": (ai_out.get("description") or user_text or image_caption or "")[:500] or None,
+        "classified_by": ai_out.get("source"),
+    }
+
+async def _caption_or_none(image_bytes: Optional[bytes], digest: Optional[str] = None) -> Optional[str]:
+    if not image_bytes:
+        return None
+    digest = digest or image_digest(image_bytes)
+    cached = await inference_cache.get("caption", IMAGE_CAPTION_MODEL, digest)
+    if cached:
+        return cached
+    try:
+        with metrics.stage("caption"):
+            caption = await _hf_image_caption(IMAGE_CAPTION_MODEL, image_bytes)
+    except Exception:
+        return None
+    if caption:
+        await inference_cache.set("caption", IMAGE_CAPTION_MODEL, digest, caption)
+    return caption
+
+async def _classify(user_text: str, image_caption: Optional[str]) -> Dict[str, str]:
+    # local classifier first, then _reconcile_to_json behind the inference cache;
+    # LLM errors propagate so callers can fall back
+    combined_text = " ".join(filter(None, [user_text, image_caption]))
+    local = local_classifier.predict(combined_text)
+    if local and local["confidence"] >= CLASSIFIER_CONFIDENCE_THRESHOLD:
+        return _local_ai_out(combined_text, local, "local")
+    digest = text_digest(user_text, image_caption)
+    cached = await inference_cache.get("classification", LLM_MODEL, digest)
+    if cached:
+        return cached
+    fields, parsed = await _reconcile_to_json(user_text, image_caption)
+    ai_out = {**fields, "source": "llm"}
+    # a garbled reply is used this once but not cached, so the next submission asks again
+    if parsed and ai_out["category"] in ALLOWED_CATEGORIES:
+        await inference_cache.set("classification", LLM_MODEL, digest, ai_out)
+    return ai_out
+
+def _upload_path(image_url: Optional[str]) -> Optional[str]:
+    if not image_url or not image_url.startswith("/static/uploads/"):
+        return None
+    return os.path.join(STATIC_UPLOAD_DIR, image_url.rsplit("/", 1)[1])
+
+async def _process_image(image_path: Optional[str], digest: str) -> Tuple[Optional[Dict[str, str]], Optional[bytes]]:
+    # derivative URLs plus a downscaled copy for the captioner; (None, None) when unavailable
+    if not image_path or not derivative_pool.enabled:
+        return None, None
+    try:
+        names, caption_bytes = await derivative_pool.run(
+            image_path, STATIC_UPLOAD_DIR, digest, DERIVATIVE_SIZES, DERIVATIVE_FORMAT, caption_side=CAPTION_IMAGE_SIZE,
+        )
+    except Exception as e:
+        print(f"Could not build derivatives for {image_path}: {e}")
+        return None, None
+    return {name: f"/static/uploads/{fname}" for name, fname in names.items()}, caption_bytes
+
+async def _image_hash(image_path: Optional[str]) -> Optional[int]:
+    if not image_path or not derivative_pool.enabled:
+        return None
+    try:
+        return await derivative_pool.dhash(image_path)
+    except Exception as e:
+        print(f"Could not hash {image_path}: {e}")
+        return None
+
+async def _join_duplicate(
+    user_id: str, longitude: float, latitude: float, user_text: str, image_url: Optional[str], fp: Dict[str, int],
+) -> Optional[JSONResponse]:
+    """Adds the submission to a matching open report and says so, or returns None to file a new one."""
+    local = local_classifier.predict(user_text) if user_text else None
+    category = local["category"] if local and local["confidence"] >= CLASSIFIER_CONFIDENCE_THRESHOLD else None
+    submission = {
+        "user_id": user_id,
+        "text": user_text or None,
+        "image_url": image_url,
+        "location": {"type": "Point", "coordinates": [longitude, latitude]},
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        existing = await crud.run_db(find_duplicate, longitude, latitude, category, fp, image_url, user_id)
+        doc = await crud.run_db(crud.link_duplicate, existing["_id"], submission) if existing else None
+    except Exception as e:
+        # never lose a submission to the check itself
+        print(f"Duplicate check failed: {e}")
+        return None
+    if not doc:
+        return None
+    # joining counts as the user's upvote
+    upvotes = doc.get("upvotes", 0)
+    try:
+        if await crud.run_db(crud.add_vote, doc["_id"], user_id):
+            upvote_counter.add(str(doc["_id"]), 1)
+            hot_feed.touch(doc["_id"])
+        stored, view = await upvote_counter.read(crud.get_report_upvotes, doc["_id"])
+        upvotes = upvote_counter.live(str(doc["_id"]), stored or 0, view)
+    except Exception as e:
+        print(f"Could not record the vote for joined report {doc['_id']}: {e}")
+    return JSONResponse(status_code=status.HTTP_200_OK, content={
+        "status": "duplicate",
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "report_status": doc.get("status"),
+        "upvotes": upvotes,
+        "duplicate_count": doc.get("duplicate_count", 0),
+        "message": "This issue has already been reported nearby, so your report was added to it.",
+    })
+
+def _render_feed(docs, image_size: str) -> bytes:
+    data = [shape_report(doc, LIST_FIELDS, image_size) for doc in docs]
+    upvote_counter.overlay(data)
+    return dumps({"status": "success", "data": data})
+
+def _votes_flushed(report_ids):
+    # the stored counts moved: re-read what the hot feed holds now, and swap the counts in
+    # (and drop cached single reports) in the same step that retires the in-flight deltas
+    held = [oid for oid in report_ids if hot_feed.holds(oid)]
+    counts = {doc["_id"]: doc.get("upvotes", 0) for doc in crud.get_reports_by_ids(held, {"upvotes": 1})} if held else {}
+
+    def settle() -> None:
+        for oid in report_ids:
+            _report_cache.pop(oid)
+        hot_feed.set_upvotes(counts)
+    return settle
+
+def _own_vote_flush(change) -> bool:
+    # an $inc of this process's flush reaches the hot feed through _votes_flushed instead
+    fields = (change.get("updateDescription") or {}).get("updatedFields") or {}
+    return set(fields) == {"upvotes"} and upvote_counter.flushing(str(change["documentKey"]["_id"]))
+
+upvote_counter.on_flush(_votes_flushed)
+hot_feed.skip_change = _own_vote_flush
+
+def _parse_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return DETAIL_FIELDS
+    wanted = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in wanted if f not in DETAIL_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields {unknown}; allowed: {list(DETAIL_FIELDS)}")
+    return wanted
+
+async def _load_reports(oids) -> Dict[ObjectId, Dict[str, Any]]:
+    """Report documents by id, from the per-id cache or one $in query for the rest, with live upvote counts."""
+    def cached():
+        return {oid: doc for oid, doc in ((oid, _report_cache.get(oid)) for oid in oids) if doc is not None}
+
+    def live(doc, view):
+        return {**doc, "upvotes": upvote_counter.live(str(doc["_id"]), doc.get("upvotes", 0), view)}
+
+    found, view = upvote_counter.held(cached)
+    docs = {oid: live(doc, view) for oid, doc in found.items()}
+    missing = [oid for oid in oids if oid not in found]
+    if missing:
+        started = next(_write_seq)
+        fetched, view = await upvote_counter.read(crud.get_reports_by_ids, missing, _DETAIL_PROJECTION)
+
+        def keep() -> None:
+            with _report_cache_lock:
+                for doc in fetched:
+                    if (_report_writes.get(doc["_id"]) or 0) < started:
+                        _report_cache.set(doc["_id"], doc)
+
+        # cached only if neither a flush started nor the report was written since the read;
+        # a later flush's settle step or write drops it again
+        upvote_counter.if_current(view, keep)
+        docs.update((doc["_id"], live(doc, view)) for doc in fetched)
+    return docs
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+### background enrichment
+
+def _enrichment_job(report_id: ObjectId, user_text: str, image_url: Optional[str]) -> Dict[str, Any]:
+    return {"report_id": report_id, "user_text": user_text, "image_path": _upload_path(image_url)}
+
+def _job_fields(job: Dict[str, Any], ai_out: Dict[str, str]) -> Dict[str, Any]:
+    fields = _normalize_ai_output(ai_out, job["user_text"], job.get("image_caption"))
+    if job.get("image_variants"):
+        fields["image_variants"] = job["image_variants"]
+    return fields
+
+async def _run_enrichment_job(job: Dict[str, Any]) -> None:
+    # derivatives and caption are kept on the job so retries only repeat the LLM call
+    if "image_caption" not in job:
+        image_path = job["image_path"]
+        digest = os.path.splitext(os.path.basename(image_path))[0] if image_path else None
+        job["image_variants"], image_bytes = await _process_image(image_path, digest)
+        if image_bytes is None and image_path:
+            image_bytes = await asyncio.to_thread(_read_file, image_path)
+        job["image_caption"] = await _caption_or_none(image_bytes, digest)
+    try:
+        ai_out = await _classify(job["user_text"], job["image_caption"])
+    except CircuitOpenError as e:
+        # upstream is known to be down; retrying would only delay the stub
+        await _enrichment_fallback(job, e)
+        return
+    await _apply_enrichment(job, ai_out, "done")
+
+async def _enrichment_fallback(job: Dict[str, Any], error: Exception) -> None:
+    metrics.classification_fallbacks.inc("enrichment")
+    ai_out = _conservative_stub(" ".join(filter(None, [job["user_text"], job.get("image_caption")])))
+    await _apply_enrichment(job, ai_out, "fallback")
+
+async def _apply_enrichment(job: Dict[str, Any], ai_out: Dict[str, str], enrichment_status: str) -> None:
+    fields = _job_fields(job, ai_out)
+    await crud.run_db(crud.apply_enrichment, job["report_id"], fields, enrichment_status)
+
+enrichment_queue = JobQueue(
+    "enrichment",
+    _run_enrichment_job,
+    workers=ENRICHMENT_WORKERS,
+    maxsize=ENRICHMENT_QUEUE_SIZE,
+    max_attempts=ENRICHMENT_MAX_ATTEMPTS,
+    backoff_base=ENRICHMENT_BACKOFF_SECONDS,
+    on_give_up=_enrichment_fallback,
+)
+
+async def purge_stale_inference_cache() -> int:
+    return await inference_cache.purge_stale({"caption": IMAGE_CAPTION_MODEL, "classification": LLM_MODEL})
+
+async def resume_pending_enrichment() -> int:
+    """Re-enqueues reports left pending by a previous process; returns how many were queued."""
+    docs = await crud.run_db(crud.get_reports_pending_enrichment, ENRICHMENT_QUEUE_SIZE)
+    queued = 0
+    for doc in docs:
+        if enrichment_queue.submit(_enrichment_job(doc["_id"], doc.get("original_text") or "", doc.get("image_url"))):
+            queued += 1
+    return queued
 
 ### end of helpers 
     
@@ -176,52 +618,67 @@ async def smart_create_report(
     longitude: float = Form(...),
     image: Optional[UploadFile] = File(None),
     image_url: Optional[str] = Form(None),
+    force_new: bool = Form(False, description="skip the duplicate check and always file a new report"),
 ):
     user_id = _get_authenticated_user_id(request)
     _validate_geo_coords(longitude, latitude)
 
     saved_image_url = None
+    image_variants = None
     image_caption = None
+    upload = None
     user_text = (text or "").strip()
+    background = ENRICHMENT_MODE == "background" and not enrichment_queue.full()
 
     if image:
         try:
-            saved_image_url = _save_upload(image)
-            image_bytes = await image.read()
-            try:
-                image_caption = await _hf_image_caption(IMAGE_CAPTION_MODEL, image_bytes)
-            except Exception:
-                image_caption = None
+            with metrics.stage("save_upload"):
+                upload = await _save_upload(image)
+        except HTTPException:
+            raise
         except Exception:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save uploaded file")
+        saved_image_url = upload["url"]
 
     if image_url:
         saved_image_url = image_url
 
-    # combine sources: if both present, both are passed to the LLM for reconciliation
-    llm_input_text = user_text or image_caption or (f"Image at URL: {saved_image_url}" if saved_image_url else "")
-    try:
-        ai_out = await _reconcile_to_json(user_text, image_caption)
-    except Exception:
-        ai_out = _conservative_stub(" ".join(filter(None, [user_text, image_caption])))
+    # before any inference: a report of an issue that is already open joins that report
+    with metrics.stage("fingerprint"):
+        fp = fingerprint(user_text, await _image_hash(upload["path"] if upload else None))
+    if DUPLICATE_DETECTION and not force_new:
+        with metrics.stage("duplicate_check"):
+            joined = await _join_duplicate(user_id, longitude, latitude, user_text, saved_image_url, fp)
+        if joined is not None:
+            return joined
 
-    # enforce allowed values
-    category = ai_out.get("category") if ai_out.get("category") in ALLOWED_CATEGORIES else "Other"
-    urgency = ai_out.get("urgency") if ai_out.get("urgency") in ALLOWED_URGENCIES else "Low"
-    assigned_department = ai_out.get("assigned_department") if ai_out.get("assigned_department") in ALLOWED_DEPARTMENTS else "General"
-    title = (ai_out.get("title") or "Citizen report")[:100]
-    original_text_field = (ai_out.get("description") or user_text or image_caption or "")[:500] or None
+    if upload and not background:
+        with metrics.stage("process_image"):
+            image_variants, caption_bytes = await _process_image(upload["path"], upload["sha256"])
+        image_caption = await _caption_or_none(caption_bytes or upload["data"], upload["sha256"])
+
+    if background:
+        # persist a placeholder now; the worker pool fills in the AI fields
+        fields = _normalize_ai_output({"title": user_text}, user_text, None)
+    else:
+        # combine sources: if both present, both are passed to the LLM for reconciliation
+        try:
+            with metrics.stage("classify"):
+                ai_out = await _classify(user_text, image_caption)
+        except Exception:
+            metrics.classification_fallbacks.inc("inline")
+            ai_out = _conservative_stub(" ".join(filter(None, [user_text, image_caption])))
+        fields = _normalize_ai_output(ai_out, user_text, image_caption)
 
     payload: Dict[str, Any] = {
         "user_id": str(user_id),
-        "title": title,
-        "category": category,
-        "urgency": urgency,
-        "assigned_department": assigned_department,
-        "original_text": original_text_field,
+        **fields,
         "image_url": saved_image_url or None,
+        "image_variants": image_variants,
         "location": {"type": "Point", "coordinates": [longitude, latitude]},
         "status": "Submitted",
+        "enrichment_status": "pending" if background else None,
+        "fingerprint": fp or None,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
@@ -229,12 +686,20 @@ async def smart_create_report(
     try:
         try:
             report_obj = crud.ReportInDB.model_validate(payload)
-            crud.create_report(report_obj)
+            with metrics.stage("create_report"):
+                created = await crud.run_db(crud.create_report, report_obj)
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to validate report data: {str(e)}")
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to persist report")
 
+    if background:
+        # a full queue leaves the report pending; it is picked up again on the next startup
+        enrichment_queue.submit(_enrichment_job(created.id, user_text, saved_image_url))
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"status": "accepted", "id": str(created.id), "enrichment_status": "pending"},
+        )
     return {"status": "success"}
 
 @router.get("/nearby")
@@ -242,67 +707,298 @@ async def get_nearby_reports(
     request: Request,
     lat: float = Query(..., description="Latitude"),
     lng: float = Query(..., description="Longitude"),
-    max_distance_meters: int = Query(5000),
+    max_distance_meters: int = Query(5000, ge=1, le=50000),
+    image_size: str = Query("thumb", description="thumb | medium | original"),
+    limit: int = Query(100, ge=1, le=500),
+    order: str = Query("distance", description="distance | recency | upvotes"),
+    status_filter: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
 ):
     _get_authenticated_user_id(request)
     _validate_geo_coords(lng, lat)
+    _validate_image_size(image_size)
+    if order not in NEARBY_ORDERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid order; allowed: {list(NEARBY_ORDERS)}")
+    query = {"status": status_filter} if status_filter else {}
+    projection = report_projection(LIST_FIELDS, image_size)
     try:
-        results = crud.get_reports_nearby(longitude=lng, latitude=lat, max_distance_meters=max_distance_meters)
+        if order == "distance":
+            # resume at the last distance, skipping the reports already returned at exactly that distance
+            after = _unpack_cursor(cursor) if cursor else {}
+            try:
+                min_distance = float(after["d"]) if after else None
+                exclude_ids = [ObjectId(i) for i in after.get("ids", [])]
+            except Exception:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            results, view = await upvote_counter.read(
+                crud.get_reports_nearby_by_distance, lng, lat, max_distance_meters, limit + 1,
+                query=query, min_distance=min_distance, exclude_ids=exclude_ids, projection=projection,
+            )
+        elif order == "recency":
+            after = _decode_cursor(cursor) if cursor else None
+            results, view = await upvote_counter.read(
+                crud.get_reports_nearby_sorted, lng, lat, max_distance_meters, limit + 1,
+                sort=crud.NEWEST_FIRST, query=query, after=after, projection=projection,
+            )
+        else:
+            after = _decode_vote_cursor(cursor) if cursor else None
+            results, view = await upvote_counter.read(
+                crud.get_reports_nearby_sorted, lng, lat, max_distance_meters, limit + 1,
+                sort=crud.TOP_VOTED, query=query, after=after, projection=projection,
+            )
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to query nearby reports")
-    return {"status": "success", "data": [r.model_dump() for r in results]}
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more and order == "distance":
+        last = results[-1]["distance_meters"]
+        next_cursor = _pack_cursor({"d": last, "ids": [r["id"] for r in results if r["distance_meters"] == last]})
+    elif has_more and order == "recency":
+        next_cursor = _encode_cursor(results[-1])
+    elif has_more:
+        next_cursor = _encode_vote_cursor(results[-1])
+    upvote_counter.overlay(results, view)
+    return RawJSONResponse({"status": "success", "data": results, "meta": {"limit": limit, "order": order, "next_cursor": next_cursor}})
 
 
 @router.get("/my-reports")
-async def get_my_reports(request: Request):
+async def get_my_reports(request: Request, image_size: str = Query("thumb", description="thumb | medium | original")):
     user_id = _get_authenticated_user_id(request)
+    _validate_image_size(image_size)
     try:
-        reports = crud.get_reports_by_user_id(user_id)
+        reports, view = await upvote_counter.read(crud.get_reports_by_user_id, user_id, report_projection(LIST_FIELDS, image_size))
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch user reports")
-    return {"status": "success", "data": [r.model_dump() for r in reports]}
+    upvote_counter.overlay(reports, view)
+    return RawJSONResponse({"status": "success", "data": reports})
 
 # Fix: Added the missing /reports endpoint for the general user feed
 @router.get("/reports")
-async def get_reports(request: Request):
+async def get_reports(
+    request: Request,
+    image_size: str = Query("thumb", description="thumb | medium | original"),
+    order: str = Query("recency", description="recency | upvotes"),
+):
     """
-    Returns a general list of all reports for any authenticated user.
+    Returns the newest reports for any authenticated user, served from the in-process hot feed,
+    or with order=upvotes the most upvoted ones.
     """
     _get_authenticated_user_id(request)
+    _validate_image_size(image_size)
+    if order not in FEED_ORDERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid order; allowed: {list(FEED_ORDERS)}")
+    if order == "upvotes":
+        try:
+            results, view = await upvote_counter.read(crud.get_top_reports, FEED_SIZE, report_projection(LIST_FIELDS, image_size))
+        except Exception:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch reports")
+        upvote_counter.overlay(results, view)
+        results.sort(key=lambda r: (r.get("upvotes", 0), r["id"]), reverse=True)
+        return RawJSONResponse({"status": "success", "data": results})
     try:
-        # This is a simplified approach. In a real app, you'd likely want pagination here.
-        cursor = reports_collection.find({}).sort("created_at", -1).limit(100)
-        results = list(cursor)
-        for r in results:
-            r["id"] = str(r["_id"])
-            r.pop("_id", None)
-        return {"status": "success", "data": results}
+        await hot_feed.ensure_loaded()
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch reports")
+    body, etag = hot_feed.render(image_size, lambda docs: _render_feed(docs, image_size))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return RawJSONResponse(body, headers=headers)
+
+
+@router.get("/map/tiles/{z}/{x}/{y}")
+async def get_map_tile(request: Request, z: int, x: int, y: int):
+    """Report clusters (or, at high zoom, individual reports) for one web-mercator tile."""
+    _get_authenticated_user_id(request)
+    if not (0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid tile coordinates")
+    try:
+        tile = await tile_cache.get_tile(z, x, y)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to build map tile")
+    return RawJSONResponse({"status": "success", "data": serialize_tile(z, x, y, tile)})
 
+@router.get("/map/clusters")
+async def get_map_clusters(
+    request: Request,
+    bbox: str = Query(..., description="west,south,east,north in degrees"),
+    zoom: int = Query(..., ge=0),
+):
+    """Clusters and points for a viewport, assembled from the cached tiles it covers."""
+    _get_authenticated_user_id(request)
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox must be west,south,east,north")
+    _validate_geo_coords(west, south)
+    _validate_geo_coords(east, north)
+    if west > east or south > north:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox must be west,south,east,north")
+    zoom = min(zoom, TILE_MAX_ZOOM)
+    tiles = tiles_for_bbox(west, south, east, north, zoom)
+    if len(tiles) > MAP_MAX_TILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Viewport spans too many tiles; lower the zoom")
+    try:
+        built = await asyncio.gather(*(tile_cache.get_tile(zoom, x, y) for x, y in tiles))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to build map tiles")
+    clusters, points = [], []
+    for (x, y), tile in zip(tiles, built):
+        data = serialize_tile(zoom, x, y, tile)
+        clusters.extend(data["clusters"])
+        points.extend(data["points"])
+    return RawJSONResponse({"status": "success", "data": {"zoom": zoom, "clusters": clusters, "points": points}})
+
+async def _set_vote(request: Request, report_id: str, upvoted: bool) -> Dict[str, Any]:
+    user_id = _get_authenticated_user_id(request)
+    oid = _to_object_id(report_id)
+    if not oid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid report id")
+    try:
+        stored, view = await upvote_counter.read(crud.get_report_upvotes, oid)
+        if stored is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+        changed = await crud.run_db(crud.add_vote if upvoted else crud.remove_vote, oid, user_id)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to record vote")
+    # a repeated vote (or un-vote) is a no-op; the counter only moves when `votes` changed
+    if changed:
+        upvote_counter.add(str(oid), 1 if upvoted else -1)
+        hot_feed.touch(oid)
+    return {"status": "success", "data": {"id": str(oid), "upvoted": upvoted, "upvotes": upvote_counter.live(str(oid), stored, view)}}
+
+@router.get("/report")
+async def get_reports_by_ids(
+    request: Request,
+    ids: str = Query(..., description="comma-separated report ids"),
+    fields: Optional[str] = Query(None, description="comma-separated subset of the report fields"),
+    image_size: str = Query("thumb", description="thumb | medium | original"),
+):
+    """Batch lookup; ids that do not exist or are not visible to the caller come back in meta.missing."""
+    user_id = _get_authenticated_user_id(request)
+    _validate_image_size(image_size)
+    fields = _parse_fields(fields)
+    requested = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not requested or len(requested) > REPORT_BATCH_MAX:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Pass between 1 and {REPORT_BATCH_MAX} ids")
+    oids = [_to_object_id(i) for i in requested]
+    if not all(oids):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid report id")
+    try:
+        docs = await _load_reports(oids)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch reports")
+    # the role lookup is only needed when someone else's report was asked for
+    if any(doc.get("user_id") != user_id for doc in docs.values()):
+        if not await _is_admin_by_user_id(user_id, getattr(request.state, "claims", None)):
+            docs = {oid: doc for oid, doc in docs.items() if doc.get("user_id") == user_id}
+    data = [shape_report(docs[oid], fields, image_size) for oid in oids if oid in docs]
+    missing = [str(oid) for oid in oids if oid not in docs]
+    return RawJSONResponse({"status": "success", "data": data, "meta": {"missing": missing}})
+
+@router.get("/report/{report_id}")
+async def get_report(
+    request: Request,
+    report_id: str,
+    fields: Optional[str] = Query(None, description="comma-separated subset of the report fields"),
+    image_size: str = Query("thumb", description="thumb | medium | original"),
+):
+    """One report, for its owner or an admin. If-None-Match requests are answered with 304."""
+    user_id = _get_authenticated_user_id(request)
+    _validate_image_size(image_size)
+    fields = _parse_fields(fields)
+    oid = _to_object_id(report_id)
+    if not oid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid report id")
+    try:
+        doc = (await _load_reports([oid])).get(oid)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch report")
+    # someone else's report is reported as missing rather than forbidden, so ids cannot be probed
+    if not doc or (doc.get("user_id") != user_id and not await _is_admin_by_user_id(user_id, getattr(request.state, "claims", None))):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+    data = shape_report(doc, fields, image_size)
+    # upvotes move without touching updated_at, so the tag covers the live count too;
+    # for the same reason If-Modified-Since is not honoured, only the ETag validates
+    updated_at = _as_utc(doc.get("updated_at") or doc.get("created_at") or datetime.now(timezone.utc))
+    tag_source = f"{oid}|{updated_at.isoformat()}|{data.get('upvotes')}|{','.join(fields)}|{image_size}"
+    etag = '"' + hashlib.blake2b(tag_source.encode(), digest_size=12).hexdigest() + '"'
+    headers = {"ETag": etag, "Last-Modified": format_datetime(updated_at.replace(microsecond=0), usegmt=True),
+               "Cache-Control": "private, no-cache"}
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return RawJSONResponse({"status": "success", "data": data}, headers=headers)
+
+@router.post("/report/{report_id}/upvote")
+async def upvote_report(request: Request, report_id: str):
+    """One upvote per user; the report's counter is updated in the next coalesced flush."""
+    return await _set_vote(request, report_id, True)
+
+@router.delete("/report/{report_id}/upvote")
+async def remove_upvote(request: Request, report_id: str):
+    return await _set_vote(request, report_id, False)
+
+def _status_update(new_status: str, note: Optional[str], progress_image_url: Optional[str], admin_id: Optional[str]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """$set and $push parts of one admin status change; notes and progress images are appended."""
+    now = datetime.utcnow()
+    push_fields = {}
+    if note:
+        push_fields["admin_notes"] = {"note": note, "by": admin_id, "at": now}
+    if progress_image_url:
+        push_fields["progress_images"] = progress_image_url
+    return crud.status_fields(new_status, now), push_fields or None
 
 @router.put("/admin/report/{report_id}/status", status_code=status.HTTP_200_OK)
 async def admin_update_report_status(request: Request, report_id: str, payload: Dict = Body(...)):
-    _ensure_admin(request)
+    await _ensure_admin(request)
     new_status = payload.get("status")
     if not new_status or new_status not in ALLOWED_STATUSES:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid status; allowed: {sorted(ALLOWED_STATUSES)}")
     oid = _to_object_id(report_id)
     if not oid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid report id")
-    doc = reports_collection.find_one({"_id": oid})
-    if not doc:
+    update_fields, push_fields = _status_update(new_status, payload.get("notes"), payload.get("progress_image_url"), request.state.user_id)
+    if not await crud.run_db(crud.update_report, oid, update_fields, push_fields):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
-    update_fields = {"status": new_status, "updated_at": datetime.utcnow()}
-    notes = payload.get("notes")
-    if notes:
-        update_fields.setdefault("admin_notes", []).append({"note": notes, "by": getattr(request.state, "user_id", None), "at": datetime.utcnow()})
-    progress_image_url = payload.get("progress_image_url")
-    if progress_image_url:
-        reports_collection.update_one({"_id": oid}, {"$push": {"progress_images": progress_image_url}})
-    reports_collection.update_one({"_id": oid}, {"$set": update_fields})
     return {"status": "success"}
 
+@router.post("/admin/reports/status", status_code=status.HTTP_200_OK)
+async def admin_bulk_update_status(request: Request, payload: Dict = Body(...)):
+    """
+    Applies a list of {id, status, note, progress_image_url} operations in one ordered
+    bulk write and reports the outcome of each. Invalid entries are rejected up front
+    without blocking the rest; a write error stops the batch at that entry.
+    """
+    await _ensure_admin(request)
+    operations = payload.get("operations")
+    if not isinstance(operations, list) or not operations or len(operations) > ADMIN_BULK_MAX:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"operations must be a list of 1 to {ADMIN_BULK_MAX} items")
+    results: list = [None] * len(operations)
+    updates, positions = [], []
+    for i, op in enumerate(operations):
+        op = op if isinstance(op, dict) else {}
+        oid = _to_object_id(str(op.get("id", "")))
+        if not oid:
+            results[i] = {"id": op.get("id"), "ok": False, "error": "Invalid report id"}
+        elif op.get("status") not in ALLOWED_STATUSES:
+            results[i] = {"id": op.get("id"), "ok": False, "error": f"Invalid status; allowed: {sorted(ALLOWED_STATUSES)}"}
+        else:
+            positions.append(i)
+            updates.append((oid, *_status_update(op["status"], op.get("note"), op.get("progress_image_url"), request.state.user_id)))
+    written = await crud.run_db(crud.bulk_update_reports, updates) if updates else []
+    for i, outcome in zip(positions, written):
+        if outcome["after"] is not None:
+            results[i] = {"id": operations[i]["id"], "ok": True, "status": outcome["after"]["status"]}
+        else:
+            results[i] = {"id": operations[i]["id"], "ok": False, "error": outcome["error"]}
+    applied = sum(1 for r in results if r["ok"])
+    return {"status": "success", "data": results, "meta": {"applied": applied, "failed": len(results) - applied}}
+
 @router.get("/admin/reports")
 async def admin_get_reports(
     request: Request,
@@ -311,16 +1007,269 @@ async def admin_get_reports(
     status_filter: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
+    image_size: str = Query("thumb", description="thumb | medium | original"),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page; switches to keyset pagination"),
+    count: str = Query("cached", description="exact | cached | estimated (unfiltered only) | none"),
+):
+    await _ensure_admin(request)
+    _validate_image_size(image_size)
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid count; allowed: {list(COUNT_MODES)}")
+    query = {}
+    if department: query["assigned_department"] = department
+    if category: query["category"] = category
+    if status_filter: query["status"] = status_filter
+    projection = report_projection(ADMIN_LIST_FIELDS, image_size)
+    # one extra row tells us whether there is a next page
+    if cursor is not None:
+        after = _decode_cursor(cursor) if cursor else None
+        results, view = await upvote_counter.read(crud.get_admin_reports_after, query, after, page_size + 1, projection)
+    else:
+        results, view = await upvote_counter.read(crud.get_admin_reports_page, query, page, page_size + 1, projection)
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    next_cursor = _encode_cursor(results[-1]) if has_more else None
+    upvote_counter.overlay(results, view)
+    total = await _count_reports(query, count)
+    meta = {"total": total, "page_size": page_size, "next_cursor": next_cursor}
+    if cursor is None:
+        meta["page"] = page
+    return RawJSONResponse({"status": "success", "data": results, "meta": meta})
+
+@router.get("/admin/reports/search")
+async def admin_search_reports(
+    request: Request,
+    q: Optional[str] = Query(None, max_length=200, description='words to match in title and text; "quoted phrases" must appear as written'),
+    department: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    status_filter: Optional[str] = Query(None),
+    urgency: Optional[str] = Query(None),
+    longitude: Optional[float] = Query(None),
+    latitude: Optional[float] = Query(None),
+    radius_meters: Optional[int] = Query(None, gt=0),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
+    facets: Optional[bool] = Query(None, description="include facet counts and the total; defaults to the first page only"),
+    image_size: str = Query("thumb", description="thumb | medium | original"),
 ):
-    _ensure_admin(request)
+    """Relevance-ranked text search (newest first without q), optionally within a radius, with facet counts."""
+    await _ensure_admin(request)
+    _validate_image_size(image_size)
+    text = (q or "").strip() or None
+    near = None
+    if radius_meters is not None:
+        if longitude is None or latitude is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="radius_meters needs longitude and latitude")
+        _validate_geo_coords(longitude, latitude)
+        near = (longitude, latitude, min(radius_meters, SEARCH_MAX_RADIUS_METERS))
+    if text is None and near is None:
+        # plain filtering is what /admin/reports is for
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass q, a radius, or both")
     query = {}
     if department: query["assigned_department"] = department
     if category: query["category"] = category
     if status_filter: query["status"] = status_filter
-    cursor = reports_collection.find(query).sort("created_at", -1).skip((page - 1) * page_size).limit(page_size)
-    results = list(cursor)
-    total = reports_collection.count_documents(query)
-    for r in results:
-        r["id"] = str(r["_id"])
-        r.pop("_id", None)
-    return {"status": "success", "data": results, "meta": {"total": total, "page": page, "page_size": page_size}}
\ No newline at end of file
+    if urgency: query["urgency"] = urgency
+    after = None
+    if cursor:
+        after = _decode_score_cursor(cursor) if text else _decode_cursor(cursor)
+    with_facets = cursor is None if facets is None else facets
+    try:
+        found, view = await upvote_counter.read(
+            crud.search_reports, text, limit + 1, query, near, after,
+            report_projection(ADMIN_LIST_FIELDS, image_size), with_facets,
+        )
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Search failed")
+    results = found["results"]
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = _encode_score_cursor(results[-1]) if text else _encode_cursor(results[-1])
+    upvote_counter.overlay(results, view)
+    meta: Dict[str, Any] = {"next_cursor": next_cursor}
+    if with_facets:
+        meta["total"] = found["total"]
+        meta["facets"] = found["facets"]
+    return RawJSONResponse({"status": "success", "data": results, "meta": meta})
+
+@router.get("/notifications")
+async def get_notifications(
+    request: Request,
+    after: Optional[str] = Query(None, description="cursor from a previous call; returns newer notifications, oldest first"),
+    limit: int = Query(50, ge=1, le=200),
+    departments: Optional[str] = Query(None, description="admins: comma-separated departments"),
+):
+    query, _ = await _notification_scope(request, departments)
+    after_oid = None
+    if after:
+        after_oid = _to_object_id(after)
+        if not after_oid:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    try:
+        docs = await crud.run_db(crud.get_notifications, query, after_oid, limit)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch notifications")
+    # the cursor is always the newest id seen, whichever order the page is in
+    newest = docs[-1 if after_oid else 0]["_id"] if docs else after_oid
+    return RawJSONResponse({
+        "status": "success",
+        "notifications": [_notification_out(d) for d in docs],
+        "meta": {"cursor": str(newest) if newest else None, "has_more": bool(after_oid) and len(docs) == limit},
+    })
+
+@router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    after: Optional[str] = Query(None, description="replay notifications after this id first (or send Last-Event-ID)"),
+    departments: Optional[str] = Query(None, description="admins: comma-separated departments"),
+):
+    """Server-Sent Events: one event per notification, named after its type, with the notification id as the event id."""
+    query, channels = await _notification_scope(request, departments)
+    after = after or request.headers.get("last-event-id")
+    after_oid = _to_object_id(after) if after else None
+    if after and not after_oid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    # subscribe before reading the backlog so nothing falls between the two
+    sub = notification_hub.subscribe(channels)
+    if sub is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many notification streams")
+
+    async def events():
+        try:
+            replayed = set()
+            if after_oid:
+                backlog = await crud.run_db(crud.get_notifications, query, after_oid, NOTIFY_CATCHUP_LIMIT + 1)
+                if len(backlog) > NOTIFY_CATCHUP_LIMIT:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                for doc in backlog:
+                    replayed.add(doc["_id"])
+                    yield _sse_event(doc)
+            while True:
+                if sub.overflowed:
+                    # fell too far behind; the client reconnects and pages from its last id
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                try:
+                    doc = await asyncio.wait_for(sub.queue.get(), NOTIFY_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if doc["_id"] not in replayed:
+                    yield _sse_event(doc)
+        finally:
+            notification_hub.unsubscribe(sub)
+
+    # the background task covers clients that disconnect before the stream starts
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(notification_hub.unsubscribe, sub),
+    )
+
+@router.get("/admin/stats")
+async def admin_report_stats(
+    request: Request,
+    group_by: str = Query("department,status", description="comma-separated: department, category, status, urgency"),
+    department: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    status_filter: Optional[str] = Query(None),
+    urgency: Optional[str] = Query(None),
+):
+    """Report counts from the materialized counters; never scans the reports collection."""
+    await _ensure_admin(request)
+    dims = tuple(d.strip() for d in group_by.split(",") if d.strip())
+    if any(d not in stats.DIMENSIONS for d in dims):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid group_by; allowed: {list(stats.DIMENSIONS)}")
+    filters = {"department": department, "category": category, "status": status_filter, "urgency": urgency}
+    filters = {d: v for d, v in filters.items() if v}
+    try:
+        data = await crud.run_db(stats.get_counts, filters, dims)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to read report stats")
+    return {"status": "success", "data": data}
+
+@router.get("/admin/stats/series")
+async def admin_report_series(
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    department: Optional[str] = Query(None),
+):
+    """Daily created / resolved counts and median time-to-resolve (UTC days)."""
+    await _ensure_admin(request)
+    try:
+        data = await crud.run_db(stats.get_series, days, department)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to read report stats")
+    return {"status": "success", "data": data}
+
+def _parse_day(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return _as_utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {name}; expected an ISO 8601 date")
+
+@router.get("/admin/reports/export")
+async def admin_export_reports(
+    request: Request,
+    format: str = Query("ndjson", description="ndjson | csv"),
+    gzip: bool = Query(False),
+    department: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    status_filter: Optional[str] = Query(None),
+    created_from: Optional[str] = Query(None, description="ISO date or timestamp, inclusive"),
+    created_to: Optional[str] = Query(None, description="ISO date or timestamp, exclusive"),
+):
+    """Streams every matching report straight from a cursor; the whole dump is never held in memory."""
+    await _ensure_admin(request)
+    if format not in transfer.FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid format; allowed: {list(transfer.FORMATS)}")
+    query: Dict[str, Any] = {}
+    if department: query["assigned_department"] = department
+    if category: query["category"] = category
+    if status_filter: query["status"] = status_filter
+    created = {k: v for k, v in (("$gte", _parse_day(created_from, "created_from")), ("$lt", _parse_day(created_to, "created_to"))) if v}
+    if created: query["created_at"] = created
+    filename = f"reports-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    # a sync iterator: Starlette pulls each chunk (and so each cursor batch) on a worker thread
+    return StreamingResponse(
+        transfer.export_chunks(query, format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/admin/reports/import")
+async def admin_import_reports(
+    request: Request,
+    file: UploadFile = File(..., description="NDJSON or CSV, optionally gzipped"),
+    format: Optional[str] = Form(None, description="ndjson | csv; taken from the file name when omitted"),
+    batch_size: int = Form(transfer.TRANSFER_BATCH_SIZE),
+    start_row: int = Form(0, description="last_row of an interrupted import, to resume after it"),
+):
+    await _ensure_admin(request)
+    fmt = format or transfer.detect_format(file.filename)
+    if fmt not in transfer.FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid format; allowed: {list(transfer.FORMATS)}")
+    if not 1 <= batch_size <= transfer.TRANSFER_MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"batch_size must be between 1 and {transfer.TRANSFER_MAX_BATCH_SIZE}")
+    try:
+        summary = await crud.run_db(transfer.import_stream, file.file, fmt, batch_size=batch_size, start_row=max(0, start_row))
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not read the upload: {e}")
+    except Exception as e:
+        # rows inserted before the failure stay; those with an id or external_id are skipped on a re-run
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Import failed: {e}")
+    return {"status": "success", "data": summary}
+
+@router.get("/admin/enrichment/stats")
+async def admin_enrichment_stats(request: Request):
+    await _ensure_admin(request)
+    pending = await crud.run_db(reports_collection.count_documents, {"enrichment_status": "pending"})
+    return {"status": "success", "data": {
+        **enrichment_queue.stats(), "mode": ENRICHMENT_MODE, "pending_in_db": pending,
+        "inference": hf_client.stats(), "cache": inference_cache.stats(),
+    }}
@@ -0,0 +1,79 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional
+from bson.objectid import ObjectId
+from fastapi.responses import Response
+
+# Report list serialization. Documents are shaped by the Mongo projection
+# (report_projection: string id, chosen image size, only the listed fields) and
+# encoded straight to bytes, so list routes skip the ReportInDB round trip and
+# FastAPI's jsonable_encoder walk. shape_report does the same for documents
+# already in memory (hot feed, change events).
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+# what feed, map and "my reports" cards render
+LIST_FIELDS = (
+    "user_id", "title", "category", "urgency", "status", "assigned_department", "original_text",
+    "location", "image_url", "upvotes", "enrichment_status", "created_at", "updated_at",
+)
+ADMIN_LIST_FIELDS = LIST_FIELDS + ("admin_notes", "progress_images", "resolved_image_url", "classified_by", "duplicate_count")
+# single-report view
+DETAIL_FIELDS = ADMIN_LIST_FIELDS + ("image_variants", "video_url", "voice_note_url")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if _ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def report_projection(fields: Iterable[str] = LIST_FIELDS, image_size: Optional[str] = None) -> Dict[str, Any]:
+    """
+    find()/$project spec returning `id` as a string instead of `_id`, and, for
+    `image_size`, that derivative as image_url with the upload in original_image_url.
+    Aggregation expressions in find() projections need MongoDB 4.4+.
+    """
+    projection: Dict[str, Any] = {"_id": 0, "id": {"$toString": "$_id"}}
+    projection.update({f: 1 for f in fields})
+    if image_size and "image_url" in projection:
+        variant = f"$image_variants.{image_size}"
+        projection["image_url"] = {"$ifNull": [variant, "$image_url"]}
+        projection["original_image_url"] = {"$cond": [{"$ifNull": [variant, False]}, "$image_url", "$$REMOVE"]}
+    return projection
+
+
+def shape_report(doc: Dict[str, Any], fields: Iterable[str] = LIST_FIELDS, image_size: Optional[str] = None) -> Dict[str, Any]:
+    """Python twin of report_projection for documents already in memory."""
+    shaped = {"id": str(doc["_id"])}
+    for f in fields:
+        if f in doc:
+            shaped[f] = doc[f]
+    variant = (doc.get("image_variants") or {}).get(image_size) if image_size else None
+    if variant and "image_url" in shaped:
+        shaped["original_image_url"] = doc.get("image_url")
+        shaped["image_url"] = variant
+    return shaped
+
+
+class RawJSONResponse(Response):
+    """JSON response that takes pre-encoded bytes as-is and encodes anything else with dumps()."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
@@ -0,0 +1,211 @@
+import statistics
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+
+# Materialized dashboard statistics. `report_stats` holds one counter per
+# department x category x status x urgency combination; `report_stats_daily`
+# holds, per UTC day and department, the reports created and resolved that day
+# and the resolve times (seconds) of the latter, keyed by report id so a report
+# that is reopened or resolved again moves its entry instead of adding one.
+# Both are kept current by
+# crud's report-change hook with one upserting $inc bulk_write per write, so
+# the dashboard reads a few hundred small documents instead of counting
+# reports. rebuild() (python rebuild_stats.py) recomputes both from the
+# reports collection; increments made while it runs can be lost, so run it
+# when the admins are not triaging.
+
+DIMENSIONS = ("department", "category", "status", "urgency")
+_REPORT_FIELDS = {"department": "assigned_department", "category": "category", "status": "status", "urgency": "urgency"}
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # pymongo hands back naive UTC datetimes; writers use both kinds
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def _key(doc: Optional[Dict[str, Any]]) -> Optional[Tuple[Any, ...]]:
+    return tuple(doc.get(_REPORT_FIELDS[d]) for d in DIMENSIONS) if doc else None
+
+
+def _resolution(doc: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Any, str, Optional[float]]]:
+    """(day, department, report id, seconds to resolve) of a resolved report, as rebuild() counts it."""
+    if not doc or doc.get("status") != "Resolved":
+        return None
+    # reports resolved before resolved_at was recorded fall back to their last update
+    resolved_at = _utc(doc.get("resolved_at") or doc.get("updated_at"))
+    if resolved_at is None:
+        return None
+    created_at = _utc(doc.get("created_at"))
+    seconds = max(0.0, (resolved_at - created_at).total_seconds()) if created_at else None
+    return _day(resolved_at), doc.get("assigned_department"), str(doc["_id"]), seconds
+
+
+def report_changed(changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+    """crud.on_report_change listener: turns a batch of (before, after) pairs into counter increments."""
+    counters: Dict[Tuple[Any, ...], int] = {}
+    daily: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+
+    def day_entry(day: str, department: Any) -> Dict[str, Any]:
+        # seconds: report id -> resolve time, or None to drop the entry
+        return daily.setdefault((day, department), {"created": 0, "resolved": 0, "seconds": {}})
+
+    for before, after in changes:
+        old, new = _key(before), _key(after)
+        if old != new:
+            if old:
+                counters[old] = counters.get(old, 0) - 1
+            if new:
+                counters[new] = counters.get(new, 0) + 1
+        created_at = _utc((after or before or {}).get("created_at"))
+        old_department = (before or {}).get("assigned_department")
+        new_department = (after or {}).get("assigned_department")
+        if created_at and (before is None or old_department != new_department):
+            # a create, or enrichment moving the report to its real department
+            if before is not None:
+                day_entry(_day(created_at), old_department)["created"] -= 1
+            if after is not None:
+                day_entry(_day(created_at), new_department)["created"] += 1
+        # resolved, reopened, resolved again, or moved to another department while resolved
+        old_resolution, new_resolution = _resolution(before), _resolution(after)
+        if old_resolution != new_resolution:
+            if old_resolution:
+                day, department, report_id, _ = old_resolution
+                entry = day_entry(day, department)
+                entry["resolved"] -= 1
+                entry["seconds"][report_id] = None
+            if new_resolution:
+                day, department, report_id, seconds = new_resolution
+                entry = day_entry(day, department)
+                entry["resolved"] += 1
+                if seconds is not None:
+                    entry["seconds"][report_id] = seconds
+
+    requests = [
+        UpdateOne({"_id": dict(zip(DIMENSIONS, key))}, {"$inc": {"count": delta}}, upsert=True)
+        for key, delta in counters.items() if delta
+    ]
+    if requests:
+        crud.report_stats_collection.bulk_write(requests, ordered=False)
+    requests = []
+    for (day, department), entry in daily.items():
+        update: Dict[str, Any] = {"$inc": {"created": entry["created"], "resolved": entry["resolved"]}}
+        kept = {f"resolve_seconds.{rid}": v for rid, v in entry["seconds"].items() if v is not None}
+        dropped = {f"resolve_seconds.{rid}": "" for rid, v in entry["seconds"].items() if v is None}
+        if kept:
+            update["$set"] = kept
+        if dropped:
+            update["$unset"] = dropped
+        requests.append(UpdateOne({"_id": {"day": day, "department": department}}, update, upsert=True))
+    if requests:
+        crud.report_stats_daily_collection.bulk_write(requests, ordered=False)
+
+
+def get_counts(filters: Dict[str, str], group_by: Sequence[str]) -> Dict[str, Any]:
+    """Report counts matching `filters` (dimension -> value), summed per `group_by` combination."""
+    query = {f"_id.{d}": v for d, v in filters.items()}
+    groups: Dict[Tuple[Any, ...], int] = {}
+    total = 0
+    for row in crud.report_stats_collection.find(query):
+        if row.get("count", 0) <= 0:
+            continue
+        key = tuple(row["_id"].get(d) for d in group_by)
+        groups[key] = groups.get(key, 0) + row["count"]
+        total += row["count"]
+    rows = [{**dict(zip(group_by, key)), "count": n} for key, n in groups.items()]
+    rows.sort(key=lambda r: -r["count"])
+    return {"total": total, "groups": rows}
+
+
+def _resolve_seconds(row: Dict[str, Any]) -> List[float]:
+    seconds = row.get("resolve_seconds") or {}
+    # rows written before the times were keyed by report id hold a plain list
+    return list(seconds.values()) if isinstance(seconds, dict) else list(seconds)
+
+
+def _median_hours(seconds: List[float]) -> Optional[float]:
+    return round(statistics.median(seconds) / 3600, 2) if seconds else None
+
+
+def get_series(days: int, department: Optional[str] = None) -> Dict[str, Any]:
+    """Daily created / resolved counts and median time-to-resolve for the last `days` UTC days."""
+    today = datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    query: Dict[str, Any] = {"_id.day": {"$gte": first.isoformat()}}
+    if department:
+        query["_id.department"] = department
+    by_day: Dict[str, Dict[str, Any]] = {}
+    for row in crud.report_stats_daily_collection.find(query):
+        entry = by_day.setdefault(row["_id"]["day"], {"created": 0, "resolved": 0, "seconds": []})
+        entry["created"] += row.get("created", 0)
+        entry["resolved"] += row.get("resolved", 0)
+        entry["seconds"].extend(_resolve_seconds(row))
+    series, everything = [], []
+    for n in range(days):
+        day = (first + timedelta(days=n)).isoformat()
+        entry = by_day.get(day, {"created": 0, "resolved": 0, "seconds": []})
+        everything.extend(entry["seconds"])
+        series.append({
+            "day": day,
+            "created": entry["created"],
+            "resolved": entry["resolved"],
+            "median_resolve_hours": _median_hours(entry["seconds"]),
+        })
+    return {"days": series, "median_resolve_hours": _median_hours(everything)}
+
+
+def _as_day(field: str) -> Dict[str, Any]:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": field}}
+
+
+def rebuild() -> Dict[str, int]:
+    """Recomputes both collections from `reports` with aggregation pipelines ($out swaps them in atomically)."""
+    crud.reports_collection.aggregate([
+        {"$group": {
+            "_id": {d: f"${_REPORT_FIELDS[d]}" for d in DIMENSIONS},
+            "count": {"$sum": 1},
+        }},
+        {"$out": crud.report_stats_collection.name},
+    ], allowDiskUse=True)
+    crud.reports_collection.aggregate([
+        {"$project": {"_id": 0, "day": _as_day("$created_at"), "department": "$assigned_department", "created": {"$literal": 1}, "resolved": {"$literal": 0}}},
+        {"$unionWith": {"coll": crud.reports_collection.name, "pipeline": [
+            {"$match": {"status": "Resolved"}},
+            # reports resolved before resolved_at was recorded fall back to their last update
+            {"$set": {"resolved_at": {"$ifNull": ["$resolved_at", "$updated_at"]}}},
+            {"$project": {
+                "_id": 0, "day": _as_day("$resolved_at"), "department": "$assigned_department",
+                "created": {"$literal": 0}, "resolved": {"$literal": 1},
+                "report_id": {"$toString": "$_id"},
+                "seconds": {"$max": [0, {"$divide": [{"$subtract": ["$resolved_at", "$created_at"]}, 1000]}]},
+            }},
+        ]}},
+        {"$group": {
+            "_id": {"day": "$day", "department": "$department"},
+            "created": {"$sum": "$created"},
+            "resolved": {"$sum": "$resolved"},
+            "resolve_seconds": {"$push": {"k": "$report_id", "v": "$seconds"}},
+        }},
+        # creation rows carry no report_id; reports without created_at have no resolve time
+        {"$set": {"resolve_seconds": {"$arrayToObject": {"$filter": {
+            "input": "$resolve_seconds",
+            "cond": {"$and": [{"$eq": [{"$type": "$$this.k"}, "string"]}, {"$ne": [{"$type": "$$this.v"}, "null"]}]},
+        }}}}},
+        {"$out": crud.report_stats_daily_collection.name},
+    ], allowDiskUse=True)
+    return {
+        "counters": crud.report_stats_collection.estimated_document_count(),
+        "days": crud.report_stats_daily_collection.estimated_document_count(),
+    }
+
+
+crud.on_report_change(report_changed)
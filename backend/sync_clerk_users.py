@@ -0,0 +1,71 @@
+"""
+Syncs a full Clerk user export into the users collection in bulk, e.g. when
+onboarding a city whose residents already have Clerk accounts.
+
+Accepts the dashboard's CSV export (id, primary_email_address and, if present,
+public_metadata columns) or NDJSON / a JSON array of Backend API user objects,
+optionally gzipped. Users are upserted with the same version-guarded operation
+the webhook uses, so users the webhook has already synced are left alone, and
+the command can be re-run safely.
+
+    python sync_clerk_users.py users.csv
+    python sync_clerk_users.py users.ndjson.gz --batch-size 5000
+"""
+import argparse
+import json
+import time
+import crud
+import transfer
+from clerk_sync import user_operation
+
+
+def _rows(path: str, fmt: str):
+    with open(path, "rb") as f:
+        if fmt == "ndjson" and f.read(1) == b"[":
+            f.seek(0)
+            yield from enumerate(json.load(f), 1)
+            return
+        yield from transfer.read_rows(f, fmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=transfer.FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    crud.ensure_indexes()
+    started = time.perf_counter()
+    totals = {"upserted": 0, "modified": 0, "stale": 0, "rejected": 0}
+    batch = []
+
+    def flush():
+        result = crud.bulk_write_users([operation for _, operation in batch])
+        for key in ("upserted", "modified", "stale"):
+            totals[key] += result[key]
+        for err in result["errors"]:
+            totals["rejected"] += 1
+            print(f"row {batch[err['index']][0]}: {err['errmsg']}")
+        batch.clear()
+        print(f"{sum(totals.values())} users: {totals['upserted']} new, {totals['modified']} updated, {totals['stale']} already up to date", end="\r", flush=True)
+
+    for n, row in _rows(args.file, args.format or transfer.detect_format(args.file)):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            # the export has no per-user update time; version 0 never overrides webhook data
+            batch.append((n, user_operation("user.updated", row, int(row.get("updated_at") or 0))))
+        except (ValueError, AttributeError) as e:
+            totals["rejected"] += 1
+            print(f"row {n}: {e}")
+        if len(batch) >= args.batch_size:
+            flush()
+    if batch:
+        flush()
+    print()
+    print(f"Done in {time.perf_counter() - started:.1f}s: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared test setup. The app runs against mongomock with session tokens signed
+by a throwaway key (benchmarks/local_jwks.py), so requests go through the real
+auth dependency. Backend modules read their settings at import time, so the
+environment is fixed here before any of them is imported.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from local_jwks import load_signer, sign_token, write_files  # noqa: E402
+
+_WORKDIR = tempfile.mkdtemp(prefix="civic-connect-tests-")
+JWKS_PATH, _ = write_files(os.path.join(_WORKDIR, "keys"))
+# a fixed Svix-format secret, so tests can sign webhook deliveries
+WEBHOOK_SECRET = "whsec_MfKQ9r8GKYqrTwjUPD8ILPZIo2LaLaSw"
+
+os.environ.pop("CLERK_JWKS_URL", None)
+os.environ.update({
+    "CLERK_JWKS_FILE": JWKS_PATH,
+    "CLERK_WEBHOOK_SECRET": WEBHOOK_SECRET,
+    "MONGO_DB_NAME": "civic_connect_test",
+    "STATIC_UPLOAD_DIR": os.path.join(_WORKDIR, "uploads"),
+    # mongomock has no change streams
+    "FEED_CHANGE_STREAM": "false",
+    "ROLE_CHANGE_STREAM": "false",
+    "NOTIFY_CHANGE_STREAM": "false",
+})
+
+import mongomock  # noqa: E402
+import mongomock.collection  # noqa: E402
+import pymongo  # noqa: E402
+
+pymongo.MongoClient = mongomock.MongoClient
+
+
+def _drop_sort(method):
+    # pymongo 4.x passes UpdateOne/ReplaceOne's `sort` to the bulk builder; mongomock predates it
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _drop_sort(mongomock.collection.BulkOperationBuilder.add_update)
+mongomock.collection.BulkOperationBuilder.add_replace = _drop_sort(mongomock.collection.BulkOperationBuilder.add_replace)
+
+# main mounts ./static
+os.chdir(BACKEND_DIR)
+
+import crud  # noqa: E402
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+_SIGNING_KEY, _KID = load_signer(os.path.join(_WORKDIR, "keys"))
+
+
+def auth_headers(user_id: str, **claims) -> dict:
+    return {"Authorization": f"Bearer {sign_token(_SIGNING_KEY, _KID, user_id, **claims)}"}
+
+
+def _reset_state() -> None:
+    import identity
+    import reports
+    from clerk_sync import clerk_events
+    from feed import hot_feed
+    from notifications import notification_hub
+    from tiles import tile_cache
+    from upvotes import upvote_counter
+
+    for name in crud.db.list_collection_names():
+        crud.db.drop_collection(name)
+    crud.ensure_indexes()
+    identity.role_cache.invalidate()
+    reports._report_cache.clear()
+    reports._admin_count_cache.clear()
+    hot_feed.__init__(hot_feed.size, hot_feed.reload_seconds)
+    upvote_counter.__init__(upvote_counter.flush_interval, upvote_counter.max_keys)
+    tile_cache.__init__(tile_cache.maxsize, tile_cache.ttl)
+    notification_hub.__init__(notification_hub.queue_size, notification_hub.max_connections)
+    clerk_events.__init__(clerk_events.flush_interval, clerk_events.batch_size, clerk_events.max_pending)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    _reset_state()
+    yield
+
+
+@pytest.fixture
+def client():
+    # no lifespan: background loops stay off and tests flush queues themselves
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def admin_headers():
+    crud.users_collection.insert_one({"clerk_user_id": "admin-1", "email": "admin@example.com", "role": "admin"})
+    return auth_headers("admin-1")
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+
+import crud
+import stats
+
+
+def _reports(n: int, **fields) -> list:
+    docs = [{
+        "user_id": f"citizen-{i}", "title": f"Report {i}", "category": "Pothole", "urgency": "Low",
+        "status": "Submitted", "assigned_department": "Public Works", "upvotes": 0, "admin_notes": [],
+        "location": {"type": "Point", "coordinates": [78.48, 17.38]}, "created_at": datetime(2026, 10, 1),
+        **fields,
+    } for i in range(n)]
+    crud.insert_reports(docs)
+    return [doc["_id"] for doc in docs]
+
+
+def _status(status: str, note: str = None):
+    return crud.status_fields(status), {"admin_notes": {"note": note}} if note else None
+
+
+def _by_status() -> dict:
+    return {g["status"]: g["count"] for g in stats.get_counts({}, ("status",))["groups"]}
+
+
+def _stored_status(oid) -> str:
+    return crud.reports_collection.find_one({"_id": oid})["status"]
+
+
+def test_repeated_and_missing_ids():
+    a, b = _reports(2)
+    missing = ObjectId()
+    results = crud.bulk_update_reports([
+        (a, *_status("In Progress", "on it")), (missing, *_status("Resolved")),
+        (b, *_status("Resolved")), (a, *_status("Resolved", "done")),
+    ])
+    assert [r["error"] for r in results] == [None, "Report not found", None, None]
+    # the second update of `a` replays from the first one's result
+    assert results[3]["before"]["status"] == "In Progress"
+    assert [n["note"] for n in results[3]["after"]["admin_notes"]] == ["on it", "done"]
+    assert _stored_status(a) == _stored_status(b) == "Resolved"
+    assert len(crud.reports_collection.find_one({"_id": a})["admin_notes"]) == 2
+    assert _by_status() == {"Resolved": 2}
+    assert crud.notifications_collection.count_documents({}) == 3
+
+
+def test_failure_stops_the_rest_of_the_batch(monkeypatch):
+    a, b, c = _reports(3)
+    bulk_write = crud.reports_collection.bulk_write
+
+    def fails_second(requests, **kwargs):
+        # what an ordered bulk_write does when its second update is rejected
+        bulk_write(requests[:1], **kwargs)
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "rejected"}], "nMatched": 1})
+
+    monkeypatch.setattr(crud.reports_collection, "bulk_write", fails_second)
+    results = crud.bulk_update_reports([
+        (a, *_status("Resolved")), (b, *_status("Resolved", "note")), (c, *_status("Resolved")),
+    ])
+    assert results[0]["error"] is None
+    assert results[1] == {"before": None, "after": None, "error": "rejected"}
+    assert results[2]["error"] == "Not applied: an earlier update failed"
+    assert [_stored_status(oid) for oid in (a, b, c)] == ["Resolved", "Submitted", "Submitted"]
+    assert _by_status() == {"Resolved": 1, "Submitted": 2}
+
+
+def test_write_between_read_and_bulk_write_is_a_conflict(monkeypatch):
+    a, b, c = _reports(3)
+    bulk_write = crud.reports_collection.bulk_write
+
+    def racing_bulk_write(requests, **kwargs):
+        crud.update_report(a, crud.status_fields("In Progress"))
+        crud.reports_collection.delete_one({"_id": b})
+        return bulk_write(requests, **kwargs)
+
+    monkeypatch.setattr(crud.reports_collection, "bulk_write", racing_bulk_write)
+    results = crud.bulk_update_reports([
+        (a, *_status("Resolved")), (a, *_status("Rejected")), (b, *_status("Resolved")), (c, *_status("Resolved")),
+    ])
+    assert [r["error"] for r in results] == [
+        "Report changed during the update; retry", "Report changed during the update; retry", "Report not found", None,
+    ]
+    assert _stored_status(a) == "In Progress"
+    # b's row stays counted: the test deletes it behind the change hook's back
+    assert _by_status() == {"In Progress": 1, "Resolved": 1, "Submitted": 1}
+
+
+def test_bulk_endpoint_reports_each_outcome(client, admin_headers):
+    a, = _reports(1)
+    r = client.post("/api/admin/reports/status", headers=admin_headers, json={"operations": [
+        {"id": str(a), "status": "Resolved"}, {"id": "nope", "status": "Resolved"}, {"id": str(ObjectId()), "status": "Resolved"},
+    ]})
+    assert r.status_code == 200
+    assert [row["ok"] for row in r.json()["data"]] == [True, False, False]
+    assert r.json()["meta"] == {"applied": 1, "failed": 2}
+
+
+def test_status_endpoint(client, admin_headers):
+    a, = _reports(1)
+    r = client.put(f"/api/admin/report/{a}/status", headers=admin_headers, json={"status": "Resolved", "notes": "fixed"})
+    assert r.status_code == 200
+    assert _stored_status(a) == "Resolved"
+    assert client.put(f"/api/admin/report/{ObjectId()}/status", headers=admin_headers, json={"status": "Resolved"}).status_code == 404
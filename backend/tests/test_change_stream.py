@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+from pymongo.errors import ConnectionFailure, OperationFailure
+
+import crud
+from change_stream import ChangeStreamWatcher
+from feed import HotFeed
+
+
+class FakeStream:
+    """Plays back changes and errors; each change carries its own resume token."""
+
+    def __init__(self, script, on_end):
+        self.script = list(script)
+        self.on_end = on_end
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        if not self.script:
+            self.on_end()
+            return None
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        self.resume_token = {"_data": item["n"]}
+        return item
+
+
+def _run(*scripts):
+    opened, handled, gaps = [], [], []
+    scripts = list(scripts)
+
+    def open_stream(resume_after):
+        opened.append(resume_after)
+        script = scripts.pop(0)
+        if isinstance(script, Exception):
+            raise script
+        return FakeStream(script, watcher.stop if not scripts else lambda: None)
+
+    watcher = ChangeStreamWatcher("Test", open_stream, handled.append, lambda: gaps.append(True), retry_seconds=0)
+    watcher.run()
+    return opened, [c["n"] for c in handled], len(gaps)
+
+
+def test_reopens_after_an_error_and_resumes():
+    opened, handled, gaps = _run([{"n": 1}, ConnectionFailure("primary stepped down")], [{"n": 2}])
+    assert opened == [None, {"_data": 1}]
+    assert handled == [1, 2]
+    assert gaps == 0
+
+
+def test_lost_history_reopens_fresh_and_reports_a_gap():
+    opened, handled, gaps = _run([{"n": 1}, OperationFailure("history lost", code=286)], [{"n": 2}])
+    assert opened == [None, None]
+    assert handled == [1, 2]
+    assert gaps == 1
+
+
+def test_failure_before_any_event_reports_a_gap():
+    opened, handled, gaps = _run(ConnectionFailure("no primary"), [{"n": 1}])
+    assert opened == [None, None]
+    assert (handled, gaps) == ([1], 1)
+
+
+def test_standalone_server_stops_the_watcher():
+    opened, handled, gaps = _run(OperationFailure("only supported on replica sets", code=40573), [{"n": 1}])
+    assert (opened, handled, gaps) == ([None], [], 0)
+
+
+def test_feed_reloads_after_a_gap_and_periodically():
+    feed = HotFeed(10, reload_seconds=3600)
+    asyncio.run(feed.ensure_loaded())
+    # written by another worker while the stream was down
+    doc = {"title": "Elsewhere", "created_at": datetime.utcnow(), "upvotes": 0}
+    crud.reports_collection.insert_one(doc)
+    asyncio.run(feed.ensure_loaded())
+    assert not feed.holds(doc["_id"])
+    feed.invalidate()
+    asyncio.run(feed.ensure_loaded())
+    assert feed.holds(doc["_id"])
+
+    feed.reload_seconds = 0
+    other = {"title": "Also elsewhere", "created_at": datetime.utcnow(), "upvotes": 0}
+    crud.reports_collection.insert_one(other)
+    asyncio.run(feed.ensure_loaded())
+    assert feed.holds(other["_id"])
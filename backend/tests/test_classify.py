@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import crud
+import reports
+
+TEXT = "Garbage has been piling up behind the vegetable market for a week"
+
+
+def test_unparsed_reply_is_not_cached(monkeypatch):
+    replies = ["Sorry, I cannot help with that.", json.dumps({
+        "title": "Garbage pile", "category": "Sanitation", "urgency": "Medium", "assigned_department": "Sanitation",
+    })]
+    calls = []
+
+    async def hf_text(model, prompt, max_tokens=512):
+        calls.append(prompt)
+        return replies[len(calls) - 1]
+
+    monkeypatch.setattr(reports, "_hf_text", hf_text)
+    monkeypatch.setattr(reports.local_classifier, "predict", lambda text: None)
+
+    first = asyncio.run(reports._classify(TEXT, None))
+    assert (first["category"], first["assigned_department"]) == ("Other", "General")
+    assert crud.inference_cache_collection.count_documents({"kind": "classification"}) == 0
+
+    # the next submission of the same text asks again, and that answer is kept
+    second = asyncio.run(reports._classify(TEXT, None))
+    assert second["category"] == "Sanitation"
+    assert asyncio.run(reports._classify(TEXT, None)) == second
+    assert len(calls) == 2
+    assert crud.inference_cache_collection.count_documents({"kind": "classification"}) == 1
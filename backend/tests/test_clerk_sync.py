@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from svix.webhooks import Webhook
+
+import crud
+from clerk_sync import clerk_events
+from conftest import WEBHOOK_SECRET
+
+_signer = Webhook(WEBHOOK_SECRET)
+
+
+def _event(event_type: str, version: int, email: str = "ada@example.com", user_id: str = "user_1", **data) -> dict:
+    user = {"id": user_id, "updated_at": version, "created_at": 1759300000000, **data}
+    if event_type != "user.deleted":
+        user.update(email_addresses=[{"id": "e1", "email_address": email}], primary_email_address_id="e1")
+    return {"type": event_type, "data": user}
+
+
+def _deliver(client, message_id: str, event: dict, signature: str = None):
+    body = json.dumps(event)
+    timestamp = datetime.now(timezone.utc)
+    headers = {
+        "svix-id": message_id,
+        "svix-timestamp": str(int(timestamp.timestamp())),
+        "svix-signature": signature or _signer.sign(message_id, timestamp, body),
+    }
+    return client.post("/webhooks/clerk", content=body, headers=headers)
+
+
+def _flush() -> int:
+    return asyncio.run(clerk_events.flush())
+
+
+def _user(user_id: str = "user_1") -> dict:
+    return crud.users_collection.find_one({"clerk_user_id": user_id})
+
+
+def test_bad_signature_is_rejected(client):
+    r = _deliver(client, "msg_1", _event("user.created", 1), signature="v1,bm90IGEgc2lnbmF0dXJl")
+    assert r.status_code == 400
+    assert clerk_events.stats()["received"] == 0
+
+
+def test_signed_event_creates_user(client):
+    assert _deliver(client, "msg_1", _event("user.created", 1)).status_code == 200
+    assert _user() is None
+    assert _flush() == 1
+    user = _user()
+    assert (user["email"], user["role"], user["clerk_updated_at"]) == ("ada@example.com", "citizen", 1)
+
+
+def test_redelivery_is_skipped(client):
+    event = _event("user.created", 1)
+    _deliver(client, "msg_1", event)
+    _deliver(client, "msg_1", event)
+    _flush()
+    assert clerk_events.stats()["duplicates"] == 1
+
+    # a fresh process only knows the id from webhook_events
+    clerk_events.__init__(clerk_events.flush_interval, clerk_events.batch_size, clerk_events.max_pending)
+    crud.users_collection.update_one({"clerk_user_id": "user_1"}, {"$set": {"email": "edited@example.com"}})
+    _deliver(client, "msg_1", event)
+    _flush()
+    assert clerk_events.stats()["duplicates"] == 1
+    assert _user()["email"] == "edited@example.com"
+
+
+def test_newest_event_wins_in_any_order(client):
+    _deliver(client, "msg_2", _event("user.updated", 2, email="new@example.com"))
+    _deliver(client, "msg_1", _event("user.created", 1, email="old@example.com"))
+    _flush()
+    assert _user()["email"] == "new@example.com"
+
+    # the older one arriving in a later batch is stale
+    _deliver(client, "msg_0", _event("user.updated", 1, email="older@example.com"))
+    _flush()
+    assert _user()["email"] == "new@example.com"
+    assert clerk_events.stats()["stale"] == 1
+
+
+def test_metadata_role_is_synced_and_db_admin_kept(client):
+    crud.users_collection.insert_one({"clerk_user_id": "user_1", "email": "ada@example.com", "role": "admin"})
+    _deliver(client, "msg_1", _event("user.updated", 1, email="ada@example.org"))
+    _flush()
+    assert _user()["role"] == "admin"
+
+    _deliver(client, "msg_2", _event("user.updated", 2, public_metadata={"role": "citizen"}))
+    _flush()
+    assert _user()["role"] == "citizen"
+
+
+def test_deleted_user_stays_deleted(client):
+    _deliver(client, "msg_1", _event("user.created", 1))
+    _deliver(client, "msg_2", _event("user.deleted", 3))
+    _flush()
+    _deliver(client, "msg_3", _event("user.updated", 2, email="late@example.com"))
+    _flush()
+    user = _user()
+    assert user["deleted_at"] is not None
+    assert "email" not in user and "role" not in user
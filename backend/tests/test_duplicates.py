@@ -0,0 +1,95 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+import duplicates
+
+TEXT = "Large pothole on Main Street near the bus stop damaging cars"
+# 5 bits from TEXT: close enough within a category, not without one
+REWORDED = "Large pothole on Main Street near the bus stop damaging vehicles"
+HERE = (78.4800, 17.3800)
+
+
+def _meters(a, b) -> float:
+    lon1, lat1, lon2, lat2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6378100 * math.asin(math.sqrt(h))
+
+
+@pytest.fixture(autouse=True)
+def nearby(monkeypatch):
+    # mongomock has no $geoNear: the same query and projection, filtered and ordered by distance in Python
+    def nearby_by_distance(longitude, latitude, max_distance_meters, limit, query=None, projection=None, **kwargs):
+        docs = []
+        for doc in crud.reports_collection.find(query or {}):
+            distance = _meters((longitude, latitude), doc["location"]["coordinates"])
+            if distance <= max_distance_meters:
+                docs.append(({k: doc[k] for k in projection if k in doc}, distance))
+        docs.sort(key=lambda pair: pair[1])
+        return [{**doc, "distance_meters": distance} for doc, distance in docs[:limit]]
+
+    monkeypatch.setattr(crud, "get_reports_nearby_by_distance", nearby_by_distance)
+
+
+def _report(text: str = TEXT, at=HERE, **fields) -> dict:
+    doc = {
+        "user_id": "citizen-1", "title": text, "category": "Pothole", "status": "Submitted",
+        "location": {"type": "Point", "coordinates": list(at)},
+        "fingerprint": duplicates.fingerprint(text, None), "created_at": datetime.utcnow(),
+    }
+    doc.update(fields)
+    crud.reports_collection.insert_one(doc)
+    return doc
+
+
+def _find(text: str = TEXT, category="Pothole", at=HERE, user_id="citizen-2", image_url=None):
+    return duplicates.find_duplicate(*at, category, duplicates.fingerprint(text, None), image_url, user_id)
+
+
+def test_short_texts_have_no_fingerprint():
+    assert duplicates.fingerprint("pothole here", None) == {}
+    assert duplicates.hamming(0, -1) == 64
+
+
+def test_nearby_reworded_report_matches():
+    original = _report()
+    assert _find(REWORDED)["_id"] == original["_id"]
+    assert _find("Streetlight broken outside the library for a week") is None
+
+
+def test_distance_category_and_status_limit_candidates():
+    _report(at=(78.4810, 17.3800))  # about 100 m east
+    _report(category="Garbage")
+    _report(status="Resolved")
+    _report(created_at=datetime.utcnow() - timedelta(days=duplicates.DUPLICATE_WINDOW_DAYS + 1))
+    assert _find() is None
+
+
+def test_closest_match_wins():
+    _report(at=(78.4803, 17.3800))
+    closest = _report(at=(78.4801, 17.3800))
+    assert _find()["_id"] == closest["_id"]
+
+
+def test_pending_enrichment_is_a_candidate_in_any_category():
+    pending = _report(category="Other", enrichment_status="pending")
+    assert _find()["_id"] == pending["_id"]
+
+
+def test_unknown_category_needs_a_near_identical_fingerprint():
+    original = _report(category="Garbage")
+    assert _find(REWORDED, category=None) is None
+    assert _find(TEXT, category=None)["_id"] == original["_id"]
+
+
+def test_same_photo_matches_without_text():
+    original = _report(image_url="/static/uploads/abc.jpg")
+    assert _find("pothole here", image_url="/static/uploads/abc.jpg")["_id"] == original["_id"]
+
+
+def test_own_reports_are_not_candidates():
+    _report()
+    assert _find(user_id="citizen-1") is None
+    assert _find(user_id="citizen-2") is not None
@@ -0,0 +1,41 @@
+import asyncio
+
+import crud
+import identity
+from conftest import auth_headers
+
+STATS = "/api/admin/stats"
+
+
+def test_token_role_is_ignored_by_default(client):
+    assert client.get(STATS, headers=auth_headers("user-1", metadata={"role": "admin"})).status_code == 403
+
+
+def test_database_admin_is_cached_until_invalidated(client, admin_headers):
+    assert client.get(STATS, headers=admin_headers).status_code == 200
+    crud.users_collection.update_one({"clerk_user_id": "admin-1"}, {"$set": {"role": "citizen"}})
+    assert client.get(STATS, headers=admin_headers).status_code == 200
+
+    identity.role_cache.invalidate("admin-1")
+    assert client.get(STATS, headers=admin_headers).status_code == 403
+
+
+def test_configured_claim_is_trusted(client, monkeypatch):
+    monkeypatch.setattr(identity, "JWT_ROLE_CLAIM", "metadata.role")
+    assert client.get(STATS, headers=auth_headers("user-1", metadata={"role": "admin"})).status_code == 200
+    assert client.get(STATS, headers=auth_headers("user-1", metadata={"role": "citizen"})).status_code == 403
+
+
+def test_invalidation_during_a_lookup_is_not_undone(monkeypatch, admin_headers):
+    get_user_role = crud.get_user_role
+
+    def demoted_while_reading(clerk_user_id):
+        role = get_user_role(clerk_user_id)
+        crud.users_collection.update_one({"clerk_user_id": clerk_user_id}, {"$set": {"role": "citizen"}})
+        identity.role_cache.invalidate(clerk_user_id)
+        return role
+
+    monkeypatch.setattr(crud, "get_user_role", demoted_while_reading)
+    assert asyncio.run(identity.role_cache.get_role("admin-1")) == "admin"
+    monkeypatch.setattr(crud, "get_user_role", get_user_role)
+    assert asyncio.run(identity.role_cache.get_role("admin-1")) == "citizen"
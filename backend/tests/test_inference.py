@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+import pytest
+
+from inference import CircuitOpenError, InferenceClient
+
+
+def _client(*responses) -> InferenceClient:
+    replies = list(responses)
+
+    def handler(request):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return httpx.Response(reply, request=request)
+
+    client = InferenceClient("https://hf.test/models", "token", breaker_failures=2, breaker_reset_seconds=60)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def _post(client: InferenceClient):
+    return asyncio.run(client.post("model", json={}))
+
+
+def test_rejected_requests_do_not_open_the_breaker():
+    client = _client(400, 413, 401, 200)
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            _post(client)
+    assert _post(client).status_code == 200
+    assert client.stats()["models"]["model"] == {"breaker": "closed", "rejected": 3, "ok": 1}
+
+
+@pytest.mark.parametrize("failure", [503, 429, httpx.ConnectError("refused"), httpx.ReadTimeout("slow")])
+def test_upstream_failures_open_the_breaker(failure):
+    client = _client(failure, failure)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPError):
+            _post(client)
+    with pytest.raises(CircuitOpenError):
+        _post(client)
+    assert client.breaker("model").state == "open"
+
+
+def test_client_error_between_failures_resets_the_count():
+    client = _client(503, 400, 503)
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            _post(client)
+    assert client.breaker("model").state == "closed"
@@ -0,0 +1,17 @@
+import main
+
+
+def test_metrics_are_off_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_ENABLED", True)
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_need_the_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_ENABLED", True)
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    r = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert r.status_code == 200
+    assert "upvote_pending_reports" in r.text
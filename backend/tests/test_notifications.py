@@ -0,0 +1,130 @@
+import asyncio
+
+from bson.objectid import ObjectId
+from starlette.requests import Request
+
+import crud
+import reports
+from notifications import ALL_DEPARTMENTS, NotificationHub, notification_hub
+
+REPORT = {"_id": ObjectId(), "user_id": "citizen-1", "assigned_department": "Water", "title": "Leaking main"}
+
+
+def _doc(**fields) -> dict:
+    return {"_id": ObjectId(), "user_id": "citizen-1", "department": "Water", "type": "status_changed", **fields}
+
+
+def _notify(status: str) -> dict:
+    return crud.create_notification(REPORT, "status_changed", {"status": status})
+
+
+def test_hub_fans_out_by_channel_once_per_notification():
+    hub = NotificationHub(queue_size=10)
+    owner, department, everything, stranger = (
+        hub.subscribe({"user:citizen-1"}), hub.subscribe({"dept:Water"}),
+        hub.subscribe({ALL_DEPARTMENTS}), hub.subscribe({"user:citizen-2"}),
+    )
+    doc = _doc()
+    hub.publish(doc)
+    # the same notification again, e.g. from the change stream
+    hub.publish(doc)
+    assert [sub.queue.qsize() for sub in (owner, department, everything, stranger)] == [1, 1, 1, 0]
+    assert hub.stats()["delivered"] == 3
+
+
+def test_full_queue_marks_the_connection_for_resync():
+    hub = NotificationHub(queue_size=2)
+    sub = hub.subscribe({"user:citizen-1"})
+    for _ in range(4):
+        hub.publish(_doc())
+    assert sub.overflowed
+    assert hub.stats()["overflows"] == 1
+
+
+def test_connection_limit_and_unsubscribe():
+    hub = NotificationHub(max_connections=1)
+    sub = hub.subscribe({"user:citizen-1"})
+    assert hub.subscribe({"user:citizen-2"}) is None
+    hub.unsubscribe(sub)
+    hub.unsubscribe(sub)
+    assert hub.stats()["connections"] == 0 and hub.stats()["channels"] == 0
+
+
+async def _open(last_event_id: str = None):
+    headers = [(b"last-event-id", last_event_id.encode())] if last_event_id else []
+    request = Request({"type": "http", "method": "GET", "path": "/api/notifications/stream", "headers": headers, "query_string": b""})
+    request.state.user_id = "citizen-1"
+    response = await reports.stream_notifications(request, after=None, departments=None)
+    return response.body_iterator
+
+
+async def _read_until_idle(events) -> list:
+    # stops at the first keepalive (nothing left to send) or at the end of the stream
+    seen = []
+    async for chunk in events:
+        if chunk.startswith(": keepalive"):
+            break
+        seen.append(chunk)
+        if chunk.startswith("event: resync"):
+            break
+    return seen
+
+
+def _ids(chunks) -> list:
+    return [chunk.split("\n")[0][len("id: "):] for chunk in chunks if chunk.startswith("id: ")]
+
+
+def test_stream_replays_from_last_event_id_without_duplicates(monkeypatch):
+    monkeypatch.setattr(reports, "NOTIFY_HEARTBEAT_SECONDS", 0.05)
+    first, second = _notify("Submitted"), _notify("In Progress")
+    get_notifications = crud.get_notifications
+    live = []
+
+    def backlog_with_live_traffic(query, after, limit):
+        # one lands before the backlog read (so it is sent both ways), one after
+        live.append(_notify("Assigned"))
+        docs = get_notifications(query, after, limit)
+        live.append(_notify("Resolved"))
+        return docs
+
+    monkeypatch.setattr(crud, "get_notifications", backlog_with_live_traffic)
+
+    async def scenario():
+        notification_hub._loop = asyncio.get_running_loop()
+        events = await _open(str(first["_id"]))
+        assert notification_hub.stats()["connections"] == 1
+        chunks = await _read_until_idle(events)
+        await events.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert _ids(chunks) == [str(d["_id"]) for d in (second, live[0], live[1])]
+    assert notification_hub.stats()["connections"] == 0
+
+
+def test_stream_tells_a_lagging_client_to_resync(monkeypatch):
+    monkeypatch.setattr(reports, "NOTIFY_HEARTBEAT_SECONDS", 0.05)
+
+    async def scenario():
+        notification_hub._loop = asyncio.get_running_loop()
+        events = await _open()
+        assert await _read_until_idle(events) == []
+        # e.g. the change stream restarted without resuming
+        notification_hub.resync_all()
+        return await _read_until_idle(events)
+
+    assert asyncio.run(scenario()) == ["event: resync\ndata: {}\n\n"]
+    assert notification_hub.stats()["connections"] == 0
+
+
+def test_long_backlog_sends_resync(monkeypatch):
+    monkeypatch.setattr(reports, "NOTIFY_CATCHUP_LIMIT", 1)
+    first = _notify("Submitted")
+    _notify("In Progress")
+    _notify("Resolved")
+
+    async def scenario():
+        return [chunk async for chunk in await _open(str(first["_id"]))]
+
+    assert asyncio.run(scenario()) == ["event: resync\ndata: {}\n\n"]
+    assert notification_hub.stats()["connections"] == 0
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+
+import crud
+import reports
+
+
+def _seed(n: int):
+    # three reports share every timestamp, so pages have to break ties on _id
+    start = datetime(2026, 10, 1)
+    docs = [
+        {"title": f"r{i}", "status": "Submitted" if i % 2 else "Resolved", "upvotes": i % 4,
+         "created_at": start + timedelta(minutes=i // 3)}
+        for i in range(n)
+    ]
+    crud.reports_collection.insert_many(docs)
+    return docs
+
+
+def _page_through(fetch, key, page_size):
+    seen, after = [], None
+    while True:
+        page = fetch(after, page_size + 1)
+        seen.extend(page[:page_size])
+        if len(page) <= page_size:
+            return seen
+        last = page[page_size - 1]
+        after = (last[key], last["_id"])
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7])
+def test_newest_first_pages_cover_every_report_once(page_size):
+    _seed(20)
+    query = {"status": "Submitted"}
+    seen = _page_through(lambda after, n: crud.get_admin_reports_after(query, after, n), "created_at", page_size)
+    expected = list(crud.reports_collection.find(query).sort(crud.NEWEST_FIRST))
+    assert [d["_id"] for d in seen] == [d["_id"] for d in expected]
+
+
+def test_top_voted_pages_cover_every_report_once():
+    _seed(20)
+
+    def fetch(after, n):
+        return list(crud.reports_collection.find(crud._keyset_after({}, crud.TOP_VOTED, after)).sort(crud.TOP_VOTED).limit(n))
+
+    seen = _page_through(fetch, "upvotes", 3)
+    assert len({d["_id"] for d in seen}) == 20
+    assert [(d["upvotes"], d["_id"]) for d in seen] == sorted(((d["upvotes"], d["_id"]) for d in seen), reverse=True)
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    created_at = datetime(2026, 10, 1, 12, 30, 5, 123000)
+    assert reports._decode_cursor(reports._encode_cursor({"created_at": created_at, "id": str(oid)})) == (created_at, oid)
+    assert reports._decode_vote_cursor(reports._encode_vote_cursor({"upvotes": 7, "id": str(oid)})) == (7, oid)
+    assert reports._decode_score_cursor(reports._encode_score_cursor({"score": 1.5, "id": str(oid)})) == (1.5, oid)
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", reports._pack_cursor({"t": "yesterday", "id": "x"}), reports._pack_cursor([1, 2])])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        reports._decode_cursor(cursor)
+    assert e.value.status_code == 400
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+import crud
+from conftest import auth_headers
+
+
+def _report(user_id: str = "citizen-1", **fields):
+    doc = {
+        "user_id": user_id, "title": "Fallen tree", "category": "Other", "urgency": "High", "status": "Submitted",
+        "assigned_department": "General", "upvotes": 0, "location": {"type": "Point", "coordinates": [78.48, 17.38]},
+        "created_at": datetime(2026, 10, 1), "updated_at": datetime(2026, 10, 1), **fields,
+    }
+    crud.reports_collection.insert_one(doc)
+    return str(doc["_id"])
+
+
+def test_only_owner_and_admins_see_a_report(client, admin_headers):
+    report_id = _report()
+    assert client.get(f"/api/report/{report_id}", headers=auth_headers("citizen-1")).json()["data"]["id"] == report_id
+    assert client.get(f"/api/report/{report_id}", headers=auth_headers("citizen-2")).status_code == 404
+    assert client.get(f"/api/report/{report_id}", headers=admin_headers).status_code == 200
+
+
+def test_batch_lists_invisible_ids_as_missing(client, admin_headers):
+    own, other, gone = _report(), _report("citizen-2"), str(ObjectId())
+    r = client.get("/api/report", params={"ids": f"{own},{other},{gone}"}, headers=auth_headers("citizen-1")).json()
+    assert [d["id"] for d in r["data"]] == [own]
+    assert r["meta"]["missing"] == [other, gone]
+    r = client.get("/api/report", params={"ids": f"{own},{other},{gone}"}, headers=admin_headers).json()
+    assert [d["id"] for d in r["data"]] == [own, other]
+
+
+def test_etag_is_the_only_validator(client):
+    report_id = _report()
+    headers = auth_headers("citizen-1")
+    first = client.get(f"/api/report/{report_id}", headers=headers)
+    etag = first.headers["etag"]
+    assert client.get(f"/api/report/{report_id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.post(f"/api/report/{report_id}/upvote", headers=auth_headers("citizen-2"))
+    changed = client.get(f"/api/report/{report_id}", headers={**headers, "If-None-Match": etag, "If-Modified-Since": first.headers["last-modified"]})
+    assert changed.status_code == 200 and changed.json()["data"]["upvotes"] == 1
+    # an upvote leaves updated_at alone, so If-Modified-Since alone cannot be trusted
+    assert client.get(f"/api/report/{report_id}", headers={**headers, "If-Modified-Since": first.headers["last-modified"]}).status_code == 200
+
+
+def test_write_during_a_read_is_not_cached(client, monkeypatch):
+    report_id = _report()
+    get_reports_by_ids = crud.get_reports_by_ids
+
+    def racing_read(oids, projection=None):
+        docs = get_reports_by_ids(oids, projection)
+        crud.update_report(ObjectId(report_id), crud.status_fields("Resolved"))
+        return docs
+
+    monkeypatch.setattr(crud, "get_reports_by_ids", racing_read)
+    headers = auth_headers("citizen-1")
+    assert client.get(f"/api/report/{report_id}", headers=headers).json()["data"]["status"] == "Submitted"
+    monkeypatch.setattr(crud, "get_reports_by_ids", get_reports_by_ids)
+    assert client.get(f"/api/report/{report_id}", headers=headers).json()["data"]["status"] == "Resolved"
@@ -0,0 +1,101 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import crud
+import stats
+
+DAY = datetime(2026, 10, 1, 9, 0)
+
+
+def _report(n: int, **fields) -> dict:
+    doc = {
+        "user_id": f"citizen-{n}", "title": f"Report {n}", "category": "Pothole", "urgency": "Low",
+        "status": "Submitted", "assigned_department": "Public Works", "upvotes": 0,
+        "location": {"type": "Point", "coordinates": [78.48, 17.38]},
+        "created_at": DAY + timedelta(hours=n), "updated_at": DAY + timedelta(hours=n),
+    }
+    doc.update(fields)
+    return doc
+
+
+def _naive(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value and value.tzinfo else value
+
+
+def _expected():
+    # rebuild()'s pipelines in Python; mongomock has no $unionWith to run them
+    counters = Counter((d.get("assigned_department"), d.get("category"), d.get("status"), d.get("urgency")) for d in crud.reports_collection.find())
+    daily = {}
+    for doc in crud.reports_collection.find():
+        created_at = _naive(doc["created_at"])
+        entry = daily.setdefault((created_at.strftime("%Y-%m-%d"), doc["assigned_department"]), {"created": 0, "resolved": 0, "resolve_seconds": {}})
+        entry["created"] += 1
+        if doc["status"] != "Resolved":
+            continue
+        resolved_at = _naive(doc.get("resolved_at") or doc.get("updated_at"))
+        entry = daily.setdefault((resolved_at.strftime("%Y-%m-%d"), doc["assigned_department"]), {"created": 0, "resolved": 0, "resolve_seconds": {}})
+        entry["resolved"] += 1
+        entry["resolve_seconds"][str(doc["_id"])] = max(0.0, (resolved_at - created_at).total_seconds())
+    return dict(counters), daily
+
+
+def _materialized():
+    counters = {
+        tuple(row["_id"][d] for d in stats.DIMENSIONS): row["count"]
+        for row in crud.report_stats_collection.find() if row["count"]
+    }
+    daily = {
+        (row["_id"]["day"], row["_id"]["department"]): {
+            "created": row.get("created", 0), "resolved": row.get("resolved", 0), "resolve_seconds": row.get("resolve_seconds") or {},
+        }
+        for row in crud.report_stats_daily_collection.find()
+        if row.get("created") or row.get("resolved") or row.get("resolve_seconds")
+    }
+    return counters, daily
+
+
+def _at(day: int, status: str) -> dict:
+    return crud.status_fields(status, now=(DAY + timedelta(days=day)).replace(tzinfo=timezone.utc))
+
+
+def test_incremental_counters_match_a_rebuild():
+    docs = [_report(n) for n in range(4)] + [_report(4, assigned_department="Sanitation", category="Garbage")]
+    assert crud.insert_reports(docs) == []
+    ids = [doc["_id"] for doc in docs]
+
+    # resolved, reopened and resolved again on a later day
+    crud.update_report(ids[0], _at(1, "Resolved"))
+    crud.update_report(ids[0], _at(2, "In Progress"))
+    crud.update_report(ids[0], _at(3, "Resolved"))
+    # resolved, then moved to another department while resolved
+    crud.update_report(ids[1], _at(1, "Resolved"))
+    crud.bulk_update_reports([
+        (ids[1], {"assigned_department": "Sanitation"}, None),
+        (ids[2], _at(2, "Resolved"), None),
+        (ids[3], {"urgency": "High"}, None),
+    ])
+    # resolved and reopened for good
+    crud.update_report(ids[4], _at(1, "Resolved"))
+    crud.update_report_status(str(ids[4]), "Submitted")
+
+    assert _materialized() == _expected()
+
+
+def test_department_change_moves_created_count():
+    doc = _report(0, assigned_department="General")
+    crud.insert_reports([doc])
+    crud.update_report(doc["_id"], {"assigned_department": "Public Works", "category": "Pothole"})
+    counters, daily = _materialized()
+    assert daily == {("2026-10-01", "Public Works"): {"created": 1, "resolved": 0, "resolve_seconds": {}}}
+    assert (counters, daily) == _expected()
+
+
+def test_series_reads_legacy_resolve_lists():
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    crud.report_stats_daily_collection.insert_many([
+        {"_id": {"day": today, "department": "Public Works"}, "created": 2, "resolved": 2, "resolve_seconds": [3600, 7200]},
+        {"_id": {"day": today, "department": "Sanitation"}, "created": 0, "resolved": 1, "resolve_seconds": {"abc": 10800}},
+    ])
+    series = stats.get_series(1)
+    assert series["days"] == [{"day": today, "created": 2, "resolved": 3, "median_resolve_hours": 2.0}]
+    assert stats.get_series(1, "Sanitation")["median_resolve_hours"] == 3.0
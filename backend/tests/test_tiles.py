@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import crud
+import tiles
+from tiles import lonlat_to_tile, tile_cache
+
+HERE = (78.4800, 17.3800)
+ZOOMS = (3, 10, 14)
+
+
+@pytest.fixture(autouse=True)
+def cells_in_python(monkeypatch):
+    # mongomock has no $tan/$ln: the same cell maths over find()
+    def aggregate_report_cells(area, zoom):
+        groups = {}
+        for doc in crud.reports_collection.find({"location.type": "Point"}):
+            lon, lat = doc["location"]["coordinates"]
+            cx, cy = lonlat_to_tile(lon, lat, zoom)
+            row = groups.setdefault((cx, cy, doc.get("category"), doc.get("status")), {"count": 0, "sum_lng": 0.0, "sum_lat": 0.0})
+            row["count"] += 1
+            row["sum_lng"] += lon
+            row["sum_lat"] += lat
+        return [{"cx": cx, "cy": cy, "category": c, "status": s, **row} for (cx, cy, c, s), row in groups.items()]
+
+    monkeypatch.setattr(crud, "aggregate_report_cells", aggregate_report_cells)
+
+
+def _report(lon: float, lat: float, category: str = "Pothole", status: str = "Submitted") -> dict:
+    return {
+        "user_id": "citizen-1", "title": "Report", "category": category, "urgency": "Low", "status": status,
+        "assigned_department": "Public Works", "location": {"type": "Point", "coordinates": [lon, lat]},
+        "created_at": datetime(2026, 10, 1), "updated_at": datetime(2026, 10, 1),
+    }
+
+
+def _keys() -> list:
+    return [(z, *lonlat_to_tile(*HERE, z)) for z in ZOOMS]
+
+
+def _rounded(tile: dict) -> dict:
+    return {cell: {**entry, "sum_lng": round(entry["sum_lng"], 6), "sum_lat": round(entry["sum_lat"], 6)}
+            for cell, entry in tile["cells"].items()}
+
+
+def test_patched_tiles_match_a_fresh_build():
+    docs = [_report(78.4800, 17.3800), _report(78.4812, 17.3790, "Streetlight"), _report(78.55, 17.42, status="Resolved")]
+    crud.insert_reports(docs)
+
+    async def scenario():
+        tile_cache.start()
+        for key in _keys():
+            await tile_cache.get_tile(*key)
+        await crud.run_db(crud.insert_reports, [_report(78.4805, 17.3801, "Sanitation")])
+        await crud.run_db(crud.update_report, docs[0]["_id"], crud.status_fields("Resolved"))
+        await crud.run_db(crud.bulk_update_reports, [(docs[1]["_id"], {"category": "Pothole"}, None), (docs[2]["_id"], crud.status_fields("Submitted"), None)])
+        await asyncio.sleep(0)
+        patched = {key: tile_cache._cache.get(key) for key in _keys()}
+        fresh = {key: await tile_cache._build(*key) for key in _keys()}
+        return patched, fresh
+
+    patched, fresh = asyncio.run(scenario())
+    for key in _keys():
+        assert patched[key] is not None, key
+        assert _rounded(patched[key]) == _rounded(fresh[key]), key
+    assert tile_cache.stats()["patched"] > 0 and tile_cache.stats()["misses"] == len(ZOOMS)
+
+
+def test_change_during_a_build_is_not_cached(monkeypatch):
+    doc = _report(*HERE)
+    crud.insert_reports([doc])
+    aggregate = crud.aggregate_report_cells
+
+    def racing_aggregate(area, zoom):
+        rows = aggregate(area, zoom)
+        crud.update_report(doc["_id"], crud.status_fields("Resolved"))
+        return rows
+
+    monkeypatch.setattr(crud, "aggregate_report_cells", racing_aggregate)
+    key = _keys()[1]
+
+    async def scenario():
+        tile_cache.start()
+        served = await tile_cache.get_tile(*key)
+        await asyncio.sleep(0)
+        return served
+
+    served = asyncio.run(scenario())
+    assert list(served["cells"].values())[0]["by_status"] == {"Submitted": 1}
+    assert tile_cache._cache.get(key) is None
+
+
+def test_large_batches_clear_the_cache(monkeypatch):
+    monkeypatch.setattr(tiles, "TILE_PATCH_MAX_CHANGES", 2)
+    crud.insert_reports([_report(*HERE)])
+
+    async def scenario():
+        tile_cache.start()
+        await tile_cache.get_tile(*_keys()[0])
+        await crud.run_db(crud.insert_reports, [_report(*HERE) for _ in range(3)])
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert tile_cache.stats()["entries"] == 0 and tile_cache.stats()["cleared"] == 1
@@ -0,0 +1,96 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import crud
+import transfer
+from conftest import auth_headers
+
+
+def _ndjson(rows) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def _row(n: int, **fields) -> dict:
+    row = {
+        "external_id": f"legacy-{n}",
+        "title": f"Legacy pothole {n}",
+        "category": "Pothole",
+        "assigned_department": "Public Works",
+        "status": "Submitted",
+        "longitude": 78.48,
+        "latitude": 17.38,
+        "created_at": "2026-10-01T09:30:00+05:30",
+    }
+    row.update(fields)
+    return row
+
+
+def test_import_stores_naive_utc():
+    doc = transfer.validate_row(_row(1))
+    assert doc["created_at"] == datetime(2026, 10, 1, 4, 0)
+    assert doc["created_at"].tzinfo is None
+
+
+def test_imported_report_reaches_hot_feed(client, admin_headers):
+    crud.reports_collection.insert_one({
+        "user_id": "citizen-1", "title": "Older report", "category": "Pothole", "urgency": "Low",
+        "status": "Submitted", "assigned_department": "Public Works", "upvotes": 0,
+        "location": {"type": "Point", "coordinates": [78.48, 17.38]},
+        "created_at": datetime.utcnow() - timedelta(days=1),
+    })
+    headers = auth_headers("citizen-1")
+    assert [r["title"] for r in client.get("/api/reports", headers=headers).json()["data"]] == ["Older report"]
+
+    now = datetime.utcnow().isoformat() + "Z"
+    r = client.post(
+        "/api/admin/reports/import", headers=admin_headers,
+        files={"file": ("reports.ndjson", _ndjson([_row(1, created_at=now)]))},
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["data"]["inserted"] == 1
+
+    titles = [r["title"] for r in client.get("/api/reports", headers=headers).json()["data"]]
+    assert titles == ["Legacy pothole 1", "Older report"]
+
+
+def test_import_rejects_bad_rows_by_number():
+    rows = [_row(1), _row(2, title=""), _row(3, category="Volcano"), _row(4, latitude=123)]
+    rejected = []
+    summary = transfer.import_stream(
+        io.BytesIO(_ndjson(rows)), "ndjson", batch_size=2,
+        on_reject=lambda n, error, data: rejected.append((n, error.split(":")[0])),
+    )
+    assert summary["inserted"] == 1
+    assert summary["rejected"] == 3
+    assert rejected == [(2, "title"), (3, "category"), (4, "location")]
+    assert summary["last_row"] == 4
+
+
+def test_import_resumes_and_skips_existing_rows():
+    data = _ndjson([_row(n) for n in range(1, 6)])
+    batches = []
+    first = transfer.import_stream(io.BytesIO(data), "ndjson", batch_size=2, on_batch=lambda s: batches.append(s["last_row"]))
+    assert batches == [2, 4, 5]
+    assert first["inserted"] == 5
+
+    # resuming after row 2 only looks at rows 3-5, which are already stored
+    resumed = transfer.import_stream(io.BytesIO(data), "ndjson", batch_size=2, start_row=2)
+    assert resumed == {"inserted": 0, "existing": 3, "rejected": 0, "last_row": 5, "rejects": []}
+    assert crud.reports_collection.count_documents({}) == 5
+
+
+def test_csv_export_imports_back():
+    transfer.import_stream(io.BytesIO(_ndjson([_row(n, status="Resolved") for n in range(1, 4)])), "ndjson")
+    exported = b"".join(transfer.export_chunks({}, "csv", compress=True, batch_size=2))
+    before = {doc["external_id"]: doc for doc in crud.reports_collection.find()}
+    crud.reports_collection.delete_many({})
+
+    summary = transfer.import_stream(io.BytesIO(exported), "csv")
+    assert summary["inserted"] == 3
+    for doc in crud.reports_collection.find():
+        original = before[doc["external_id"]]
+        assert doc["_id"] == original["_id"]
+        assert doc["location"] == original["location"]
+        assert doc["created_at"] == original["created_at"]
+        assert doc["resolved_at"] == original["resolved_at"]
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import crud
+from conftest import auth_headers
+from upvotes import upvote_counter
+
+
+def _report(upvotes: int = 0) -> str:
+    result = crud.reports_collection.insert_one({
+        "user_id": "owner", "title": "Broken streetlight", "status": "Submitted", "upvotes": upvotes,
+        "location": {"type": "Point", "coordinates": [78.48, 17.38]}, "created_at": datetime.utcnow(),
+    })
+    return str(result.inserted_id)
+
+
+def _stored(report_id: str) -> int:
+    return crud.get_report_upvotes(crud.ObjectId(report_id))
+
+
+def _feed_upvotes(client, report_id: str) -> int:
+    data = client.get("/api/reports", headers=auth_headers("reader")).json()["data"]
+    return next(r["upvotes"] for r in data if r["id"] == report_id)
+
+
+def test_votes_are_coalesced_into_one_flush(client):
+    report_id = _report(upvotes=5)
+    for user in ("a", "b", "c"):
+        r = client.post(f"/api/report/{report_id}/upvote", headers=auth_headers(user))
+        assert r.json()["data"]["upvotes"] == 5 + "abc".index(user) + 1
+    # a repeated vote is a no-op
+    assert client.post(f"/api/report/{report_id}/upvote", headers=auth_headers("a")).json()["data"]["upvotes"] == 8
+    assert client.delete(f"/api/report/{report_id}/upvote", headers=auth_headers("c")).json()["data"]["upvotes"] == 7
+
+    assert _stored(report_id) == 5
+    assert _feed_upvotes(client, report_id) == 7
+    assert asyncio.run(upvote_counter.flush()) == 1
+    assert _stored(report_id) == 7
+    assert _feed_upvotes(client, report_id) == 7
+    assert upvote_counter.stats()["pending_reports"] == 0
+
+
+def test_failed_flush_puts_deltas_back(monkeypatch):
+    report_id = _report()
+    upvote_counter.add(report_id, 1)
+    apply = crud.apply_upvote_deltas
+
+    def fail(deltas):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(crud, "apply_upvote_deltas", fail)
+    assert asyncio.run(upvote_counter.flush()) == 0
+    upvote_counter.add(report_id, 1)
+    assert upvote_counter.live(report_id, _stored(report_id)) == 2
+
+    monkeypatch.setattr(crud, "apply_upvote_deltas", apply)
+    assert asyncio.run(upvote_counter.flush()) == 1
+    assert _stored(report_id) == 2
+    assert upvote_counter.live(report_id, _stored(report_id)) == 2
+    assert upvote_counter.stats()["errors"] == 1
+
+
+def test_read_overlapping_a_flush_is_not_double_counted(monkeypatch):
+    report_id = _report(upvotes=10)
+    upvote_counter.add(report_id, 3)
+    applied, release = threading.Event(), threading.Event()
+    apply = crud.apply_upvote_deltas
+
+    def slow_apply(deltas):
+        # the $inc has landed but the flush has not settled yet
+        result = apply(deltas)
+        applied.set()
+        release.wait(5)
+        return result
+
+    monkeypatch.setattr(crud, "apply_upvote_deltas", slow_apply)
+
+    async def scenario():
+        flush = asyncio.create_task(upvote_counter.flush())
+        await asyncio.to_thread(applied.wait, 5)
+        assert _stored(report_id) == 13
+        read = asyncio.create_task(upvote_counter.read(crud.get_report_upvotes, crud.ObjectId(report_id)))
+        await asyncio.sleep(0.05)
+        release.set()
+        await flush
+        stored, view = await read
+        return upvote_counter.live(report_id, stored, view)
+
+    assert asyncio.run(scenario()) == 13
+    assert upvote_counter.stats()["reread"] == 1
+
+
+def test_view_taken_before_a_flush_still_counts_its_deltas():
+    report_id = _report()
+    upvote_counter.add(report_id, 2)
+
+    async def scenario():
+        stored, view = await upvote_counter.read(crud.get_report_upvotes, crud.ObjectId(report_id))
+        await upvote_counter.flush()
+        upvote_counter.add(report_id, 1)
+        return upvote_counter.live(report_id, stored, view)
+
+    # read before the flush: 0 stored, the 2 flushed since and the 1 queued after
+    assert asyncio.run(scenario()) == 3
+    assert upvote_counter.live(report_id, _stored(report_id)) == 3
@@ -0,0 +1,216 @@
+import asyncio
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from cache import TTLCache
+
+# Map tiles for the citizen and admin maps. Tiles use the usual web-mercator
+# z/x/y scheme; each one is split into a 2**TILE_GRID_BITS square grid and holds
+# per-cell report counts by category and status, counted by Mongo through the
+# location 2dsphere index. From TILE_POINTS_MIN_ZOOM on, a tile carries the
+# individual reports instead (unless there are more than TILE_MAX_POINTS).
+# Built tiles are cached; every report write that goes through crud's change
+# hook patches the cached cluster tiles the report falls in rather than dropping
+# them, so a new report or a status change never forces a city-wide
+# re-aggregation. Batches larger than TILE_PATCH_MAX_CHANGES (bulk imports)
+# clear the cache instead.
+
+TILE_GRID_BITS = int(os.getenv("TILE_GRID_BITS", "3"))
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "20"))
+TILE_POINTS_MIN_ZOOM = int(os.getenv("TILE_POINTS_MIN_ZOOM", "16"))
+TILE_MAX_POINTS = int(os.getenv("TILE_MAX_POINTS", "500"))
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "20000"))
+# safety net only; cached tiles are kept current by report_changed()
+TILE_CACHE_TTL_SECONDS = float(os.getenv("TILE_CACHE_TTL_SECONDS", "600"))
+TILE_PATCH_MAX_CHANGES = int(os.getenv("TILE_PATCH_MAX_CHANGES", "500"))
+
+# below this zoom a tile spans a hemisphere or more, which $geoWithin cannot express
+_MIN_POLYGON_ZOOM = 2
+
+
+def lonlat_to_tile(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    n = 2 ** zoom
+    lat = max(-crud.MERCATOR_MAX_LAT, min(crud.MERCATOR_MAX_LAT, lat))
+    rad = math.radians(lat)
+    x = math.floor((lon + 180.0) / 360.0 * n)
+    y = math.floor((1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * n)
+    return min(n - 1, max(0, x)), min(n - 1, max(0, y))
+
+
+def _tile_lat(y: float, zoom: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** zoom))))
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) in degrees."""
+    n = 2 ** zoom
+    return x / n * 360.0 - 180.0, _tile_lat(y + 1, zoom), (x + 1) / n * 360.0 - 180.0, _tile_lat(y, zoom)
+
+
+def tile_polygon(zoom: int, x: int, y: int) -> Optional[Dict[str, Any]]:
+    """
+    GeoJSON polygon covering the tile, or None when the tile is too large for one.
+    2dsphere polygon edges are geodesics, so the east-west edges are split into
+    short segments and the box is padded; the cell maths drops anything outside.
+    """
+    if zoom < _MIN_POLYGON_ZOOM:
+        return None
+    west, south, east, north = tile_bounds(zoom, x, y)
+    pad_lat = (north - south) * 0.02
+    pad_lon = (east - west) * 0.001
+    west, east = max(-180.0, west - pad_lon), min(180.0, east + pad_lon)
+    south, north = max(-90.0, south - pad_lat), min(90.0, north + pad_lat)
+    steps = max(1, math.ceil(east - west))
+    top = [[west + (east - west) * i / steps, north] for i in range(steps + 1)]
+    bottom = [[east - (east - west) * i / steps, south] for i in range(steps + 1)]
+    return {"type": "Polygon", "coordinates": [top + bottom + [top[0]]]}
+
+
+def tiles_for_bbox(west: float, south: float, east: float, north: float, zoom: int) -> List[Tuple[int, int]]:
+    x0, y0 = lonlat_to_tile(west, north, zoom)
+    x1, y1 = lonlat_to_tile(east, south, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def _report_key(report: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float, Any, Any]]:
+    coords = ((report or {}).get("location") or {}).get("coordinates")
+    if not coords:
+        return None
+    return coords[0], coords[1], report.get("category"), report.get("status")
+
+
+class TileCache:
+    def __init__(self, maxsize: int = 20000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize, ttl)
+        self._building: Dict[Tuple[int, int, int], Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = {"hits": 0, "misses": 0, "patched": 0, "dropped": 0, "cleared": 0}
+
+    async def get_tile(self, zoom: int, x: int, y: int) -> Dict[str, Any]:
+        key = (zoom, x, y)
+        tile = self._cache.get(key)
+        if tile is not None:
+            self._counters["hits"] += 1
+            return tile
+        # one build per tile; concurrent requests for it wait on the same future
+        pending = self._building.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending["future"])
+        self._counters["misses"] += 1
+        pending = {"future": asyncio.get_running_loop().create_future(), "dirty": False}
+        self._building[key] = pending
+        try:
+            tile = await self._build(zoom, x, y)
+        except Exception as e:
+            pending["future"].set_exception(e)
+            pending["future"].exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._building.pop(key, None)
+        # a report changed while this tile was being counted; serve it but do not keep it
+        if not pending["dirty"]:
+            self._cache.set(key, tile)
+        pending["future"].set_result(tile)
+        return tile
+
+    async def _build(self, zoom: int, x: int, y: int) -> Dict[str, Any]:
+        area = tile_polygon(zoom, x, y)
+        if zoom >= TILE_POINTS_MIN_ZOOM:
+            points = await crud.run_db(crud.get_report_points, area, TILE_MAX_POINTS + 1)
+            if len(points) <= TILE_MAX_POINTS:
+                return {"cells": None, "points": points}
+        rows = await crud.run_db(crud.aggregate_report_cells, area, zoom + TILE_GRID_BITS)
+        cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        side = 2 ** TILE_GRID_BITS
+        for row in rows:
+            cell = (row["cx"] - x * side, row["cy"] - y * side)
+            if 0 <= cell[0] < side and 0 <= cell[1] < side:
+                self._add(cells, cell, row["category"], row["status"], row["count"], row["sum_lng"], row["sum_lat"])
+        return {"cells": cells, "points": []}
+
+    @staticmethod
+    def _add(cells, cell, category, status, count, sum_lng, sum_lat) -> None:
+        entry = cells.setdefault(cell, {"count": 0, "sum_lng": 0.0, "sum_lat": 0.0, "by_category": {}, "by_status": {}})
+        entry["count"] += count
+        entry["sum_lng"] += sum_lng
+        entry["sum_lat"] += sum_lat
+        for field, value in (("by_category", category), ("by_status", status)):
+            entry[field][value] = entry[field].get(value, 0) + count
+            if entry[field][value] <= 0:
+                del entry[field][value]
+        if entry["count"] <= 0:
+            del cells[cell]
+
+    def report_changed(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """
+        Applies one report change to the cached tiles. `before` / `after` carry the
+        report's location, category and status (None for a create or delete).
+        """
+        side = 2 ** TILE_GRID_BITS
+        changes = [(k, -1) for k in [_report_key(before)] if k] + [(k, 1) for k in [_report_key(after)] if k]
+        for (lon, lat, category, status), sign in changes:
+            for zoom in range(TILE_MAX_ZOOM + 1):
+                cx, cy = lonlat_to_tile(lon, lat, zoom + TILE_GRID_BITS)
+                key = (zoom, cx // side, cy // side)
+                if key in self._building:
+                    self._building[key]["dirty"] = True
+                tile = self._cache.get(key)
+                if tile is None:
+                    continue
+                if tile["cells"] is None:
+                    # point tiles are cheap to rebuild
+                    self._cache.pop(key)
+                    self._counters["dropped"] += 1
+                    continue
+                self._add(tile["cells"], (cx % side, cy % side), category, status, sign, sign * lon, sign * lat)
+                self._counters["patched"] += 1
+
+    def reports_changed(self, changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+        """Applies a batch of (before, after) report changes; must run on the event loop."""
+        if len(changes) > TILE_PATCH_MAX_CHANGES:
+            self.clear()
+            return
+        for before, after in changes:
+            self.report_changed(before, after)
+
+    def reports_changed_threadsafe(self, changes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+        # crud.on_report_change listener; crud writes run on the Mongo thread pool, so hop onto the loop
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.reports_changed, changes)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        for pending in self._building.values():
+            pending["dirty"] = True
+        self._counters["cleared"] += 1
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self) -> None:
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "entries": len(self._cache), "building": len(self._building)}
+
+
+def serialize_tile(zoom: int, x: int, y: int, tile: Dict[str, Any]) -> Dict[str, Any]:
+    clusters = []
+    for (cx, cy), entry in (tile["cells"] or {}).items():
+        clusters.append({
+            "lng": entry["sum_lng"] / entry["count"],
+            "lat": entry["sum_lat"] / entry["count"],
+            "count": entry["count"],
+            "by_category": dict(entry["by_category"]),
+            "by_status": dict(entry["by_status"]),
+        })
+    return {"z": zoom, "x": x, "y": y, "clusters": clusters, "points": tile["points"]}
+
+
+tile_cache = TileCache(maxsize=TILE_CACHE_SIZE, ttl=TILE_CACHE_TTL_SECONDS)
+crud.on_report_change(tile_cache.reports_changed_threadsafe)
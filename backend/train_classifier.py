@@ -0,0 +1,64 @@
+"""
+Trains the local report classifier from reports already labelled by the LLM.
+
+    python train_classifier.py --output data/report_classifier.json
+"""
+import argparse
+import os
+import random
+import time
+import crud
+from classifier import LinearTextModel
+
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", "data/report_classifier.json")
+
+FIELDS = ("category", "urgency", "assigned_department")
+
+
+def load_samples(limit: int = 0):
+    # only LLM-labelled (or legacy, unlabelled-source) reports, never the classifier's own output
+    query = {"classified_by": {"$in": ["llm", None]}, "enrichment_status": {"$ne": "pending"}}
+    projection = {"title": 1, "original_text": 1, **{f: 1 for f in FIELDS}}
+    cursor = crud.reports_collection.find(query, projection)
+    if limit:
+        cursor = cursor.limit(limit)
+    for doc in cursor:
+        text = " ".join(filter(None, [doc.get("title"), doc.get("original_text")]))
+        yield text, {f: doc.get(f) for f in FIELDS if doc.get(f)}
+
+
+def evaluate(model: LinearTextModel, samples):
+    correct = {f: 0 for f in FIELDS}
+    for text, labels in samples:
+        pred = model.predict(text) or {}
+        for f in FIELDS:
+            correct[f] += pred.get(f) == labels.get(f)
+    return {f: correct[f] / len(samples) for f in FIELDS} if samples else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=CLASSIFIER_MODEL_PATH)
+    parser.add_argument("--limit", type=int, default=0, help="max reports to read (0 = all)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction kept aside for evaluation")
+    parser.add_argument("--epochs", type=int, default=15)
+    args = parser.parse_args()
+
+    samples = list(load_samples(args.limit))
+    if len(samples) < 20:
+        raise SystemExit(f"Only {len(samples)} labelled reports found; need at least 20 to train.")
+    random.Random(7).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train, test = samples[:split], samples[split:]
+
+    started = time.perf_counter()
+    model = LinearTextModel.train(train, epochs=args.epochs)
+    print(f"Trained on {len(train)} reports in {time.perf_counter() - started:.1f}s ({len(model.idf)} features).")
+    for field, acc in evaluate(model, test).items():
+        print(f"  holdout accuracy {field}: {acc:.3f}")
+    model.save(args.output)
+    print(f"Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import csv
+import gzip
+import io
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+from serialization import DETAIL_FIELDS, dumps
+
+# Bulk export and import of reports as NDJSON or CSV (optionally gzipped).
+# Exports walk one _id-ordered cursor and encode a batch at a time, so memory
+# stays flat however many reports match. Imports validate rows a batch at a
+# time and insert each batch with one unordered insert_many; rows are counted
+# from 1 (CSV header excluded) and `last_row` after every batch is what a
+# re-run passes as start_row to resume. Rows carrying an external_id (or an id
+# from an earlier export) that is already stored are counted as existing, so
+# re-importing the same file is harmless.
+
+TRANSFER_BATCH_SIZE = int(os.getenv("TRANSFER_BATCH_SIZE", "1000"))
+TRANSFER_MAX_BATCH_SIZE = int(os.getenv("TRANSFER_MAX_BATCH_SIZE", "10000"))
+# reports without a user (legacy systems) are filed under this id
+IMPORT_DEFAULT_USER_ID = os.getenv("IMPORT_DEFAULT_USER_ID", "legacy-import")
+FORMATS = ("ndjson", "csv")
+
+EXPORT_FIELDS = ("external_id",) + DETAIL_FIELDS + ("resolved_at",)
+# CSV flattens location into longitude/latitude; lists and objects are JSON cells
+CSV_COLUMNS = ("id",) + tuple(c for f in EXPORT_FIELDS for c in (("longitude", "latitude") if f == "location" else (f,)))
+_JSON_FIELDS = ("admin_notes", "progress_images", "image_variants")
+_TEXT_FIELDS = ("image_url", "video_url", "voice_note_url", "resolved_image_url", "classified_by")
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def detect_format(filename: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+### export
+
+def _export_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode("utf-8")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_row(doc: Dict[str, Any]) -> List[Any]:
+    coordinates = (doc.get("location") or {}).get("coordinates") or (None, None)
+    values = {**doc, "longitude": coordinates[0], "latitude": coordinates[1]}
+    return [_csv_cell(values.get(c)) for c in CSV_COLUMNS]
+
+
+def export_chunks(query: Dict[str, Any], fmt: str, compress: bool = False, batch_size: int = TRANSFER_BATCH_SIZE) -> Iterator[bytes]:
+    """Encoded export of the reports matching `query`, one chunk per `batch_size` reports. Blocking."""
+    # wbits=31 writes the gzip container, so the output is a regular .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    text = io.StringIO()
+    writer = csv.writer(text) if fmt == "csv" else None
+    pending: List[bytes] = []
+
+    def take() -> bytes:
+        if writer is not None:
+            data = text.getvalue().encode("utf-8")
+            text.seek(0)
+            text.truncate()
+        else:
+            data = b"".join(pending)
+            pending.clear()
+        return compressor.compress(data) if compressor else data
+
+    if writer is not None:
+        writer.writerow(CSV_COLUMNS)
+    cursor = crud.iter_reports(query, {f: 1 for f in EXPORT_FIELDS}, batch_size=batch_size)
+    for n, doc in enumerate(cursor, 1):
+        doc = _export_doc(doc)
+        if writer is not None:
+            writer.writerow(_csv_row(doc))
+        else:
+            pending.append(dumps(doc) + b"\n")
+        if n % batch_size == 0:
+            chunk = take()
+            if chunk:
+                yield chunk
+    chunk = take() + (compressor.flush() if compressor else b"")
+    if chunk:
+        yield chunk
+
+
+### import
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """(row number, row dict) per record of a seekable binary stream, gunzipped if needed; unparsable rows come back as the exception."""
+    if stream.read(2) == _GZIP_MAGIC:
+        stream.seek(0)
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    else:
+        stream.seek(0)
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(text), 1):
+            yield n, {k: v for k, v in row.items() if k and v not in ("", None)}
+        return
+    n = 0
+    for line in text:
+        if not line.strip():
+            continue
+        n += 1
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, ValueError(f"Invalid JSON: {e}")
+
+
+def _time(value: Any, field: str) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"{field}: not an ISO 8601 timestamp")
+    # stored naive UTC like every other report timestamp
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _json_cell(value: Any, field: str) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ValueError(f"{field}: not valid JSON")
+    return value
+
+
+def _choice(row: Dict[str, Any], field: str, allowed: set, default: str) -> str:
+    value = row.get(field) or default
+    if value not in allowed:
+        raise ValueError(f"{field}: {value!r} is not one of {sorted(allowed)}")
+    return value
+
+
+def _location(row: Dict[str, Any]) -> Dict[str, Any]:
+    location = _json_cell(row.get("location"), "location")
+    try:
+        if location:
+            lon, lat = (float(c) for c in location["coordinates"])
+        else:
+            lon, lat = float(row["longitude"]), float(row["latitude"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("location: needs GeoJSON coordinates or longitude and latitude")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("location: coordinates out of range")
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def validate_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns an exported/legacy row into a report document; raises ValueError naming the bad field."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    title = str(row.get("title") or "").strip()
+    if not title:
+        raise ValueError("title: required")
+    created_at = _time(row.get("created_at"), "created_at")
+    if created_at is None:
+        raise ValueError("created_at: required")
+    doc: Dict[str, Any] = {
+        "user_id": str(row.get("user_id") or IMPORT_DEFAULT_USER_ID),
+        "title": title[:100],
+        "category": _choice(row, "category", crud.ALLOWED_CATEGORIES, "Other"),
+        "urgency": _choice(row, "urgency", crud.ALLOWED_URGENCIES, "Low"),
+        "assigned_department": _choice(row, "assigned_department", crud.ALLOWED_DEPARTMENTS, "General"),
+        "status": _choice(row, "status", crud.ALLOWED_STATUSES, "Submitted"),
+        "original_text": (str(row["original_text"])[:500] if row.get("original_text") else None),
+        "location": _location(row),
+        "created_at": created_at,
+        "updated_at": _time(row.get("updated_at"), "updated_at") or created_at,
+        "classified_by": "import",
+    }
+    for field in _TEXT_FIELDS:
+        if row.get(field):
+            doc[field] = str(row[field])
+    for field in _JSON_FIELDS:
+        if row.get(field) not in (None, ""):
+            doc[field] = _json_cell(row[field], field)
+    for note in doc.get("admin_notes") or []:
+        if isinstance(note, dict) and note.get("at"):
+            note["at"] = _time(note["at"], "admin_notes.at")
+    for field in ("upvotes", "duplicate_count"):
+        if row.get(field) not in (None, ""):
+            doc[field] = row[field]
+    # types and defaults of the remaining fields come from the model
+    doc = crud.ReportInDB.model_validate(doc).model_dump(exclude={"id"})
+    if doc["upvotes"] < 0 or doc["duplicate_count"] < 0:
+        raise ValueError("upvotes and duplicate_count cannot be negative")
+    if row.get("id"):
+        if not ObjectId.is_valid(str(row["id"])):
+            raise ValueError("id: not a valid ObjectId")
+        doc["_id"] = ObjectId(str(row["id"]))
+    if row.get("external_id"):
+        doc["external_id"] = str(row["external_id"])
+    resolved_at = _time(row.get("resolved_at"), "resolved_at")
+    if doc["status"] == "Resolved":
+        doc["resolved_at"] = resolved_at or doc["updated_at"]
+    return doc
+
+
+def import_rows(
+    rows: Iterable[Tuple[int, Any]],
+    batch_size: int = TRANSFER_BATCH_SIZE,
+    start_row: int = 0,
+    on_reject: Optional[Callable[[int, str, Any], None]] = None,
+    on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+    rejects_kept: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Validates and inserts `rows` (from read_rows) after `start_row`, batch by
+    batch. Rejected rows go to `on_reject(row, error, data)` and the first
+    `rejects_kept` into the summary; `on_batch(summary)` runs after every batch,
+    once its rejects have been reported. Blocking.
+    """
+    summary: Dict[str, Any] = {"inserted": 0, "existing": 0, "rejected": 0, "last_row": start_row, "rejects": []}
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    rejects: List[Tuple[int, str, Any]] = []
+    last_row = start_row
+
+    def flush() -> None:
+        errors = crud.insert_reports([doc for _, doc in batch])
+        for err in errors:
+            n, doc = batch[err["index"]]
+            if err["code"] == 11000:
+                summary["existing"] += 1
+            else:
+                rejects.append((n, err["errmsg"], doc))
+        summary["inserted"] += len(batch) - len(errors)
+        for n, error, data in sorted(rejects, key=lambda r: r[0]):
+            summary["rejected"] += 1
+            if len(summary["rejects"]) < rejects_kept:
+                summary["rejects"].append({"row": n, "error": error})
+            if on_reject:
+                on_reject(n, error, data)
+        batch.clear()
+        rejects.clear()
+        summary["last_row"] = last_row
+        if on_batch:
+            on_batch(summary)
+
+    for n, row in rows:
+        if n <= start_row:
+            continue
+        last_row = n
+        try:
+            if isinstance(row, Exception):
+                raise row
+            batch.append((n, validate_row(row)))
+        except ValueError as e:
+            rejects.append((n, str(e), row if not isinstance(row, Exception) else None))
+        if len(batch) + len(rejects) >= batch_size:
+            flush()
+    if batch or rejects or last_row != summary["last_row"]:
+        flush()
+    return summary
+
+
+def import_stream(stream: IO[bytes], fmt: str, **kwargs: Any) -> Dict[str, Any]:
+    return import_rows(read_rows(stream, fmt), **kwargs)
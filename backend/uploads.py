@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import Any, Dict, Iterable, Optional
+from fastapi import HTTPException, UploadFile, status
+from starlette.responses import JSONResponse
+
+# Streaming, content-addressed storage for user uploads. The body is read in
+# chunks, hashed as it is written (file I/O runs in a worker thread) and stored
+# as <sha256><ext>, so the same photo submitted twice is stored once.
+
+# the Starlette constant for 413 was renamed between releases
+_PAYLOAD_TOO_LARGE = 413
+
+IMAGE_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+_SIGNATURES = {
+    "image/jpeg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    "image/png": lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    "image/webp": lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP",
+    "image/gif": lambda head: head[:6] in (b"GIF87a", b"GIF89a"),
+}
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    for content_type, matches in _SIGNATURES.items():
+        if matches(head):
+            return content_type
+    return None
+
+
+async def save_upload_stream(
+    file: UploadFile,
+    upload_dir: str,
+    url_prefix: str,
+    max_bytes: int,
+    keep_bytes: int = 0,
+    chunk_size: int = 256 * 1024,
+) -> Dict[str, Any]:
+    """
+    Streams `file` into `upload_dir` and returns url, path, sha256, size and
+    content_type. `data` holds the raw bytes when the file is at most
+    `keep_bytes` long (so the captioner can reuse them), otherwise None.
+    Raises 415 for non-image content and 413 once `max_bytes` is exceeded.
+    """
+    if file.content_type not in IMAGE_TYPES:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Unsupported upload type; allowed: {sorted(IMAGE_TYPES)}")
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=_PAYLOAD_TOO_LARGE, detail=f"Upload exceeds {max_bytes} bytes")
+
+    hasher = hashlib.sha256()
+    kept = bytearray() if keep_bytes else None
+    size = 0
+    content_type = None
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.part")
+    out_f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            if content_type is None:
+                content_type = _sniff(chunk[:16])
+                if content_type is None:
+                    raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Upload is not a recognised image")
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=_PAYLOAD_TOO_LARGE, detail=f"Upload exceeds {max_bytes} bytes")
+            hasher.update(chunk)
+            if kept is not None:
+                if size <= keep_bytes:
+                    kept += chunk
+                else:
+                    kept = None
+            await asyncio.to_thread(out_f.write, chunk)
+        await asyncio.to_thread(out_f.close)
+        if size == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload")
+        digest = hasher.hexdigest()
+        fname = f"{digest}{IMAGE_TYPES[content_type]}"
+        dst_path = os.path.join(upload_dir, fname)
+        await asyncio.to_thread(_commit, tmp_path, dst_path)
+    except BaseException:
+        await asyncio.to_thread(_discard, out_f, tmp_path)
+        raise
+    return {
+        "url": f"{url_prefix}/{fname}",
+        "path": dst_path,
+        "sha256": digest,
+        "size": size,
+        "content_type": content_type,
+        "data": bytes(kept) if kept is not None else None,
+    }
+
+
+def _commit(tmp_path: str, dst_path: str) -> None:
+    if os.path.exists(dst_path):
+        # duplicate content: keep the stored copy
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, dst_path)
+
+
+def _discard(out_f, tmp_path: str) -> None:
+    out_f.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized multipart requests from their Content-Length, before the body is parsed."""
+
+    def __init__(self, app, max_body_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths:
+            headers = dict(scope["headers"])
+            length = headers.get(b"content-length")
+            if length and length.isdigit() and int(length) > self.max_body_bytes:
+                response = JSONResponse(
+                    status_code=_PAYLOAD_TOO_LARGE,
+                    content={"detail": f"Request body exceeds {self.max_body_bytes} bytes"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
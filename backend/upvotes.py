@@ -0,0 +1,196 @@
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from bson.objectid import ObjectId
+from dotenv import load_dotenv
+load_dotenv()
+import crud
+
+# Upvote counters. The vote itself is written straight away (the unique
+# (report_id, user_id) index in `votes` is what enforces one vote per user); the
+# report's `upvotes` counter is not. Deltas are summed in memory per report and
+# flushed every UPVOTE_FLUSH_SECONDS as one unordered bulk_write of $inc, so a
+# viral report costs one update per flush instead of one per click. Deltas still
+# in memory at a hard crash are lost from the counter but not from `votes`.
+#
+# Reads add the unflushed deltas to the stored count (overlay). Which deltas a
+# stored count already includes depends on when it was read: read() runs the
+# query and tells whether a flush overlapped it (then it is repeated with
+# flushes held off), and the view it returns is what overlay() adds. Copies kept
+# in memory (hot feed, report cache) are refreshed by on_flush listeners in the
+# same step that retires the in-flight deltas.
+
+UPVOTE_FLUSH_SECONDS = float(os.getenv("UPVOTE_FLUSH_SECONDS", "1"))
+# flush early once this many reports have pending deltas
+UPVOTE_FLUSH_MAX_KEYS = int(os.getenv("UPVOTE_FLUSH_MAX_KEYS", "5000"))
+
+T = TypeVar("T")
+# (pending, in flight) delta dicts as of some read; see overlay()
+View = Tuple[Dict[str, int], Dict[str, int]]
+
+
+class UpvoteCounter:
+    def __init__(self, flush_interval: float = 1.0, max_keys: int = 5000):
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        # both dicts are swapped, never emptied, when a flush starts or settles, so a
+        # view taken earlier keeps exactly the deltas that were unflushed at the time
+        self._pending: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_listeners: List[Callable[[List[ObjectId]], Optional[Callable[[], None]]]] = []
+        self._counters = {"votes": 0, "flushes": 0, "updates": 0, "errors": 0, "reread": 0}
+
+    def add(self, report_id: str, delta: int) -> None:
+        with self._lock:
+            self._pending[report_id] = self._pending.get(report_id, 0) + delta
+            self._counters["votes"] += 1
+            if len(self._pending) >= self.max_keys:
+                self._wakeup.set()
+
+    def held(self, fn: Callable[[], T]) -> Tuple[T, View]:
+        """Runs `fn`, a lookup in a copy the flush listeners keep current, atomically with taking its view."""
+        with self._lock:
+            return fn(), (self._pending, self._in_flight)
+
+    def if_current(self, view: View, fn: Callable[[], None]) -> bool:
+        """Runs `fn` when no flush has started since `view` was taken (e.g. to cache what was read)."""
+        with self._lock:
+            if view[0] is not self._pending or self._in_flight:
+                return False
+            fn()
+            return True
+
+    def flushing(self, report_id: str) -> bool:
+        """True while a flush is writing a delta for `report_id`."""
+        with self._lock:
+            return report_id in self._in_flight
+
+    async def read(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Tuple[T, View]:
+        """
+        crud.run_db(fn, ...) and the view its stored counts match. A read that
+        overlaps a flush cannot tell whether the $inc landed first, so it is
+        repeated with flushes held off.
+        """
+        with self._lock:
+            pending, idle = self._pending, not self._in_flight
+        if idle:
+            result = await crud.run_db(fn, *args, **kwargs)
+            with self._lock:
+                if self._pending is pending and not self._in_flight:
+                    return result, (pending, {})
+        self._counters["reread"] += 1
+        async with self._flush_lock:
+            result = await crud.run_db(fn, *args, **kwargs)
+            with self._lock:
+                return result, (self._pending, {})
+
+    def _sources(self, view: Optional[View]) -> List[Dict[str, int]]:
+        # the view's deltas plus anything queued since, each dict once; call under the lock
+        sources: List[Dict[str, int]] = []
+        for deltas in list(view or ()) + [self._pending, self._in_flight]:
+            if deltas and all(deltas is not s for s in sources):
+                sources.append(deltas)
+        return sources
+
+    def live(self, report_id: str, stored: int, view: Optional[View] = None) -> int:
+        """`stored` (read with `view`) plus the deltas it does not include yet."""
+        with self._lock:
+            return stored + sum(deltas.get(report_id, 0) for deltas in self._sources(view))
+
+    def overlay(self, docs: Iterable[Dict[str, Any]], view: Optional[View] = None) -> None:
+        """
+        Adds the unflushed deltas to the `upvotes` of shaped documents (string
+        `id`). `view` comes with the documents from read() or held(); without
+        one they must be in-memory copies the flush listeners keep current.
+        """
+        with self._lock:
+            sources = self._sources(view)
+            if not sources:
+                return
+            for doc in docs:
+                delta = sum(deltas.get(doc["id"], 0) for deltas in sources)
+                if delta:
+                    doc["upvotes"] = doc.get("upvotes", 0) + delta
+
+    def on_flush(self, listener: Callable[[List[ObjectId]], Optional[Callable[[], None]]]) -> None:
+        """
+        `listener(report_ids)` runs on the Mongo thread once a flush's $inc is
+        applied and may read what it needs; the callable it returns runs under
+        the counter lock together with retiring the in-flight deltas, so it must
+        only touch memory.
+        """
+        self._flush_listeners.append(listener)
+
+    def _write(self, batch: Dict[str, int]) -> None:
+        report_ids = [ObjectId(rid) for rid, delta in batch.items() if delta]
+        crud.apply_upvote_deltas({ObjectId(rid): delta for rid, delta in batch.items() if delta})
+        settle = []
+        for listener in self._flush_listeners:
+            try:
+                step = listener(report_ids)
+                if step:
+                    settle.append(step)
+            except Exception as e:
+                print(f"Upvote flush listener failed: {e}")
+        with self._lock:
+            for step in settle:
+                try:
+                    step()
+                except Exception as e:
+                    print(f"Upvote flush listener failed: {e}")
+            self._in_flight = {}
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._in_flight = self._pending
+                self._pending = {}
+            try:
+                await crud.run_db(self._write, batch)
+            except Exception as e:
+                # put the deltas back for the next round
+                self._counters["errors"] += 1
+                print(f"Upvote flush failed: {e}")
+                # (the batch becomes the pending dict again, so views that hold it are not counted twice)
+                with self._lock:
+                    for rid, delta in self._pending.items():
+                        batch[rid] = batch.get(rid, 0) + delta
+                    self._pending, self._in_flight = batch, {}
+                return 0
+            self._counters["flushes"] += 1
+            self._counters["updates"] += len(batch)
+            return len(batch)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "pending_reports": len(self._pending), "in_flight_reports": len(self._in_flight)}
+
+
+upvote_counter = UpvoteCounter(flush_interval=UPVOTE_FLUSH_SECONDS, max_keys=UPVOTE_FLUSH_MAX_KEYS)
@@ -1,45 +1,42 @@
+import json
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import APIRouter, Request, Header, HTTPException
+from fastapi import APIRouter, Request, HTTPException
 from svix.webhooks import Webhook, WebhookVerificationError
-from crud import create_user
+from clerk_sync import USER_EVENTS, clerk_events
 
 CLERK_WEBHOOK_SECRET = os.environ.get("CLERK_WEBHOOK_SECRET")
 
+# built once: the verifier decodes the secret on construction
+_verifier = Webhook(CLERK_WEBHOOK_SECRET) if CLERK_WEBHOOK_SECRET else None
+
 router = APIRouter()
 
+
+def _svix_header(request: Request, name: str) -> str:
+    # Svix sends svix-*; the unbranded webhook-* names are accepted as well
+    return request.headers.get(f"svix-{name}") or request.headers.get(f"webhook-{name}") or ""
+
+
 @router.post("/clerk")
-async def handle_clerk_webhook(
-    request: Request, 
-    id: str = Header(None),
-    signature: str = Header(None),
-    timestamp: str = Header(None)
-):
-    if not CLERK_WEBHOOK_SECRET:
+async def handle_clerk_webhook(request: Request):
+    """Verifies the delivery and queues user events; they are written in batches right after the response."""
+    if _verifier is None:
         raise HTTPException(status_code=500, detail="Clerk webhook secret not configured")
 
     payload_body = await request.body()
-
+    message_id = _svix_header(request, "id")
+    headers = {f"svix-{name}": _svix_header(request, name) for name in ("timestamp", "signature")}
     try:
-        wh = Webhook(CLERK_WEBHOOK_SECRET)
-        payload = wh.verify(payload_body, {
-            "id": id,
-            "signature": signature,
-            "timestamp": timestamp
-        })
+        # newer svix releases return None here instead of the parsed body
+        _verifier.verify(payload_body, {"svix-id": message_id, **headers})
     except WebhookVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid webhook signature") from e
-    
-    event_type = payload["type"]
-
-    if event_type == "user.created":
-        clerk_user_id = payload["data"]["id"]
-        email = payload["data"]["email_addresses"][0]["email_address"]
-        new_user = create_user(clerk_user_id=clerk_user_id, email=email)
-        if new_user:
-            print(f"Successfully synced new user to database.")
-        else:
-            print(f"User already exists or there was an error.")
-    
-    return {"status": "success"}
\ No newline at end of file
+    payload = json.loads(payload_body)
+
+    if payload.get("type") in USER_EVENTS:
+        if not clerk_events.submit(message_id, payload):
+            # Clerk retries with backoff; nothing was written, so nothing is lost
+            raise HTTPException(status_code=503, detail="Webhook queue is full")
+    return {"status": "success"}
@@ -21,8 +21,21 @@ export async function fetchAdminReports({ department = null, category = null, st
 }
 
 export async function fetchReportById(id, token = null) {
-  const reports = await fetchAdminReports({}, token);
-  return reports.find((r) => r.id === id || r._id === id) || null;
+  const headers = getAuthHeaders(token);
+  try {
+    const res = await axios.get(`${API_BASE}/report/${id}`, { headers });
+    return res.data.data;
+  } catch (err) {
+    if (err.response && err.response.status === 404) return null;
+    throw err;
+  }
+}
+
+// Loads several reports in one request; ids that are missing or not visible are skipped.
+export async function fetchReportsByIds(ids, token = null) {
+  const headers = getAuthHeaders(token);
+  const res = await axios.get(`${API_BASE}/report`, { params: { ids: ids.join(",") }, headers });
+  return res.data.data;
 }
 
 export async function updateReportStatus(id, newStatus, notes = "", progress_image_url = "", resolved_image_url = "", token = null) {